@@ -1,7 +1,14 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dataset_io import read_dataset
+from instrumentation import count, span, start_tracing
+from streaming_correlation import CoMoments
 
 # --- Configuration ---
 # THIS MUST BE THE FINAL, FULLY PROCESSED FILE
@@ -9,154 +16,219 @@ INPUT_CSV = "dataset/Final_dataset/movies_all_features_processed_v2.csv"
 OUTPUT_DIR = "dataset/visuals/"
 TOP_N = 15
 TOP_N_GENRES_FOR_PIE = 6
-
-try:
-    # Load the dataset
-    df = pd.read_csv(INPUT_CSV)
-    print(f"Loaded {len(df)} rows from '{INPUT_CSV}' for visualization.")
-
-    # Ensure the output directory exists
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-    # Set a consistent, professional style for all plots
+# Hash of each figure's data and parameters from the last run; unchanged figures are not redrawn
+HASH_FILE = os.path.join(OUTPUT_DIR, 'eda_hashes.json')
+RENDER_VERSION = 1   # bump when a renderer changes, so every figure is redrawn once
+
+# Define the list of all final, model-ready numeric/binary columns
+MODEL_FEATURES = [
+    'Day1_collection_cr',
+    'Runtime (min)',
+    'Production_House_Score',
+    'Director_Score',
+    'Release_Year',
+    'Release_Month',
+    'Release_Day_of_Week',
+    'Promotion_Duration_Days',
+    'avg_sentiment',  # Assuming you have this
+    'median_sentiment'  # Assuming you have this
+]
+
+
+# ==============================================================================
+# SHARED AGGREGATES (computed once, in the parent)
+# ==============================================================================
+def top_counts(series, top_n=TOP_N):
+    """Movie counts of the most frequent names in a comma-separated text column."""
+    names = series.astype(object).fillna('').astype(str).str.split(',').explode().str.strip()
+    return names[names != ''].value_counts().head(top_n)
+
+
+def genre_pie_data(df, genre_cols, top_n=TOP_N_GENRES_FOR_PIE):
+    """Counts of the top genres plus 'Other'."""
+    primary_genre_cols = [col for col in genre_cols if col != 'Genre_Other']
+    pie_data = df[primary_genre_cols].sum().sort_values(ascending=False).head(top_n)
+    pie_data['Other'] = df['Genre_Other'].sum()
+    return pie_data
+
+
+def correlation_matrix(df, genre_cols):
+    """Correlation of the model features and genre flags over movies with a known Day 1 collection."""
+    df_model = df[MODEL_FEATURES + genre_cols].dropna(subset=['Day1_collection_cr'])
+    # Same pairwise-complete result as df_model.corr(); the same code streams catalogs too big to load
+    return CoMoments.from_frame(df_model).correlation()
+
+
+# ==============================================================================
+# RENDERERS (run in pool workers; each gets only the small aggregate it draws)
+# ==============================================================================
+def _plotting():
+    # Imported on first render, so a run where nothing changed never loads matplotlib
+    import matplotlib
+    matplotlib.use('Agg')   # files only; also keeps pool workers off any GUI backend
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     sns.set_style("whitegrid")
+    return plt, sns
 
-    # ==============================================================================
-    # 1. Bar Chart for Top 15 Directors (Based on Text Column Counts)
-    # ==============================================================================
-    print("Generating bar chart for Top 15 Directors...")
-
-    if 'Director' in df.columns:
-        director_counts = df['Director'].fillna('').str.split(',').explode().str.strip()
-        director_counts = director_counts[director_counts != '']
-        top_15_directors = director_counts.value_counts().head(TOP_N)
-
-        plt.figure(figsize=(12, 8))
-        sns.barplot(x=top_15_directors.values, y=top_15_directors.index, palette='viridis')
-        plt.title('Movie Counts for Top 15 Directors', fontsize=16)
-        plt.xlabel('Number of Movies', fontsize=12)
-        plt.ylabel('Director', fontsize=12)
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, 'director_top15_barplot.png'))
-        plt.close()
-        print("  -> Saved 'director_top15_barplot.png'")
-    else:
-        print("  -> Warning: 'Director' text column not found.")
-
-    # ==============================================================================
-    # 2. Bar Chart for Top 15 Production Companies (Based on Text Column Counts)
-    # ==============================================================================
-    print("Generating bar chart for Top 15 Production Companies...")
-
-    if 'Production Company' in df.columns:
-        company_counts = df['Production Company'].fillna('').str.split(',').explode().str.strip()
-        company_counts = company_counts[company_counts != '']
-        top_15_companies = company_counts.value_counts().head(TOP_N)
-
-        plt.figure(figsize=(12, 8))
-        sns.barplot(x=top_15_companies.values, y=top_15_companies.index, palette='plasma')
-        plt.title('Movie Counts for Top 15 Production Companies', fontsize=16)
-        plt.xlabel('Number of Movies', fontsize=12)
-        plt.ylabel('Production Company', fontsize=12)
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, 'production_top15_barplot.png'))
-        plt.close()
-        print("  -> Saved 'production_top15_barplot.png'")
-    else:
-        print("  -> Warning: 'Production Company' text column not found.")
-
-    # ==============================================================================
-    # 3. Pie Chart for Top 6 Genres + Other (Full Pie Chart)
-    # ==============================================================================
-    print("Generating pie chart for Top 6 Genres + Other...")
-
-    genre_cols = [col for col in df.columns if col.startswith('Genre_')]
 
-    if genre_cols:
-        primary_genre_cols = [col for col in genre_cols if col != 'Genre_Other']
-        top_6_counts = df[primary_genre_cols].sum().sort_values(ascending=False).head(TOP_N_GENRES_FOR_PIE)
-
-        other_count = df['Genre_Other'].sum()
+def render_barh(data, path, title, xlabel, ylabel, palette, figsize):
+    plt, sns = _plotting()
+    plt.figure(figsize=figsize)
+    sns.barplot(x=data.values, y=data.index, hue=data.index, palette=palette, legend=False)
+    plt.title(title, fontsize=16)
+    plt.xlabel(xlabel, fontsize=12)
+    plt.ylabel(ylabel, fontsize=12)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
 
-        pie_data = top_6_counts.copy()
-        pie_data['Other'] = other_count
 
-        labels = [f'{name.replace("Genre_", "")}\n(n={int(count)})' for name, count in pie_data.items()]
+def render_pie(data, path, title):
+    plt, _ = _plotting()
+    labels = [f'{name.replace("Genre_", "")}\n(n={int(count)})' for name, count in data.items()]
+    plt.figure(figsize=(10, 10))
+    plt.pie(data, labels=labels, autopct='%1.1f%%', startangle=90,
+            wedgeprops={'edgecolor': 'white'}, pctdistance=0.85)
+    plt.title(title, fontsize=16)
+    plt.axis('equal')  # Ensures the pie chart is a circle
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
 
-        plt.figure(figsize=(10, 10))
-        plt.pie(pie_data, labels=labels, autopct='%1.1f%%', startangle=90,
-                wedgeprops={'edgecolor': 'white'}, pctdistance=0.85)
 
-        plt.title(f'Genre Distribution (Top {TOP_N_GENRES_FOR_PIE} + Other)', fontsize=16)
-        plt.axis('equal')  # Ensures the pie chart is a circle
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, 'genre_top6_piechart.png'))
-        plt.close()
-        print("  -> Saved 'genre_top6_piechart.png'")
-    else:
-        print("  -> Warning: No 'Genre_' columns found.")
-
-    # ==============================================================================
-    # 4. NEW: Correlation Matrix Heatmap
-    # ==============================================================================
-    print("Generating correlation matrix heatmap...")
-
-    # Define the list of all final, model-ready numeric/binary columns
-    model_features = [
-        'Day1_collection_cr',
-        'Runtime (min)',
-        'Production_House_Score',
-        'Director_Score',
-        'Release_Year',
-        'Release_Month',
-        'Release_Day_of_Week',
-        'Promotion_Duration_Days',
-        'avg_sentiment',  # Assuming you have this
-        'median_sentiment'  # Assuming you have this
-    ]
-
-    # Add all the genre columns to our list
-    model_features.extend(genre_cols)
-
-    # Filter the DataFrame to only these columns
-    df_model = df[model_features].copy()
-
-    # Drop rows where our target is empty
-    df_model.dropna(subset=['Day1_collection_cr'], inplace=True)
-
-    # Calculate the correlation matrix
-    corr_matrix = df_model.corr()
-
-    # --- Plot 1: Full Heatmap (Good for seeing feature-feature correlation) ---
+def render_heatmap(data, path, title):
+    plt, sns = _plotting()
     plt.figure(figsize=(20, 16))
-    sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm',
-                annot_kws={"size": 8})
-    plt.title('Correlation Matrix of All Model Features', fontsize=18)
+    sns.heatmap(data, annot=True, fmt='.2f', cmap='coolwarm', annot_kws={"size": 8})
+    plt.title(title, fontsize=18)
     plt.xticks(rotation=45, ha='right')
     plt.yticks(rotation=0)
     plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, 'correlation_heatmap_full.png'))
+    plt.savefig(path)
     plt.close()
-    print("  -> Saved 'correlation_heatmap_full.png'")
 
-    # --- Plot 2: Target Correlation Bar Chart (Easier to read) ---
-    # Get only the correlations with the target variable
-    corr_target = corr_matrix['Day1_collection_cr'].drop('Day1_collection_cr').sort_values(ascending=False)
 
-    plt.figure(figsize=(12, 10))
-    sns.barplot(x=corr_target.values, y=corr_target.index, palette='vlag')
-    plt.title('Feature Correlation with Day 1 Collection', fontsize=16)
-    plt.xlabel('Correlation Coefficient', fontsize=12)
-    plt.ylabel('Feature', fontsize=12)
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, 'correlation_with_target.png'))
-    plt.close()
-    print("  -> Saved 'correlation_with_target.png'")
-
-    print("\n✅ Visualization script complete.")
-
-except FileNotFoundError:
-    print(f"\nError: The input file '{INPUT_CSV}' was not found.")
-    print(f"Please make sure the file '{INPUT_CSV}' exists.")
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+RENDERERS = {'barh': render_barh, 'pie': render_pie, 'heatmap': render_heatmap}
+
+
+def render_job(job, output_dir):
+    """Draws one figure with the Agg backend; returns its file name."""
+    RENDERERS[job['kind']](job['data'], os.path.join(output_dir, job['file']), **job['params'])
+    return job['file']
+
+
+# ==============================================================================
+# JOBS AND CHANGE DETECTION
+# ==============================================================================
+def build_jobs(df):
+    """One job per figure: {file, kind, data, params}. Prints a warning for figures it cannot draw."""
+    jobs = []
+    with span('shared aggregates', 'phase'):
+        for column, file, label, palette in [('Director', 'director_top15_barplot.png', 'Directors', 'viridis'),
+                                             ('Production Company', 'production_top15_barplot.png',
+                                              'Production Companies', 'plasma')]:
+            if column not in df.columns:
+                print(f"  -> Warning: '{column}' text column not found.")
+                continue
+            jobs.append({'file': file, 'kind': 'barh', 'data': top_counts(df[column]),
+                         'params': {'title': f'Movie Counts for Top {TOP_N} {label}', 'xlabel': 'Number of Movies',
+                                    'ylabel': column, 'palette': palette, 'figsize': (12, 8)}})
+
+        genre_cols = [col for col in df.columns if col.startswith('Genre_')]
+        if genre_cols:
+            jobs.append({'file': 'genre_top6_piechart.png', 'kind': 'pie', 'data': genre_pie_data(df, genre_cols),
+                         'params': {'title': f'Genre Distribution (Top {TOP_N_GENRES_FOR_PIE} + Other)'}})
+        else:
+            print("  -> Warning: No 'Genre_' columns found.")
+
+        # One correlation matrix feeds both the heatmap and the target bar chart
+        corr_matrix = correlation_matrix(df, genre_cols)
+        corr_target = corr_matrix['Day1_collection_cr'].drop('Day1_collection_cr').sort_values(ascending=False)
+    jobs.append({'file': 'correlation_heatmap_full.png', 'kind': 'heatmap', 'data': corr_matrix,
+                 'params': {'title': 'Correlation Matrix of All Model Features'}})
+    jobs.append({'file': 'correlation_with_target.png', 'kind': 'barh', 'data': corr_target,
+                 'params': {'title': 'Feature Correlation with Day 1 Collection', 'xlabel': 'Correlation Coefficient',
+                            'ylabel': 'Feature', 'palette': 'vlag', 'figsize': (12, 10)}})
+    return jobs
+
+
+def job_hash(job):
+    """Digest of the figure's data (values and labels), kind, parameters and renderer version."""
+    digest = hashlib.sha256()
+    data = job['data']
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    if isinstance(data, pd.DataFrame):
+        digest.update(json.dumps([str(c) for c in data.columns]).encode())
+    digest.update(json.dumps({'kind': job['kind'], 'params': job['params'], 'version': RENDER_VERSION},
+                             sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def load_hashes(path=HASH_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def render_all(jobs, output_dir=OUTPUT_DIR, workers=None, force=False, hash_file=HASH_FILE):
+    """
+    Renders the figures whose hash changed (or whose PNG is missing) in a process pool and
+    records the new hashes. Returns (rendered file names, skipped file names).
+    """
+    previous = load_hashes(hash_file)
+    hashes = {job['file']: job_hash(job) for job in jobs}
+    pending = [job for job in jobs if force or previous.get(job['file']) != hashes[job['file']]
+               or not os.path.exists(os.path.join(output_dir, job['file']))]
+    pending_files = {job['file'] for job in pending}
+    skipped = [job['file'] for job in jobs if job['file'] not in pending_files]
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+
+    rendered = []
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for file in pool.map(render_job, pending, [output_dir] * len(pending)):
+                rendered.append(file)
+                print(f"  -> Saved '{file}'")
+    else:
+        for job in pending:
+            with span(f"render {job['file']}", 'io'):
+                rendered.append(render_job(job, output_dir))
+            print(f"  -> Saved '{job['file']}'")
+    count('figures rendered', len(rendered))
+    count('figures skipped', len(skipped))
+
+    # Only figures that were actually written get their new hash
+    with open(hash_file, 'w', encoding='utf-8') as f:
+        json.dump({**previous, **{file: hashes[file] for file in rendered}}, f, indent=2)
+    return rendered, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the EDA figures, skipping unchanged ones.")
+    parser.add_argument('--input', default=INPUT_CSV)
+    parser.add_argument('--workers', type=int, default=None, help="Render processes (default: CPU count).")
+    parser.add_argument('--force', action='store_true', help="Redraw every figure.")
+    args = parser.parse_args()
+    start_tracing('EDA')
+
+    try:
+        # Load the dataset
+        df = read_dataset(args.input)
+        print(f"Loaded {len(df)} rows from '{args.input}' for visualization.")
+
+        # Ensure the output directory exists
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+        jobs = build_jobs(df)
+        rendered, skipped = render_all(jobs, OUTPUT_DIR, args.workers, args.force)
+        if skipped:
+            print(f"Unchanged, not redrawn: {', '.join(skipped)}")
+        print(f"\n✅ Visualization script complete ({len(rendered)} rendered, {len(skipped)} unchanged).")
+
+    except FileNotFoundError:
+        print(f"\nError: The input file '{args.input}' was not found.")
+        print(f"Please make sure the file '{args.input}' exists.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
@@ -1,25 +1,24 @@
-import pandas as pd
-import requests
 from bs4 import BeautifulSoup
-import time
 import re
-from tqdm import tqdm
+
+from catalog_store import DB_FILE, CatalogStore
+from collection_engine import LANGUAGE_PROFILES, bh_slug
+from http_client import Client
+from instrumentation import start_tracing
+from page_archive import PageArchive
+from page_pipeline import FetchParsePipeline
 
 # --- Configuration ---
-INPUT_CSV = 'dataset/hindi_movies_boxoffice.csv'
-OUTPUT_CSV = 'dataset/hindi_movies_features.csv'
+CHECKPOINT_ROWS = 50
 BASE_URL = 'https://www.bollywoodhungama.com'
+HEADERS = {'User-Agent': 'MyMovieDataScraper/1.0'}
 
 
 # --- Helper Functions ---
 
-def create_slug(title):
-    """Converts a movie title into a URL-friendly 'slug'."""
-    slug = title.lower()
-    slug = re.sub(r'\(.*\)', '', slug).strip()
-    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
-    slug = re.sub(r'\s+', '-', slug)
-    return slug
+def create_slug(title, language='Hindi'):
+    """Converts a movie title into a URL-friendly 'slug' under its language's slug rules."""
+    return bh_slug(title, LANGUAGE_PROFILES[language])
 
 
 def parse_crew_wrapper(soup):
@@ -44,85 +43,86 @@ def parse_crew_wrapper(soup):
     return details
 
 
-# --- Main Scraping Function ---
-def scrape_bh_details(movie_slug):
-    """Scrapes all required details from a movie's cast page."""
-    url = f"{BASE_URL}/movie/{movie_slug}/cast/"
-    headers = {'User-Agent': 'MyMovieDataScraper/1.0'}
-
-    scraped_data = {}
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
-        if response.status_code != 200:
-            return {}
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # --- Extract details from the crew wrapper ---
-        crew_data = parse_crew_wrapper(soup)
-        scraped_data['Banner'] = crew_data.get('Banner')
-        scraped_data['Release Date'] = crew_data.get('Release Date')
-        scraped_data['Genre'] = crew_data.get('Genre')
-        scraped_data['Director'] = crew_data.get('Director')
-
-        # --- THIS IS THE MODIFIED SECTION ---
-        censor_details = crew_data.get('Censor Details')
-        if censor_details:
-            total_minutes = 0
-            # Find the hour part (e.g., "2h")
-            hours_match = re.search(r'(\d+)\s*h', censor_details)
-            if hours_match:
-                total_minutes += int(hours_match.group(1)) * 60
-
-            # Find the minute part (e.g., "38mins")
-            minutes_match = re.search(r'(\d+)\s*min', censor_details)
-            if minutes_match:
-                total_minutes += int(minutes_match.group(1))
-
-            # Assign the calculated total if it's greater than 0
-            scraped_data['Runtime (min)'] = total_minutes if total_minutes > 0 else None
-
-            # The certification logic remains the same
-            cert_match = re.search(r'\((\w\/?\w?\+?)\)', censor_details)
-            scraped_data['Certification'] = cert_match.group(1) if cert_match else None
-        # --- END OF MODIFIED SECTION ---
-
-        # --- Extract the first 3 cast members ---
-        cast_section = soup.find('div', id='load-more-content')
-        if cast_section:
-            cast_names = [name.text.split('...')[0].strip() for name in cast_section.find_all('h4', class_='name')]
-            scraped_data['Cast'] = ', '.join(cast_names[:3])
-
-        return scraped_data
-
-    except requests.exceptions.RequestException:
-        return {}
-
-# --- Main Script ---
-if __name__ == "__main__":
-    df = pd.read_csv(INPUT_CSV)
-    df.columns = df.columns.str.strip()
+# --- Main Scraping Functions ---
+def fetch_bh_details(client, movie):
+    """Pipeline fetch step: the movie's cast page, as a parse job (or None)."""
+    url = f"{BASE_URL}/movie/{create_slug(movie['Title'], movie['Language'])}/cast/"
+    # Retries with backoff; returns None at once while the site's circuit is open
+    html = client.get_text(url)
+    return (parse_bh_details, (html,)) if html else None
 
-    # Define the new columns to add
-    new_cols = ['Banner', 'Release Date', 'Genre', 'Director', 'Runtime_mins', 'Certification', 'Cast']
-    for col in new_cols:
-        if col not in df.columns:
-            df[col] = pd.NA
-
-    for index, row in tqdm(df.iterrows(), total=df.shape[0]):
-        title = row['Title']
-        slug = create_slug(title)
-
-        details = scrape_bh_details(slug)
 
+def parse_bh_details(html):
+    """Extracts all required details from a cast page. Runs in a parse process."""
+    scraped_data = {}
+    soup = BeautifulSoup(html, 'html.parser')
+    # --- Extract details from the crew wrapper ---
+    crew_data = parse_crew_wrapper(soup)
+    scraped_data['Banner'] = crew_data.get('Banner')
+    scraped_data['Release Date'] = crew_data.get('Release Date')
+    scraped_data['Genre'] = crew_data.get('Genre')
+    scraped_data['Director'] = crew_data.get('Director')
+
+    # --- THIS IS THE MODIFIED SECTION ---
+    censor_details = crew_data.get('Censor Details')
+    if censor_details:
+        total_minutes = 0
+        # Find the hour part (e.g., "2h")
+        hours_match = re.search(r'(\d+)\s*h', censor_details)
+        if hours_match:
+            total_minutes += int(hours_match.group(1)) * 60
+
+        # Find the minute part (e.g., "38mins")
+        minutes_match = re.search(r'(\d+)\s*min', censor_details)
+        if minutes_match:
+            total_minutes += int(minutes_match.group(1))
+
+        # Assign the calculated total if it's greater than 0
+        scraped_data['Runtime (min)'] = total_minutes if total_minutes > 0 else None
+
+        # The certification logic remains the same
+        cert_match = re.search(r'\((\w\/?\w?\+?)\)', censor_details)
+        scraped_data['Certification'] = cert_match.group(1) if cert_match else None
+    # --- END OF MODIFIED SECTION ---
+
+    # --- Extract the first 3 cast members ---
+    cast_section = soup.find('div', id='load-more-content')
+    if cast_section:
+        cast_names = [name.text.split('...')[0].strip() for name in cast_section.find_all('h4', class_='name')]
+        scraped_data['Cast'] = ', '.join(cast_names[:3])
+
+    return scraped_data
+
+def add_details(client, store, movies):
+    """Scrapes the cast page of every movie and upserts what it finds; returns the per-stage report."""
+    pending = []
+    # A movie's slug depends on its language; one without slug rules has no URL to fetch
+    movies = movies[movies['Language'].isin(list(LANGUAGE_PROFILES))]
+
+    def on_result(movie, details):
         if details:
-            for key, value in details.items():
-                df.loc[index, key] = value
+            pending.append({**movie, **details})
+        if len(pending) >= CHECKPOINT_ROWS:
+            store.upsert(pending)   # only the scraped rows are written, not the whole catalog
+            pending.clear()
 
-        time.sleep(1)  # Be polite to the server
+    # Fetcher threads queue raw pages, a process pool parses them
+    stages = FetchParsePipeline(client).run(movies.to_dict('records'), fetch_bh_details, on_result)
+    store.upsert(pending)
+    return stages
 
-        if (index + 1) % 50 == 0:
-            df.to_csv(OUTPUT_CSV, index=False)
 
-    df.to_csv(OUTPUT_CSV, index=False)
-    print(f"\n✅ Scraping complete! Data saved to '{OUTPUT_CSV}'.")
\ No newline at end of file
+# --- Main Script ---
+if __name__ == "__main__":
+    start_tracing('add_features')
+    # Pooled client; politeness (requests in flight, spacing) is per host in http_client.HOST_LIMITS.
+    # Every page fetched is archived, so `python reextract.py --details` can re-parse it offline
+    with CatalogStore() as store, PageArchive() as archive:
+        client = Client(headers=HEADERS, archive=archive)
+        # Only the key columns of movies not yet scraped, so a rerun resumes where it stopped
+        todo = store.read(['Title', 'Year', 'Language'], missing='Director')
+        print(f"{len(todo)} movies in '{store.path}' still need details.")
+        stages = add_details(client, store, todo)
+    print(stages.to_string(index=False))
+    print(client.report().to_string(index=False))
+    print(f"\n✅ Scraping complete! Details saved to '{DB_FILE}'.")
@@ -0,0 +1,272 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset_io import read_dataset
+from instrumentation import span, start_tracing
+
+# --- Configuration ---
+INPUT_CSV = "dataset/Final_dataset/movies_all_features_processed_v2.csv"
+CUBE_FILE = "dataset/visuals/eda_cube.npz"
+TARGET_COLUMN = 'Day1_collection_cr'
+# Group-by dimensions -> source column ('Genre' comes from the Genre_ flags)
+DIMENSIONS = {
+    'Director': 'Director',
+    'Production Company': 'Production Company',
+    'Genre': None,
+    'Year': 'Release_Year',
+    'Month': 'Release_Month',
+    'Day of Week': 'Release_Day_of_Week',
+}
+MULTI_VALUED = ['Director', 'Production Company']   # comma-separated text columns
+TOP_VALUES = 50            # per multi-valued dimension; the rest are grouped as 'Other'
+ALL = 'All'                # genre member that counts every movie once
+# Day 1 collection (Cr) histogram: 0 plus log-spaced edges from 0.01 to 1,000 Cr (~9.5% wide bins)
+BIN_EDGES = np.concatenate([[0.0], np.geomspace(0.01, 1000, 128)])
+QUANTILES = {'Median': 0.5, 'Q25': 0.25, 'Q75': 0.75, 'Q90': 0.9}
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+UNKNOWN = 'Unknown'
+CALENDAR_ORDER = {'Year': None, 'Month': MONTH_NAMES, 'Day of Week': DAY_NAMES}   # None: sorted labels
+
+
+# ==============================================================================
+# BUILD (offline)
+# ==============================================================================
+def _split_names(series):
+    # NaN is filled before the string conversion: pandas < 3 would turn it into the name 'nan'
+    names = series.astype(object).fillna('').astype(str).str.split(',')
+    return names.apply(lambda parts: [n.strip() for n in parts if n.strip()])
+
+
+def _top_or_other(lists, top_n):
+    counts = pd.Series([name for names in lists for name in names]).value_counts()
+    keep = set(counts.index[:top_n])
+    return lists.apply(lambda names: sorted({n if n in keep else 'Other' for n in names}) or [UNKNOWN])
+
+
+def _labels(series, names):
+    """Integer codes as display labels ('2023', 'Mar', 'Fri'); missing values become 'Unknown'."""
+    codes = pd.to_numeric(series, errors='coerce').to_numpy()
+    return np.array([UNKNOWN if np.isnan(c) else names.get(int(c), str(int(c))) for c in codes], dtype=object)
+
+
+def movie_frame(df, top_values=TOP_VALUES):
+    """One row per movie with a known Day 1 collection: value, filter keys and list-valued dimensions."""
+    df = df.dropna(subset=[TARGET_COLUMN])
+    genre_cols = [c for c in df.columns if c.startswith('Genre_')]
+    names = np.array([c.replace('Genre_', '') for c in genre_cols], dtype=object)
+    flags = df[genre_cols].fillna(0).to_numpy() > 0
+    movies = pd.DataFrame({
+        'value': pd.to_numeric(df[TARGET_COLUMN], errors='coerce').to_numpy(),
+        'Language': df['Language'].fillna(UNKNOWN).astype(str).to_numpy() if 'Language' in df else UNKNOWN,
+        # Filter key stays numeric (NaN = unknown year); the group-by value is a label
+        'year_key': pd.to_numeric(df['Release_Year'], errors='coerce').to_numpy(dtype=float),
+        'Year': _labels(df['Release_Year'], {}),
+        'Month': _labels(df['Release_Month'], dict(enumerate(MONTH_NAMES, start=1))),
+        'Day of Week': _labels(df['Release_Day_of_Week'], dict(enumerate(DAY_NAMES))),
+        'Genre': [list(names[row]) or [UNKNOWN] for row in flags],
+    })
+    for dim in MULTI_VALUED:
+        movies[dim] = _top_or_other(_split_names(df[dim]).reset_index(drop=True), top_values).to_numpy()
+    return movies.dropna(subset=['value'])
+
+
+def _cells(frame, dim):
+    """Aggregates one cuboid: count, sum and Day 1 histogram per (value, language, year, genre key)."""
+    keys = ['dim_value', 'Language', 'year_key', 'genre_key']
+    grouped = frame.groupby(keys, sort=True, dropna=False)
+    codes = grouped.ngroup().to_numpy()
+    n_cells = grouped.ngroups
+    bins = np.clip(np.searchsorted(BIN_EDGES, frame['value'].to_numpy(), side='right') - 1, 0, len(BIN_EDGES) - 2)
+    hist = np.bincount(codes * (len(BIN_EDGES) - 1) + bins,
+                       minlength=n_cells * (len(BIN_EDGES) - 1)).reshape(n_cells, -1).astype(np.int32)
+    cells = grouped['value'].agg(['count', 'sum']).reset_index()
+    cells.insert(0, 'dimension', dim)
+    return cells, hist
+
+
+def build_cube(df, top_values=TOP_VALUES):
+    """
+    Every cuboid of the cube, stacked: one row per non-empty (dimension, value, language,
+    year, genre) cell with its count, sum and histogram of Day 1 collections. Genre is a
+    filter with an extra 'All' member, so movies with several genres are never double counted.
+    Returns (cells DataFrame, histogram matrix).
+    """
+    movies = movie_frame(df, top_values)
+    by_genre = movies.explode('Genre')
+    # Every movie once under 'All', plus once per genre it has
+    with_genre_key = pd.concat([movies.assign(genre_key=ALL), by_genre.assign(genre_key=by_genre['Genre'])],
+                               ignore_index=True)
+    parts, hists = [], []
+    for dim in DIMENSIONS:
+        if dim == 'Genre':
+            frame = by_genre.assign(dim_value=by_genre['Genre'], genre_key=ALL)
+        elif dim in MULTI_VALUED:
+            frame = with_genre_key.explode(dim)
+            frame = frame.assign(dim_value=frame[dim])
+        else:
+            frame = with_genre_key.assign(dim_value=with_genre_key[dim])
+        cells, hist = _cells(frame[['dim_value', 'Language', 'year_key', 'genre_key', 'value']], dim)
+        parts.append(cells)
+        hists.append(hist)
+    cells = pd.concat(parts, ignore_index=True)
+    cells['dim_value'] = cells['dim_value'].astype(str)
+    return cells, np.vstack(hists)
+
+
+def save_cube(cells, hist, path=CUBE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, hist=hist, bin_edges=BIN_EDGES, count=cells['count'].to_numpy(),
+                        sum=cells['sum'].to_numpy(), year=cells['year_key'].to_numpy(),
+                        **{k: cells[c].to_numpy(dtype=str) for k, c in
+                           [('dimension', 'dimension'), ('value', 'dim_value'),
+                            ('language', 'Language'), ('genre', 'genre_key')]})
+    return path
+
+
+# ==============================================================================
+# SLICE (in memory, used by the dashboard)
+# ==============================================================================
+def _histogram_quantiles(hist, edges, q):
+    """Quantile q of each histogram row, interpolating log-linearly inside the bin (linearly in the first)."""
+    cum = np.cumsum(hist, axis=1)
+    total = cum[:, -1:]
+    target = q * total
+    idx = np.minimum((cum < target).sum(axis=1), hist.shape[1] - 1)
+    rows = np.arange(len(hist))
+    below = np.where(idx > 0, cum[rows, np.maximum(idx - 1, 0)], 0)
+    in_bin = hist[rows, idx]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.clip(np.where(in_bin > 0, (target[:, 0] - below) / in_bin, 0.0), 0.0, 1.0)
+    lo, hi = edges[idx], edges[idx + 1]
+    log_interp = np.exp(np.log(np.maximum(lo, 1e-12)) + frac * (np.log(hi) - np.log(np.maximum(lo, 1e-12))))
+    return np.where(total[:, 0] > 0, np.where(lo > 0, log_interp, lo + frac * (hi - lo)), np.nan)
+
+
+class AggregateCube:
+    """The precomputed cube held in memory; slice() answers a drill-down without touching movie rows."""
+
+    def __init__(self, path=CUBE_FILE):
+        with np.load(path) as data:
+            self.hist = data['hist']
+            self.edges = data['bin_edges']
+            self.count = data['count']
+            self.sum = data['sum']
+            self.year = data['year']
+            dimension, value = data['dimension'], data['value']
+            self.language, self.genre = data['language'], data['genre']
+        self.mtime = os.path.getmtime(path)
+        # Row ranges per dimension (cells were written cuboid by cuboid, sorted by value)
+        self._rows = {}
+        for dim in DIMENSIONS:
+            rows = np.flatnonzero(dimension == dim)
+            self._rows[dim] = (rows, value[rows])
+
+    @property
+    def languages(self):
+        return sorted(set(self.language.tolist()))
+
+    @property
+    def genres(self):
+        return [ALL] + sorted(set(self.genre.tolist()) - {ALL})
+
+    @property
+    def years(self):
+        return int(np.nanmin(self.year)), int(np.nanmax(self.year))
+
+    def slice(self, group_by, languages=None, years=None, genre=ALL):
+        """
+        Count, mean and histogram quantiles of the Day 1 collection per value of `group_by`,
+        over movies in `languages` (None = all), `years` (inclusive (low, high), None = all)
+        and `genre` ('All' = every genre). Year, month and day come back in calendar order,
+        the other dimensions by number of movies.
+        """
+        rows, values = self._rows[group_by]
+        keep = np.ones(len(rows), dtype=bool)
+        if languages:
+            keep &= np.isin(self.language[rows], list(languages))
+        if years:
+            year = self.year[rows]
+            keep &= (year >= years[0]) & (year <= years[1])
+        if group_by != 'Genre':
+            keep &= self.genre[rows] == genre
+        elif genre != ALL:
+            keep &= values == genre
+        rows, values = rows[keep], values[keep]
+        if len(rows) == 0:
+            return pd.DataFrame(columns=['Movies', 'Mean'] + list(QUANTILES))
+
+        # Cells of one value are adjacent, so each value is one reduceat segment
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        counts = np.add.reduceat(self.count[rows], starts)
+        sums = np.add.reduceat(self.sum[rows], starts)
+        hist = np.add.reduceat(self.hist[rows], starts, axis=0)
+        out = pd.DataFrame({'Movies': counts, 'Mean': sums / counts}, index=pd.Index(values[starts], name=group_by))
+        for name, q in QUANTILES.items():
+            out[name] = _histogram_quantiles(hist, self.edges, q)
+        if group_by in CALENDAR_ORDER:
+            order = CALENDAR_ORDER[group_by] or sorted(v for v in out.index if v != UNKNOWN)
+            return out.reindex([v for v in order + [UNKNOWN] if v in out.index])
+        return out.sort_values('Movies', ascending=False)
+
+
+def load_cube(path=CUBE_FILE):
+    """Opens the cube, or returns None if aggregate_cube.py has not been run."""
+    if not os.path.exists(path):
+        return None
+    return AggregateCube(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the EDA aggregate cube for the dashboard.")
+    parser.add_argument('--input', default=INPUT_CSV)
+    parser.add_argument('--output', default=CUBE_FILE)
+    parser.add_argument('--top-values', type=int, default=TOP_VALUES,
+                        help="Directors / companies kept by name; the rest are 'Other'.")
+    parser.add_argument('--verify', action='store_true', help="Compare slices with exact pandas aggregates.")
+    args = parser.parse_args()
+    start_tracing('aggregate_cube')
+
+    try:
+        df = read_dataset(args.input)
+        start = time.perf_counter()
+        with span('build cube', 'phase'):
+            cells, hist = build_cube(df, args.top_values)
+        path = save_cube(cells, hist, args.output)
+        print(f"✅ Cube of {len(cells):,} cells from {len(df):,} movies built in "
+              f"{time.perf_counter() - start:.2f}s -> '{path}' ({os.path.getsize(path) / 2**10:.0f} KB).")
+
+        cube = load_cube(path)
+        for dim in DIMENSIONS:
+            times = []
+            for _ in range(20):
+                t = time.perf_counter()
+                cube.slice(dim, years=cube.years)
+                times.append(time.perf_counter() - t)
+            print(f"  slice by {dim:<18}: {np.median(times) * 1000:6.2f} ms")
+
+        if args.verify:
+            movies = movie_frame(df, args.top_values)
+            worst = 0.0
+            for dim in DIMENSIONS:
+                grouped = movies.explode(dim).groupby(dim)['value']
+                exact = grouped.agg(['count', 'mean'])
+                # The sample median of an even group can sit anywhere between its two middle values,
+                # so the histogram median is judged by its distance outside that interval
+                low = grouped.quantile(0.5, interpolation='lower')
+                high = grouped.quantile(0.5, interpolation='higher')
+                ours = cube.slice(dim).loc[exact.index.astype(str)]
+                assert (ours['Movies'].to_numpy() == exact['count'].to_numpy()).all(), dim
+                assert np.allclose(ours['Mean'].to_numpy(), exact['mean'].to_numpy()), dim
+                median = ours['Median'].to_numpy()
+                ok = low.to_numpy() > BIN_EDGES[1]
+                outside = np.maximum(low.to_numpy() / median - 1, median / high.to_numpy() - 1).clip(min=0)
+                worst = max(worst, float(outside[ok].max(initial=0.0)))
+            print(f"\n✅ Counts and means exact; medians within {worst:.1%} of the sample median "
+                  f"(histogram bins are {BIN_EDGES[2] / BIN_EDGES[1] - 1:.1%} wide).")
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,241 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import start_tracing
+from synthetic_catalog import DEFAULT_SEED, generate_catalog, generate_model_table
+
+# --- Configuration ---
+HISTORY_JSON = "dataset/benchmarks/history.json"
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+TIME_TOLERANCE = 0.20        # a stage is a regression if it is >20% slower...
+MIN_TIME_DELTA_S = 0.05      # ...and at least 50 ms slower (ignores noise on tiny stages)
+MEMORY_TOLERANCE = 0.20
+MIN_MEMORY_DELTA_MB = 1.0
+
+
+# ==============================================================================
+# STAGES
+# ==============================================================================
+# Each stage gets the per-size inputs from `prepare_inputs` and returns the callable to time.
+# `max_rows` skips sizes a stage cannot reasonably handle (k-NN imputation is quadratic).
+def _stage_popularity_score(inputs):
+    from popularity_score import popularity_score
+    return lambda: popularity_score(inputs['catalog_csv'])
+
+
+def _stage_simplify_genre(inputs):
+    from popularity_score import simplify_genre
+    return lambda: simplify_genre(inputs['catalog'])
+
+
+def _stage_process_time_features(inputs):
+    from popularity_score import process_time_features
+    return lambda: process_time_features(inputs['catalog'])
+
+
+def _stage_impute_sentiment(inputs):
+    from final_coln_selection import impute_sentiment
+    return lambda: impute_sentiment(inputs['model_table'])
+
+
+def _stage_model_training(inputs):
+    from model_training import BINS, DEFAULT_PARAMS, TARGET_COLUMN, build_models, fit_models
+    table = inputs['model_table'].fillna(0)
+    y = pd.cut(table[TARGET_COLUMN], bins=BINS, labels=False)
+    X = table.drop(columns=[TARGET_COLUMN])
+    return lambda: fit_models(build_models(DEFAULT_PARAMS), X, y)
+
+
+def _stage_dashboard_predict(inputs):
+    from model_bundle import load_bundle
+    bundle = load_bundle()
+    X = inputs['model_table'][bundle.features].fillna(0).to_numpy(dtype=np.float32)
+
+    def predict():
+        return [bundle.predict_labels(name, X) for name in bundle.model_names]
+    return predict
+
+
+STAGES = {
+    'popularity_score': {'build': _stage_popularity_score, 'max_rows': None},
+    'simplify_genre': {'build': _stage_simplify_genre, 'max_rows': None},
+    'process_time_features': {'build': _stage_process_time_features, 'max_rows': None},
+    'impute_sentiment': {'build': _stage_impute_sentiment, 'max_rows': 20_000},    # ~3.4 GB at 20k rows
+    'model_training': {'build': _stage_model_training, 'max_rows': 100_000},
+    'dashboard_predict': {'build': _stage_dashboard_predict, 'max_rows': None},
+}
+
+
+def prepare_inputs(n_rows, seed, tmp_dir):
+    """Generates the synthetic catalog / model table for one size (not timed)."""
+    catalog = generate_catalog(n_rows, seed)
+    catalog_csv = os.path.join(tmp_dir, f'catalog_{n_rows}.csv')
+    catalog.to_csv(catalog_csv, index=False)
+    return {'catalog': catalog, 'catalog_csv': catalog_csv, 'model_table': generate_model_table(n_rows, seed)}
+
+
+def run_stage(fn, repeat=1, measure_memory=True):
+    """
+    Best-of-`repeat` wall time, then one tracemalloc pass for peak memory. tracemalloc sees
+    Python and numpy allocations, not the native heaps of xgboost / lightgbm.
+    """
+    seconds = float('inf')
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            seconds = min(seconds, time.perf_counter() - start)
+    if result is None:
+        raise RuntimeError("stage returned None (see its printed error)")
+    peak_mb = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return {'seconds': seconds, 'peak_mb': peak_mb}
+
+
+def run_suite(sizes, stages, seed=DEFAULT_SEED, repeat=1, measure_memory=True, limits=True):
+    results = {name: {} for name in stages}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in sizes:
+            print(f"\n--- {n_rows:,} rows ---")
+            inputs = prepare_inputs(n_rows, seed, tmp_dir)
+            for name in stages:
+                max_rows = STAGES[name]['max_rows']
+                if limits and max_rows is not None and n_rows > max_rows:
+                    results[name][str(n_rows)] = {'skipped': f'above max_rows={max_rows:,}'}
+                    print(f"  {name:<24} skipped (above {max_rows:,} rows)")
+                    continue
+                try:
+                    record = run_stage(STAGES[name]['build'](inputs), repeat, measure_memory)
+                except Exception as e:
+                    results[name][str(n_rows)] = {'error': str(e)}
+                    print(f"  {name:<24} ERROR: {e}")
+                    continue
+                results[name][str(n_rows)] = record
+                memory = '' if record['peak_mb'] is None else f" | peak {record['peak_mb']:9.1f} MB"
+                print(f"  {name:<24} {record['seconds']:9.3f} s{memory}")
+    return results
+
+
+# ==============================================================================
+# HISTORY & REGRESSION CHECK
+# ==============================================================================
+def load_history(path=HISTORY_JSON):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def append_history(run, path=HISTORY_JSON):
+    history = load_history(path)
+    history.append(run)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+
+def find_regressions(baseline, current):
+    """
+    Lists stage/size pairs that got slower or hungrier than the baseline beyond tolerance, or
+    that ran in the baseline and now fail.
+    """
+    regressions = []
+    for stage, by_size in current['results'].items():
+        for size, record in by_size.items():
+            base = baseline['results'].get(stage, {}).get(size)
+            if not base or 'seconds' not in base:
+                continue
+            if 'error' in record:
+                regressions.append(f"{stage} @ {int(size):,} rows: ran in {base['seconds']:.3f}s, now fails: "
+                                   f"{record['error']}")
+                continue
+            if 'seconds' not in record:
+                continue
+            delta = record['seconds'] - base['seconds']
+            if delta > MIN_TIME_DELTA_S and record['seconds'] > base['seconds'] * (1 + TIME_TOLERANCE):
+                regressions.append(f"{stage} @ {int(size):,} rows: {base['seconds']:.3f}s -> {record['seconds']:.3f}s")
+            if base.get('peak_mb') is not None and record.get('peak_mb') is not None:
+                delta_mb = record['peak_mb'] - base['peak_mb']
+                if delta_mb > MIN_MEMORY_DELTA_MB and record['peak_mb'] > base['peak_mb'] * (1 + MEMORY_TOLERANCE):
+                    regressions.append(f"{stage} @ {int(size):,} rows: peak {base['peak_mb']:.1f} MB -> "
+                                       f"{record['peak_mb']:.1f} MB")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage-by-stage pipeline benchmarks on synthetic catalogs.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=1, help="Timed runs per stage (best is kept).")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak-memory pass.")
+    parser.add_argument('--no-limits', action='store_true', help="Ignore per-stage max_rows caps.")
+    parser.add_argument('--compare', action='store_true',
+                        help="Fail (exit 1) if any stage regressed against the last recorded run.")
+    parser.add_argument('--no-record', action='store_true', help="Do not append this run to the history.")
+    parser.add_argument('--history', default=HISTORY_JSON)
+    args = parser.parse_args()
+    start_tracing('benchmark_suite')
+
+    run = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'seed': args.seed,
+        'results': run_suite(args.sizes, args.stages, args.seed, args.repeat,
+                             not args.no_memory, not args.no_limits),
+    }
+
+    exit_code = 0
+    if args.compare:
+        previous = [r for r in load_history(args.history) if r.get('seed') == args.seed]
+        if not previous:
+            print("\nNo previous run with this seed to compare against.")
+        else:
+            regressions = find_regressions(previous[-1], run)
+            print(f"\n--- Comparison against run from {previous[-1]['timestamp']} ({previous[-1]['commit']}) ---")
+            if regressions:
+                for line in regressions:
+                    print(f"  ❌ {line}")
+                exit_code = 1
+            else:
+                print("  ✅ No regressions.")
+
+    if exit_code:
+        # A regressed run must not become the baseline the next --compare is measured against
+        print(f"\nRun not recorded in '{args.history}': it failed the comparison.")
+    elif not args.no_record:
+        append_history(run, args.history)
+        print(f"\nRun recorded in '{args.history}'.")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import argparse
+import functools
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, span, start_tracing
+
+# --- Configuration ---
+DB_FILE = "dataset/catalog.sqlite"
+TABLE = 'movies'
+# Columns every collector shares; anything else a collector writes is added on first use
+BASE_COLUMNS = {
+    'Title': 'TEXT', 'Year': 'INTEGER', 'Language': 'TEXT', 'Release Date': 'TEXT',
+    'Genre': 'TEXT', 'Director': 'TEXT', 'Production Company': 'TEXT', 'Runtime (min)': 'REAL',
+    'Day1_collection_cr': 'REAL',
+}
+KEY_COLUMNS = ['title_key', 'year_key', 'language_key']
+DEFAULT_LANGUAGE = 'Hindi'
+BATCH_ROWS = 5_000
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%d %b, %Y', '%d %b %Y', '%d %B, %Y', '%d %B %Y', '%b %d, %Y', '%d/%m/%Y']
+
+
+# ==============================================================================
+# KEYS
+# ==============================================================================
+def normalize_title(title):
+    """
+    Case-, accent-, punctuation- and whitespace-insensitive form of a title. Titles with no
+    Latin letters or digits (Devanagari, Tamil, ...) keep their own letters and vowel signs.
+    """
+    if title is None or (isinstance(title, float) and np.isnan(title)):
+        return ''
+    text = unicodedata.normalize('NFKD', str(title)).encode('ascii', 'ignore').decode()
+    text = re.sub(r'[^a-z0-9]+', ' ', text.casefold())
+    if not text.strip():
+        # \w would split words at combining vowel signs, so keep letters, marks and numbers by category
+        text = ''.join(c if unicodedata.category(c)[0] in 'LMN' else ' '
+                       for c in unicodedata.normalize('NFKC', str(title)).casefold())
+    return ' '.join(text.split())
+
+
+def year_key(value):
+    """Release year as an int, 0 when unknown (NULL would defeat the unique key)."""
+    try:
+        year = int(float(value))
+    except (TypeError, ValueError):
+        return 0
+    return year if 1800 < year < 2200 else 0
+
+
+def language_key(value):
+    value = _clean(value)
+    return str(value).strip().casefold() if value else DEFAULT_LANGUAGE.casefold()
+
+
+def movie_key(record):
+    """(title_key, year_key, language_key) of a record with Title and, when known, Year/Language."""
+    return normalize_title(record.get('Title')), year_key(record.get('Year')), language_key(record.get('Language'))
+
+
+@functools.lru_cache(maxsize=4096)
+def iso_date(value):
+    """ISO date from the formats the collectors write ('15-08-2024', '15 Aug, 2024', '2024-08-15')."""
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+
+def _clean(value):
+    """Python value sqlite3 can store: None for NaN/NA, plain ints/floats for numpy scalars."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, np.generic):
+        return _clean(value.item())
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    return value
+
+
+# ==============================================================================
+# STORE
+# ==============================================================================
+class CatalogStore:
+    """
+    The movie catalog in one SQLite table, one row per normalized (title, year, language).
+    Collectors upsert partial records (new non-null values win, nulls never erase) and stages
+    read only the columns they need. Indexed on the title key and the ISO release date.
+    """
+
+    def __init__(self, path=DB_FILE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')     # readers do not block the writing collector
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        columns = ', '.join(f'"{name}" {kind}' for name, kind in BASE_COLUMNS.items())
+        with self.conn:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {TABLE} (
+                    id INTEGER PRIMARY KEY,
+                    title_key TEXT NOT NULL, year_key INTEGER NOT NULL, language_key TEXT NOT NULL,
+                    release_date TEXT, updated_at REAL,
+                    {columns},
+                    UNIQUE (title_key, year_key, language_key))""")
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{TABLE}_title ON {TABLE} (title_key)')
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{TABLE}_release ON {TABLE} (release_date)')
+        self._columns = self._table_columns()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _table_columns(self):
+        return {row[1].casefold(): row[1] for row in self.conn.execute(f'PRAGMA table_info({TABLE})')}
+
+    def _ensure_columns(self, names):
+        for name in names:
+            if name.casefold() not in self._columns:
+                self.conn.execute(f'ALTER TABLE {TABLE} ADD COLUMN "{name}"')
+                self._columns[name.casefold()] = name
+
+    def __len__(self):
+        return self.conn.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0]
+
+    # --- writes ---
+    def upsert(self, records):
+        """
+        Inserts new movies and fills in known ones from a DataFrame or list of dicts with at
+        least 'Title' (plus 'Year'/'Language' when known). Returns (inserted, updated).
+        """
+        if isinstance(records, pd.DataFrame):
+            records = records.rename(columns=lambda c: str(c).strip()).to_dict('records')
+        records = [r for r in records if normalize_title(r.get('Title'))]
+        if not records:
+            return 0, 0
+        data_columns = list(dict.fromkeys(name for record in records for name in record))
+        data_columns += ['release_date', 'updated_at']
+        now = time.time()
+        rows = []
+        for record in records:
+            release = _clean(record.get('Release Date'))
+            values = {**record, 'release_date': iso_date(release) if release else None, 'updated_at': now}
+            rows.append(movie_key(record) + tuple(_clean(values.get(name)) for name in data_columns))
+
+        last_id = self.conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {TABLE}').fetchone()[0]
+        with span('catalog upsert', 'io', rows=len(rows)), self.conn:
+            self._ensure_columns(data_columns)
+            names = KEY_COLUMNS + data_columns
+            quoted = ', '.join(f'"{n}"' for n in names)
+            # New non-null values win; a null from a partial record keeps what is stored
+            updates = ', '.join(f'"{n}" = COALESCE(excluded."{n}", {TABLE}."{n}")' for n in data_columns)
+            sql = (f'INSERT INTO {TABLE} ({quoted}) VALUES ({", ".join("?" * len(names))}) '
+                   f'ON CONFLICT (title_key, year_key, language_key) DO UPDATE SET {updates}')
+            self.conn.executemany(sql, rows)
+        # Rows past the previous last id are new (a rowid range, not a table scan)
+        inserted = self.conn.execute(f'SELECT COUNT(*) FROM {TABLE} WHERE id > ?', (last_id,)).fetchone()[0]
+        count('catalog rows inserted', inserted)
+        return inserted, len(rows) - inserted
+
+    def import_csv(self, path, language=None):
+        """Upserts every row of a collector CSV in batches; returns (inserted, updated)."""
+        from dataset_io import read_csv
+        totals = np.zeros(2, dtype=int)
+        for chunk in read_csv(path, chunksize=BATCH_ROWS):
+            chunk.columns = chunk.columns.str.strip()
+            if language and 'Language' not in chunk:
+                chunk['Language'] = language
+            totals += self.upsert(chunk)
+        return tuple(int(t) for t in totals)
+
+    # --- reads ---
+    def keys(self, language=None):
+        """Set of (title_key, year_key) already in the catalog, optionally for one language."""
+        sql, params = f'SELECT title_key, year_key FROM {TABLE}', ()
+        if language:
+            sql, params = sql + ' WHERE language_key = ?', (language.casefold(),)
+        return set(self.conn.execute(sql, params).fetchall())
+
+    def titles(self, language=None):
+        """Set of normalized titles in the catalog, optionally for one language."""
+        return {title for title, _ in self.keys(language)}
+
+    def read(self, columns=None, language=None, missing=None, where=None, params=()):
+        """
+        A column projection of the catalog as a DataFrame. `language` filters on the key,
+        `missing` keeps rows where that column is still empty, `where` adds raw SQL.
+        """
+        if columns is None:
+            selected = [name for key, name in self._columns.items()
+                        if key not in ('id', 'title_key', 'year_key', 'language_key', 'release_date', 'updated_at')]
+        else:
+            self._ensure_columns(columns)
+            selected = list(columns)
+        clauses, args = [], list(params)
+        if language:
+            clauses.append('language_key = ?')
+            args.append(language.casefold())
+        if missing:
+            self._ensure_columns([missing])
+            clauses.append(f'"{missing}" IS NULL')
+        if where:
+            clauses.append(f'({where})')
+        sql = f'SELECT {", ".join(f"{chr(34)}{c}{chr(34)}" for c in selected)} FROM {TABLE}'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        with span('catalog read', 'io', columns=len(selected)):
+            return pd.read_sql_query(sql + ' ORDER BY id', self.conn, params=args)
+
+    def released_between(self, start, end, columns=None):
+        """Movies released in [start, end] (ISO dates), via the release-date index."""
+        return self.read(columns, where='release_date BETWEEN ? AND ?', params=(start, end))
+
+
+def read_catalog(columns=None, language=None, path=DB_FILE):
+    """Column projection of the catalog for pipeline stages."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Catalog '{path}' not found. Run: python catalog_store.py import <csv>")
+    with CatalogStore(path) as store:
+        return store.read(columns, language)
+
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+def benchmark(n_rows, path, checkpoint_rows=50):
+    """
+    Filling one column for half the catalog, as the scrapers do: iterrows + df.loc writes with
+    a full CSV checkpoint every `checkpoint_rows` rows, vs one upsert per checkpoint batch.
+    """
+    import tempfile
+    from synthetic_catalog import generate_catalog
+    catalog = generate_catalog(n_rows)[['Title', 'Year', 'Language', 'Director', 'Day1_collection_cr']]
+    updates = catalog.sample(frac=0.5, random_state=0)[['Title', 'Year', 'Language']].assign(**{'Runtime (min)': 140.0})
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        df = catalog.copy()
+        df['Runtime (min)'] = np.nan
+        targets = set(zip(updates['Title'], updates['Year']))
+        measured = min(len(df), 2_000)   # the loop is extrapolated past this many rows, it is that slow
+        start = time.perf_counter()
+        for index, row in df.iterrows():
+            if (row['Title'], row['Year']) in targets:
+                df.loc[index, 'Runtime (min)'] = 140.0
+            if (index + 1) % checkpoint_rows == 0:
+                df.to_csv(os.path.join(tmp, 'checkpoint.csv'), index=False)
+            if index + 1 >= measured:
+                break
+        rows.append(('CSV: iterrows + df.loc + checkpoint', (time.perf_counter() - start) * len(df) / measured))
+
+    if os.path.exists(path):
+        os.remove(path)
+    with CatalogStore(path) as store:
+        store.upsert(catalog)
+        start = time.perf_counter()
+        todo = store.read(['Title', 'Year', 'Language'], missing='Runtime (min)')
+        for begin in range(0, len(updates), checkpoint_rows):
+            store.upsert(updates.iloc[begin:begin + checkpoint_rows])
+        rows.append(('Catalog: projection + batched upserts', time.perf_counter() - start))
+        filled = store.read(['Title'], where='"Runtime (min)" IS NOT NULL')
+    os.remove(path)
+    assert len(todo) == len(catalog.drop_duplicates(['Title', 'Year', 'Language']))
+    assert len(filled) == len(updates.drop_duplicates(['Title', 'Year', 'Language']))
+    return pd.DataFrame(rows, columns=['Approach', 'Seconds']).assign(
+        **{'Rows/s': lambda t: len(catalog) / t['Seconds']})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Movie catalog store shared by the collectors.")
+    parser.add_argument('command', choices=['import', 'export', 'stats', 'benchmark'])
+    parser.add_argument('paths', nargs='*', help="import: collector CSVs; export: output CSV.")
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--language', default=None, help="Language of rows without a Language column.")
+    parser.add_argument('--columns', nargs='*', default=None, help="export: columns to write.")
+    parser.add_argument('--rows', type=int, default=100_000, help="benchmark: catalog size.")
+    args = parser.parse_args()
+    start_tracing('catalog_store')
+
+    try:
+        if args.command == 'benchmark':
+            print(benchmark(args.rows, args.db + '.benchmark').to_string(index=False))
+        else:
+            with CatalogStore(args.db) as store:
+                if args.command == 'import':
+                    for path in args.paths:
+                        inserted, updated = store.import_csv(path, args.language)
+                        print(f"✅ '{path}': {inserted:,} new movies, {updated:,} updated.")
+                elif args.command == 'export':
+                    df = store.read(args.columns, args.language)
+                    df.to_csv(args.paths[0], index=False)
+                    print(f"✅ {len(df):,} movies written to '{args.paths[0]}'.")
+                print(f"Catalog '{args.db}': {len(store):,} movies.")
+                if args.command == 'stats':
+                    print(store.read(['Language']).value_counts().to_string())
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,195 @@
+import argparse
+import re
+from itertools import zip_longest
+from urllib.parse import quote_plus, unquote
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from catalog_store import DB_FILE, CatalogStore
+from http_client import HOST_LIMITS, Client
+from instrumentation import count, start_tracing
+from page_archive import ARCHIVE_DIR, PageArchive
+from page_pipeline import PARSE_PROCESSES, FetchParsePipeline
+
+# --- Configuration ---
+COLUMN_NAME = 'Day1_collection_cr'
+BH_BASE_URL = 'https://www.bollywoodhungama.com'
+GOOGLE_SEARCH_URL = "https://www.google.com/search?q="
+WORKERS_PER_LANGUAGE = 2   # fetcher threads per language
+SACNILK_LINK = re.compile(r'href="(?:/url\?q=)?(https://www\.sacnilk\.com/articles/[^"&]+)')
+CHECKPOINT_ROWS = 25
+
+# What differs between the per-language scrapers, as data. Slug: characters dropped, separators
+# turned into '-', and a suffix. Tables: CSS selectors tried in order. Labels: the Day 1 row
+# (None = first data row). Sources are tried in order until one has the value.
+LANGUAGE_PROFILES = {
+    'Hindi': {
+        'slug': {'drop': r'[^a-z0-9\s-]', 'separators': r'\s+', 'suffix': ''},
+        'sources': ['sacnilk', 'bollywoodhungama'],
+        'bh_tables': ['table.table-box-office'],
+        'day1_labels': ['Day 1'],
+        'search_language': 'hindi',
+    },
+    'English': {
+        'slug': {'drop': r'[^a-z0-9\s:-]', 'separators': r'[:\s]+', 'suffix': '-english'},
+        'sources': ['bollywoodhungama'],
+        'bh_tables': ['table.table.table-bordered.table-striped', 'div.table-responsive table'],
+        'day1_labels': ['Day 1', 'Opening Day'],
+        'search_language': 'english',
+    },
+    'Tamil': {
+        'slug': {'drop': r'[^a-z0-9\s:-]', 'separators': r'[:\s]+', 'suffix': ''},
+        'sources': ['bollywoodhungama'],
+        'bh_tables': ['table.tablesaw.tablesaw-swipe'],
+        'day1_labels': None,
+        'search_language': 'tamil',
+    },
+}
+
+
+# ==============================================================================
+# SLUGS AND EXTRACTORS
+# ==============================================================================
+def bh_slug(title, profile):
+    """Bollywood Hungama URL slug of a title under a language's slug rules."""
+    rules = profile['slug']
+    slug = re.sub(r'\(.*\)', '', str(title).lower()).strip()   # drop "(2018)" and similar
+    slug = re.sub(rules['drop'], '', slug)
+    slug = re.sub(rules['separators'], '-', slug)
+    return slug + rules['suffix']
+
+
+def extract_day1(html, selectors, labels):
+    """Day 1 figure (crore) from the first table matching one of `selectors`, or None. Runs in a parse process."""
+    soup = BeautifulSoup(html, 'html.parser')
+    table = next((t for t in (soup.select_one(s) for s in selectors) if t is not None), None)
+    if table is None:
+        return None
+    for row in table.find_all('tr'):
+        cells = row.find_all(['td', 'th'])
+        if len(cells) < 2 or (cells[0].name == 'th' and labels is None):
+            continue
+        if labels is None or any(label in cells[0].text.strip() for label in labels):
+            # e.g. "Rs. 36.50 cr." -> 36.5
+            value_match = re.search(r'\d[\d\.]*', cells[1].text.strip())
+            return float(value_match.group(0)) if value_match else None
+    return None
+
+
+def scrape_bh_day1(client, profile, movie):
+    """Fetches the movie's Bollywood Hungama box-office page; returns its parse job or None."""
+    html = client.get_text(f"{BH_BASE_URL}/movie/{bh_slug(movie['Title'], profile)}/box-office/")
+    return (extract_day1, (html, profile['bh_tables'], profile['day1_labels'])) if html else None
+
+
+def scrape_sacnilk_day1(client, profile, movie):
+    """Fetches the Sacnilk article a web search finds for the movie; returns its parse job or None."""
+    query = (f'"{movie["Title"]} {movie["Year"]} {profile["search_language"]} movie box office collection '
+             f'site:sacnilk.com"')
+    html = client.get_text(GOOGLE_SEARCH_URL + quote_plus(query))
+    # A regex, not a parse: finding one link is cheap enough for the fetcher thread
+    match = SACNILK_LINK.search(html) if html else None
+    if not match:
+        return None
+    html = client.get_text(unquote(match.group(1)))
+    return (extract_day1, (html, ['table[class*=kborder]'], ['Day 1'])) if html else None
+
+
+SOURCES = {'sacnilk': scrape_sacnilk_day1, 'bollywoodhungama': scrape_bh_day1}
+
+
+# ==============================================================================
+# ENGINE
+# ==============================================================================
+def interleave(todo):
+    """[(language, movie, source index 0)], alternating languages so every language starts at once."""
+    queues = [[(language, movie, 0) for movie in movies.to_dict('records')] for language, movies in todo.items()]
+    return [item for group in zip_longest(*queues) for item in group if item is not None]
+
+
+def fetch_page(client, item):
+    """Pipeline fetch step: the page of the item's current source, as a parse job."""
+    language, movie, source_index = item
+    profile = LANGUAGE_PROFILES[language]
+    return SOURCES[profile['sources'][source_index]](client, profile, movie)
+
+
+def run_collection(languages, workers_per_language=WORKERS_PER_LANGUAGE, limit=None, db=DB_FILE,
+                   limits=HOST_LIMITS, parsers=PARSE_PROCESSES, archive=ARCHIVE_DIR, client=None, refresh=False):
+    """
+    Fills the missing Day 1 collections of `languages` in the catalog. Fetcher threads for every
+    language share one client (pool, per-host limits, retries, circuit breakers) and queue raw pages;
+    a process pool parses them. A movie not found on one source is queued for the next. The main
+    thread is the only catalog writer and upserts per checkpoint. Fetched pages go to the `archive`
+    directory (None: not kept). `client` replaces the HTTP client, e.g. page_archive.ArchivedPages
+    to re-extract offline; `refresh` re-does every movie, not only those still missing the value.
+    Returns (per-language summary, per-client report, per-stage pipeline report).
+    """
+    unknown = [language for language in languages if language not in LANGUAGE_PROFILES]
+    if unknown:
+        raise ValueError(f"No language profile for {unknown}; known: {list(LANGUAGE_PROFILES)}")
+    with CatalogStore(db) as store:
+        missing = None if refresh else COLUMN_NAME
+        todo = {language: store.read(['Title', 'Year', 'Language'], language=language, missing=missing)
+                for language in languages}
+        if limit:
+            todo = {language: movies.head(limit) for language, movies in todo.items()}
+        for language, movies in todo.items():
+            print(f"{language}: {len(movies)} movies {'to re-extract' if refresh else 'without a Day 1 collection'}.")
+
+        pages = PageArchive(archive) if archive and client is None else None
+        client = client or Client(limits, archive=pages)
+        summary = {language: {'Movies': len(todo[language]), 'Found': 0} for language in languages}
+        pending = []
+
+        def on_result(item, value):
+            language, movie, source_index = item
+            sources = LANGUAGE_PROFILES[language]['sources']
+            if value is None:
+                if source_index + 1 < len(sources):
+                    return [(language, movie, source_index + 1)]   # try the next source
+                count('not found')
+                return None
+            count(f'found on {sources[source_index]}')
+            summary[language]['Found'] += 1
+            pending.append({**movie, COLUMN_NAME: value})
+            if len(pending) >= CHECKPOINT_ROWS:
+                store.upsert(pending)
+                pending.clear()
+            return None
+
+        pipeline = FetchParsePipeline(client, fetchers=max(1, workers_per_language * len(languages)),
+                                      parsers=parsers)
+        try:
+            stages = pipeline.run(interleave(todo), fetch_page, on_result)
+        finally:
+            if pages is not None:
+                pages.close()
+        store.upsert(pending)
+
+    summary = pd.DataFrame([{'Language': language, **stats} for language, stats in summary.items()])
+    return summary.assign(Seconds=stages['Wall s'].iloc[0]), client.report(), stages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill missing Day 1 collections for several languages at once.")
+    parser.add_argument('--languages', nargs='+', default=list(LANGUAGE_PROFILES), choices=list(LANGUAGE_PROFILES))
+    parser.add_argument('--workers', type=int, default=WORKERS_PER_LANGUAGE, help="Fetcher threads per language.")
+    parser.add_argument('--parsers', type=int, default=PARSE_PROCESSES, help="Parse processes.")
+    parser.add_argument('--limit', type=int, default=None, help="At most this many movies per language.")
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--archive', default=ARCHIVE_DIR, help="Where fetched pages are kept.")
+    parser.add_argument('--no-archive', action='store_true', help="Do not keep fetched pages.")
+    args = parser.parse_args()
+    start_tracing('collection_engine')
+
+    try:
+        summary, hosts, stages = run_collection(args.languages, args.workers, args.limit, args.db, parsers=args.parsers,
+                                                archive=None if args.no_archive else args.archive)
+        print(summary.to_string(index=False))
+        print(hosts.to_string(index=False))
+        print(stages.to_string(index=False))
+        print(f"\n✅ Collection complete. The new data is saved in '{args.db}'.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -1,14 +1,28 @@
+import time
+_SCRIPT_START = time.perf_counter()
+
+import io
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
-import os
-import matplotlib.pyplot as plt
-import seaborn as sns
 
+# matplotlib / seaborn are imported by the views that draw with them, and models are
+# loaded by the bundle on first use, so a page only pays for what it shows
+from ensemble import load_ensemble
+from model_bundle import load_bundle, prepare_features
+from what_if import SWEEP_RANGES, response_surface
 
-MODEL_DIR = "dataset/models"
 VISUALS_DIR = "dataset/visuals"
+METRICS_CSV = os.path.join(VISUALS_DIR, 'model_comparison_results.csv')
+CUBE_FILE = os.path.join(VISUALS_DIR, 'eda_cube.npz')
+CUBE_CHART_ROWS = 20
+CUBE_STATISTICS = {'Movies': 'Number of movies', 'Mean': 'Mean Day 1 (Cr)', 'Median': 'Median Day 1 (Cr)',
+                   'Q25': '25th percentile Day 1 (Cr)', 'Q75': '75th percentile Day 1 (Cr)',
+                   'Q90': '90th percentile Day 1 (Cr)'}
+PAGES = ["🤖 Predictor", "🔬 What-if", "📈 Model Comparison", "🖼️ EDA Visuals"]
+PREDICTION_CACHE_SIZE = 1024
+WHAT_IF_CACHE_SIZE = 64
 
 st.set_page_config(page_title="Box Office Predictor", layout="wide")
 
@@ -18,12 +32,14 @@ st.set_page_config(page_title="Box Office Predictor", layout="wide")
 def load_assets():
     try:
         assets = {}
-        assets['rf'] = joblib.load(os.path.join(MODEL_DIR, 'random_forest_model.pkl'))
-        assets['xgb'] = joblib.load(os.path.join(MODEL_DIR, 'xgboost_model.pkl'))
-        assets['lgbm'] = joblib.load(os.path.join(MODEL_DIR, 'lightgbm_model.pkl'))
-        assets['le'] = joblib.load(os.path.join(MODEL_DIR, 'label_encoder.pkl'))
-        assets['features'] = joblib.load(os.path.join(MODEL_DIR, 'feature_names.pkl'))
-        assets['metrics'] = pd.read_csv(os.path.join(VISUALS_DIR, 'model_comparison_results.csv'))
+        # Models inside the bundle are loaded lazily on their first prediction
+        assets['bundle'] = load_bundle()
+        assets['features'] = assets['bundle'].features
+        # Soft vote with the weights fitted by ensemble.py (equal weights if none fit this bundle)
+        assets['ensemble'] = load_ensemble(assets['bundle'])
+        assets['feature_index'] = {name: i for i, name in enumerate(assets['features'])}
+        if not os.path.exists(METRICS_CSV):
+            return None
         return assets
     except FileNotFoundError:
         return None
@@ -35,6 +51,86 @@ if assets is None:
     st.error("System Error: Models not found. Please run the training script first.")
     st.stop()
 
+
+@st.cache_resource
+def load_explanations():
+    # Precomputed by explanations.py; new inputs are explained on the fly against its background
+    from explanations import load_cache
+    try:
+        return load_cache(assets['bundle'])
+    except ValueError:
+        return None
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+# Built by aggregate_cube.py; keyed by its modification time, so a rebuild is picked up
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_eda_cube(mtime):
+    from aggregate_cube import AggregateCube
+    return AggregateCube(CUBE_FILE)
+
+
+# Keyed by the file's modification time, so a retrain refreshes the table and charts
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_metrics(mtime):
+    return pd.read_csv(METRICS_CSV)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def metric_chart_png(metric_name, color_palette, mtime):
+    """Bar chart of one metric per model, rendered once per metrics file version as PNG bytes."""
+    plt = _pyplot()
+    import seaborn as sns
+    fig, ax = plt.subplots()
+    sns.barplot(data=load_metrics(mtime), x='Model', y=metric_name, hue='Model', palette=color_palette,
+                legend=False, ax=ax)
+    ax.set_title(f'{metric_name} by Model')
+    ax.set_ylim(0, 1.0)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def build_input(inputs):
+    """
+    (feature, value) pairs -> model input row, built by the same prepare_features as batch
+    predictions; features the models do not use are ignored, features not given are 0.
+    """
+    return prepare_features(pd.DataFrame([dict(inputs)]), assets['features'])
+
+
+# Shared by every session, so the same inputs are only scored once (bounded LRU)
+@st.cache_data(max_entries=PREDICTION_CACHE_SIZE, show_spinner=False)
+def predict_cached(inputs):
+    """Label and class probabilities of every model and the ensemble for one input tuple."""
+    results = assets['ensemble'].predict_all(build_input(inputs))
+    return {name: (labels[0], proba[0]) for name, (labels, proba) in results.items()}
+
+
+@st.cache_data(max_entries=WHAT_IF_CACHE_SIZE, show_spinner=False)
+def what_if_cached(inputs, swept, points, model_name):
+    """Class probabilities of one model over a grid around the inputs, scored in one batched call."""
+    start = time.perf_counter()
+    values, surfaces = response_surface(assets['bundle'], build_input(inputs), assets['feature_index'],
+                                        swept, points, [model_name])
+    return values, surfaces[model_name], time.perf_counter() - start
+
+
+@st.cache_data(max_entries=PREDICTION_CACHE_SIZE, show_spinner=False)
+def explain_cached(inputs, name, label):
+    """SHAP contributions of every feature towards `label` for one input tuple, plus whether it was cached."""
+    shap_values, _, hits = load_explanations().explain(name, build_input(inputs).astype(np.float64))
+    class_idx = list(assets['bundle'].classes).index(label)
+    return pd.Series(shap_values[0, :, class_idx], index=assets['features'], name='Contribution'), bool(hits)
+
+
 #Sidebar params
 st.sidebar.header("🎬 Movie Details Predictor")
 
@@ -67,86 +163,133 @@ st.sidebar.subheader("Genre (Select Primary)")
 genre_options = ['Drama', 'Comedy', 'Action', 'Thriller', 'Romance', 'Crime', 'Other']
 selected_genres = st.sidebar.multiselect("Select Genres", genre_options, default=['Action'])
 
+# The inputs as a hashable tuple: the cache key and the source of the feature row
+inputs = (
+    ('Production_House_Score', score_prod),
+    ('Director_Score', score_dir),
+    ('Runtime (min)', runtime),
+    ('Release_Year', rel_year),
+    ('Release_Month', rel_month),
+    ('Release_Day_of_Week', rel_day),
+    ('Promotion_Duration_Days', promo_days),
+    ('avg_sentiment', avg_sent),
+    ('median_sentiment', med_sent),
+    ('viewCount', views),
+    ('likeCount', likes),
+    ('commentCount', comments),
+) + tuple((f'Genre_{genre}', 1) for genre in sorted(selected_genres))
+
 #Main pg
 st.title("📊 Box Office Prediction Dashboard")
 
 
-tab1, tab2, tab3 = st.tabs(["🤖 Predictor", "📈 Model Comparison", "🖼️ EDA Visuals"])
+# Only the selected page runs (st.tabs would execute every tab on each rerun)
+page = st.radio("Page", PAGES, horizontal=True, label_visibility="collapsed")
 
 #Predictor tab
-with tab1:
+if page == PAGES[0]:
     st.subheader("Predict Day 1 Collection Category")
 
     if st.button("Predict Results", type="primary", use_container_width=True):
-        # 1. Build Input DataFrame
-        input_data = pd.DataFrame(columns=assets['features'])
-        input_data.loc[0] = 0  # Init with 0s
-
-        # Fill numeric/score features
-        input_data['Production_House_Score'] = score_prod
-        input_data['Director_Score'] = score_dir
-        input_data['Runtime (min)'] = runtime
-        input_data['Release_Year'] = rel_year
-        input_data['Release_Month'] = rel_month
-        input_data['Release_Day_of_Week'] = rel_day
-        input_data['Promotion_Duration_Days'] = promo_days
-        input_data['avg_sentiment'] = avg_sent
-        input_data['median_sentiment'] = med_sent
-        input_data['viewCount'] = views
-        input_data['likeCount'] = likes
-        input_data['commentCount'] = comments
-
-
-        for genre in selected_genres:
-            col_name = f'Genre_{genre}'
-            if col_name in input_data.columns:
-                input_data[col_name] = 1
-
-
-        pred_rf = assets['rf'].predict(input_data)[0]
-        pred_xgb = assets['xgb'].predict(input_data)[0]
-        pred_lgbm = assets['lgbm'].predict(input_data)[0]
-
-        #Decode labels
-        label_rf = assets['le'].inverse_transform([pred_rf])[0]
-        label_xgb = assets['le'].inverse_transform([pred_xgb])[0]
-        label_lgbm = assets['le'].inverse_transform([pred_lgbm])[0]
+        ensemble = assets['ensemble']
+        # One fused call: every model's probabilities and their weighted soft vote (cached across reruns and sessions)
+        predictions = predict_cached(inputs)
+        label_ens, probs = predictions['Ensemble']
+        label_rf = predictions['Random Forest'][0]
+        label_xgb = predictions['XGBoost'][0]
+        label_lgbm = predictions['LightGBM'][0]
 
         # sho the res
-        c1, c2, c3 = st.columns(3)
-        c1.metric("Random Forest", label_rf)
-        c2.metric("XGBoost", label_xgb)
-        c3.metric("LightGBM", label_lgbm)
+        c0, c1, c2, c3 = st.columns(4)
+        c0.metric("Ensemble", label_ens, f"{probs.max():.0%} confidence", delta_color="off")
+        c1.metric("Random Forest", label_rf, f"{predictions['Random Forest'][1].max():.0%}", delta_color="off")
+        c2.metric("XGBoost", label_xgb, f"{predictions['XGBoost'][1].max():.0%}", delta_color="off")
+        c3.metric("LightGBM", label_lgbm, f"{predictions['LightGBM'][1].max():.0%}", delta_color="off")
 
 
         st.markdown("---")
-        st.write("### Confidence Levels (Random Forest)")
-        probs = assets['rf'].predict_proba(input_data)[0]
-        prob_df = pd.DataFrame(probs, index=assets['le'].classes_, columns=['Probability'])
+        st.write("### Confidence Levels (Ensemble)")
+        prob_df = pd.DataFrame(probs, index=ensemble.classes, columns=['Probability'])
         st.bar_chart(prob_df)
+        weights = ", ".join(f"{name} {w:.2f}" for name, w in ensemble.weights.items())
+        st.caption(f"Weights: {weights}" if ensemble.learned else
+                   "Equal weights: run `python ensemble.py` to fit them on validation data.")
+
+        st.markdown("---")
+        st.write("### Why this prediction?")
+        explanations = load_explanations()
+        if explanations is None:
+            st.info("No explanation cache found. Run `python explanations.py` to enable explanations.")
+        else:
+            labels = {'Random Forest': label_rf, 'XGBoost': label_xgb, 'LightGBM': label_lgbm}
+            for tab, name in zip(st.tabs(list(labels)), labels):
+                contrib, hits = explain_cached(inputs, name, labels[name])
+                tab.bar_chart(contrib[contrib.abs().sort_values(ascending=False).index[:10]])
+                unit = "probability" if name == 'Random Forest' else "log-odds"
+                source = "cached" if hits else "computed now"
+                tab.caption(f"Top feature contributions towards '{labels[name]}' ({unit}, {source}).")
+
+# What-if tab: sweep one or two inputs around the sidebar values
+elif page == PAGES[1]:
+    st.subheader("What-if Sensitivity")
+    st.caption("Every variant keeps the sidebar values except the swept features. "
+               "The whole grid is scored in one batched call per model.")
+    bundle = assets['bundle']
+    sweepable = [name for name in SWEEP_RANGES if name in assets['feature_index']]
+    w1, w2, w3 = st.columns(3)
+    model_name = w1.selectbox("Model", bundle.model_names)
+    swept = w2.multiselect("Features to sweep (1 or 2)", sweepable, default=['Promotion_Duration_Days'],
+                           max_selections=2)
+    if len(swept) < 2:
+        points = w3.slider("Grid points", 10, 5000, 1000, step=10)
+    else:
+        points = w3.slider("Grid points per feature", 10, 150, 60, step=5)
+
+    if not swept:
+        st.info("Pick one or two features to sweep.")
+    else:
+        values, proba, seconds = what_if_cached(inputs, tuple(swept), points, model_name)
+        current = dict(inputs)
+        if len(swept) == 1:
+            curve = pd.DataFrame(proba, index=pd.Index(values, name=swept[0]), columns=bundle.classes)
+            st.line_chart(curve)
+            st.caption(f"{model_name} class probabilities over {len(values)} values of {swept[0]} "
+                       f"(current: {current.get(swept[0], 0)}), scored in {seconds * 1000:.0f} ms.")
+        else:
+            target = st.selectbox("Category", list(bundle.classes))
+            k = list(bundle.classes).index(target)
+            plt = _pyplot()
+            fig, ax = plt.subplots()
+            image = ax.imshow(proba[:, :, k].T, origin='lower', aspect='auto', cmap='viridis', vmin=0, vmax=1,
+                              extent=[values[0][0], values[0][-1], values[1][0], values[1][-1]])
+            ax.plot(current.get(swept[0], 0), current.get(swept[1], 0), 'wx', markersize=10, mew=2)
+            ax.set_xlabel(swept[0])
+            ax.set_ylabel(swept[1])
+            ax.set_title(f'P({target}) - {model_name}')
+            fig.colorbar(image, ax=ax)
+            st.pyplot(fig)
+            plt.close(fig)
+            st.caption(f"{proba.shape[0] * proba.shape[1]:,} variants scored in {seconds * 1000:.0f} ms; "
+                       f"x marks the current inputs.")
 
 # Tab for mdoel compraison
-with tab2:
+elif page == PAGES[2]:
+    metrics_mtime = os.path.getmtime(METRICS_CSV)
     st.header("Model Performance Leaderboard")
-    st.dataframe(assets['metrics'].style.highlight_max(axis=0, color='lightgreen'), use_container_width=True)
+    st.dataframe(load_metrics(metrics_mtime).style.highlight_max(axis=0, color='lightgreen'),
+                 use_container_width=True)
 
     st.subheader("Metric Comparison Charts")
     col1, col2 = st.columns(2)
-
-
-
-    def plot_metric(metric_name, color_palette):
-        fig, ax = plt.subplots()
-        sns.barplot(data=assets['metrics'], x='Model', y=metric_name, palette=color_palette, ax=ax)
-        ax.set_title(f'{metric_name} by Model')
-        ax.set_ylim(0, 1.0)
-        return fig
-
-
     with col1:
-        st.pyplot(plot_metric('Accuracy', 'viridis'))
+        st.image(metric_chart_png('Accuracy', 'viridis', metrics_mtime))
     with col2:
-        st.pyplot(plot_metric('F1-Score (W)', 'magma'))
+        st.image(metric_chart_png('F1-Score (W)', 'magma', metrics_mtime))
+
+    explanations = load_explanations()
+    if explanations is not None and explanations.fresh:
+        st.subheader("Feature Importance (mean |SHAP| over historical movies)")
+        st.bar_chart(explanations.global_importance())
 
     st.markdown("---")
     st.subheader("Confusion Matrix (Random Forest)")
@@ -154,9 +297,39 @@ with tab2:
              caption="Where did the best model make mistakes?")
 
 # Tab for EDA visuals display
-with tab3:
+elif page == PAGES[3]:
     st.header("Exploratory Data Analysis")
 
+    # Interactive drill-down: every change re-slices the precomputed cube in memory
+    if os.path.exists(CUBE_FILE):
+        cube = load_eda_cube(os.path.getmtime(CUBE_FILE))
+        st.subheader("Day 1 Collection Drill-down")
+        d1, d2, d3 = st.columns(3)
+        group_by = d1.selectbox("Group by", ['Director', 'Production Company', 'Genre', 'Year', 'Month',
+                                             'Day of Week'])
+        statistic = d2.selectbox("Statistic", list(CUBE_STATISTICS), index=2,
+                                 format_func=CUBE_STATISTICS.get)
+        genre = d3.selectbox("Genre", cube.genres)
+        f1, f2 = st.columns([2, 1])
+        low, high = cube.years
+        years = f1.slider("Release years", low, high, (low, high)) if low < high else (low, high)
+        languages = f2.multiselect("Languages", cube.languages, placeholder="All languages")
+
+        slice_start = time.perf_counter()
+        table = cube.slice(group_by, languages=languages, years=years, genre=genre)
+        slice_ms = (time.perf_counter() - slice_start) * 1000
+        if table.empty:
+            st.info("No movies match these filters.")
+        else:
+            shown = table if group_by in ('Year', 'Month', 'Day of Week') else table.head(CUBE_CHART_ROWS)
+            st.bar_chart(shown[statistic], horizontal=group_by in ('Director', 'Production Company'))
+            with st.expander("Table"):
+                st.dataframe(table.style.format({'Movies': '{:,.0f}', **{c: '{:.2f}' for c in table.columns[1:]}}))
+        st.caption(f"{int(table['Movies'].sum()) if not table.empty else 0:,} movie entries · sliced in "
+                   f"{slice_ms:.1f} ms · quantiles from the cube's histograms (within one ~10% bin)")
+    else:
+        st.info("Run aggregate_cube.py to enable the interactive drill-down.")
+
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Top 15 Directors")
@@ -171,4 +344,12 @@ with tab3:
         if os.path.exists(os.path.join(VISUALS_DIR, 'correlation_heatmap_full.png')):
             st.image(os.path.join(VISUALS_DIR, 'correlation_heatmap_full.png'))
         else:
-            st.info("Full correlation heatmap not found.")
\ No newline at end of file
+            st.info("Full correlation heatmap not found.")
+
+# Time to first render: from the top of the script to here, once per browser session
+render_s = time.perf_counter() - _SCRIPT_START
+if 'first_render_s' not in st.session_state:
+    st.session_state['first_render_s'] = (page, render_s)
+first_page, first_s = st.session_state['first_render_s']
+st.sidebar.caption(f"Rendered in {render_s * 1000:.0f} ms · first render ({first_page}) "
+                   f"{first_s * 1000:.0f} ms")
@@ -0,0 +1,280 @@
+import argparse
+import codecs
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span, start_tracing
+
+# --- Configuration ---
+COLUMNAR_DIR = "dataset/columnar"
+COMPRESSION = 'zstd'
+# Pipeline artifacts by name -> the CSV each stage used to hand off. The typed copy lives in
+# COLUMNAR_DIR/<name>.parquet; other CSV paths get a .parquet file next to them.
+DATASETS = {
+    'encoded': 'dataset/encoded.csv',
+    'merged': 'dataset/Final_dataset/merged_dataset_1.csv',
+    'processed_catalog': 'dataset/Final_dataset/movies_all_features_processed_v2.csv',
+    'model_features': 'dataset/Final_dataset/model_training_dataset.csv',
+    'training_with_cast': 'dataset/Final_dataset/model_training_dataset_FINAL_WITH_CAST.csv',
+    'training_set': 'dataset/Final_dataset/model_training_dataset_FINAL10.csv',
+}
+# Columns a dataset must have when it is written
+REQUIRED_COLUMNS = {
+    'merged': ['Title', 'Day1_collection_cr', 'Director', 'Production Company'],
+    'processed_catalog': ['Title', 'Day1_collection_cr', 'Director', 'Production Company',
+                          'Production_House_Score', 'Director_Score', 'Release_Year'],
+    'model_features': ['Day1_collection_cr'],
+    'training_set': ['Day1_collection_cr'],
+}
+# Declared column types. Repeated text is dictionary encoded ('category'); counts, calendar
+# fields and flags use the narrowest integer that holds them. An integer column with gaps is
+# stored as float32 (small ints) or float64, so NaN keeps meaning "missing" downstream.
+COLUMN_TYPES = {
+    'Title': 'string',
+    'Language': 'category',
+    'Director': 'category',
+    'Production Company': 'category',
+    'Genre': 'category',
+    'Year': 'int16',
+    'Release_Year': 'int16',
+    'Release_Month': 'int8',
+    'Release_Day': 'int8',
+    'Release_Day_of_Week': 'int8',
+    'Promotion_Duration_Days': 'int16',
+    'Runtime (min)': 'int16',
+    'viewCount': 'int64',
+    'likeCount': 'int64',
+    'commentCount': 'int64',
+    'Day1_collection_cr': 'float64',
+}
+PREFIX_TYPES = {'Genre_': 'int8', 'Director_': 'int8', 'Production_Company_': 'int8'}
+CATEGORY_MAX_SHARE = 0.5   # undeclared text becomes 'category' when distinct values are at most this share
+ENCODINGS = ('utf-8', 'latin1')
+
+
+# ==============================================================================
+# SCHEMA
+# ==============================================================================
+def column_type(column):
+    """Declared type of a column, or None if it is not declared."""
+    if column in COLUMN_TYPES:
+        return COLUMN_TYPES[column]
+    for prefix, dtype in PREFIX_TYPES.items():
+        if column.startswith(prefix):
+            return dtype
+    return None
+
+
+def _narrow_int(series, dtype):
+    """Casts to `dtype` when every value is a whole number in range; otherwise keeps a float."""
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series.astype(np.int8) if pd.api.types.is_bool_dtype(series) else series
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = values[~np.isnan(values)]
+    if len(finite) and (not np.array_equal(finite, np.round(finite))
+                        or finite.min() < np.iinfo(dtype).min or finite.max() > np.iinfo(dtype).max):
+        return series.astype(np.float64)
+    if len(finite) < len(values):
+        return series.astype(np.float32 if np.iinfo(dtype).bits <= 16 else np.float64)
+    return series.astype(dtype)
+
+
+def apply_schema(df):
+    """Returns `df` with declared column types; undeclared columns get the narrowest safe type."""
+    out = {}
+    for column in df.columns:
+        series = df[column]
+        declared = column_type(column)
+        if declared in ('category', 'string'):
+            series = series.astype('category' if declared == 'category' else 'str')
+        elif declared == 'float64':
+            series = pd.to_numeric(series, errors='coerce').astype(np.float64)
+        elif declared is not None:
+            series = _narrow_int(series, np.dtype(declared))
+        elif pd.api.types.is_bool_dtype(series):
+            series = series.astype(np.int8)
+        elif pd.api.types.is_integer_dtype(series):
+            series = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_string_dtype(series) or series.dtype == object:
+            distinct = series.nunique(dropna=True)
+            series = series.astype('category' if distinct <= CATEGORY_MAX_SHARE * max(len(series), 1) else 'str')
+        out[column] = series
+    return pd.DataFrame(out, index=df.index)
+
+
+# ==============================================================================
+# READ / WRITE
+# ==============================================================================
+def locations(source):
+    """(dataset name or None, CSV path, columnar path) for a dataset name or a file path."""
+    if source in DATASETS:
+        return source, DATASETS[source], os.path.join(COLUMNAR_DIR, f'{source}.parquet')
+    if source.lower().endswith(('.parquet', '.pq')):
+        return None, None, source
+    normalized = os.path.normpath(source)
+    for name, csv in DATASETS.items():
+        if os.path.normpath(csv) == normalized:
+            return name, csv, os.path.join(COLUMNAR_DIR, f'{name}.parquet')
+    return None, source, os.path.splitext(source)[0] + '.parquet'
+
+
+def dataset_path(source):
+    """The file read_dataset() would read: the columnar copy unless the CSV is newer."""
+    _, csv, columnar = locations(source)
+    if os.path.exists(columnar) and (csv is None or not os.path.exists(csv)
+                                     or os.path.getmtime(columnar) >= os.path.getmtime(csv)):
+        return columnar
+    if csv is not None and os.path.exists(csv):
+        return csv
+    raise FileNotFoundError(f"No CSV or columnar copy of '{source}' found.")
+
+
+def csv_encoding(path, block_bytes=1 << 20):
+    """First of ENCODINGS that decodes the whole file (checked incrementally, in blocks)."""
+    for encoding in ENCODINGS[:-1]:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, 'rb') as f:
+                while block := f.read(block_bytes):
+                    decoder.decode(block)
+                decoder.decode(b'', final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return ENCODINGS[-1]
+
+
+def read_csv(path, **kwargs):
+    """
+    pd.read_csv that tries UTF-8 first and falls back to latin1 for legacy scraper output. The
+    encoding is settled before parsing, so it also holds for chunked readers (chunksize=...),
+    which would only hit a decode error halfway through iteration.
+    """
+    return pd.read_csv(path, encoding=csv_encoding(path), **kwargs)
+
+
+def read_dataset(source, columns=None, categories=True):
+    """
+    Loads a dataset by name or path with its declared types, reading only `columns` if given.
+    The columnar copy is memory-mapped, so only the projected columns are decompressed; a CSV
+    newer than the copy (or the only one present) is parsed and typed the same way.
+    With categories=False, dictionary-encoded text comes back as plain strings.
+    """
+    path = dataset_path(source)
+    with span('read dataset', 'io', file=os.path.basename(path)):
+        if path.lower().endswith(('.parquet', '.pq')):
+            import pyarrow.parquet as pq
+            df = pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+        else:
+            df = apply_schema(read_csv(path, usecols=columns))
+    if not categories:
+        for column in df.select_dtypes('category').columns:
+            df[column] = df[column].astype('str').where(df[column].notna(), np.nan)
+    return df
+
+
+def iter_dataset(source, chunk_rows, columns=None):
+    """Yields typed chunks of at most `chunk_rows` rows without loading the whole dataset."""
+    path = dataset_path(source)
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in read_csv(path, usecols=columns, chunksize=chunk_rows):
+            yield apply_schema(chunk)
+
+
+def write_dataset(df, target):
+    """
+    Writes `df` with its declared types as a zstd-compressed parquet file (dictionary-encoded
+    text) for a dataset name or CSV path, atomically. Returns the path written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    name, _, path = locations(target)
+    missing = [c for c in REQUIRED_COLUMNS.get(name, []) if c not in df.columns]
+    if missing:
+        raise ValueError(f"Dataset '{name}' is missing required columns: {missing}")
+    typed = apply_schema(df)
+    table = pa.Table.from_pandas(typed, preserve_index=False)
+    dictionary = [c for c in typed.columns if isinstance(typed[c].dtype, pd.CategoricalDtype)]
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with span('write dataset', 'io', file=os.path.basename(path), rows=len(df)):
+        pq.write_table(table, path + '.tmp', compression=COMPRESSION, use_dictionary=dictionary or False)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def export_csv(source, path=None):
+    """Writes a dataset back out as CSV for inspection or sharing."""
+    _, csv, _ = locations(source)
+    path = path or csv
+    read_dataset(source, categories=False).to_csv(path, index=False)
+    return path
+
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+def _timed(func, repeats):
+    best, result = np.inf, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark(csv_path, repeats=3, projection=3):
+    """Full and projected load time, in-memory size and file size: CSV vs the typed columnar copy."""
+    import tempfile
+
+    csv_s, csv_df = _timed(lambda: read_csv(csv_path), repeats)
+    with tempfile.TemporaryDirectory() as tmp:
+        columnar = write_dataset(csv_df, os.path.join(tmp, 'benchmark.csv'))
+        pq_s, pq_df = _timed(lambda: read_dataset(columnar), repeats)
+        columns = list(csv_df.columns[:projection])
+        csv_proj_s, _ = _timed(lambda: read_csv(csv_path, usecols=columns), repeats)
+        pq_proj_s, _ = _timed(lambda: read_dataset(columnar, columns=columns), repeats)
+        pq_bytes = os.path.getsize(columnar)
+    rows = [('Load all columns (s)', csv_s, pq_s),
+            (f'Load {len(columns)} columns (s)', csv_proj_s, pq_proj_s),
+            ('In-memory size (MB)', csv_df.memory_usage(deep=True).sum() / 2**20,
+             pq_df.memory_usage(deep=True).sum() / 2**20),
+            ('File size (MB)', os.path.getsize(csv_path) / 2**20, pq_bytes / 2**20)]
+    return pd.DataFrame(rows, columns=['Measure', 'CSV', 'Columnar']).assign(
+        Ratio=lambda t: t['CSV'] / t['Columnar']).set_index('Measure')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Typed columnar copies of the pipeline datasets.")
+    parser.add_argument('command', choices=['convert', 'export', 'benchmark'],
+                        help="convert: CSV -> columnar; export: columnar -> CSV; benchmark: CSV vs columnar.")
+    parser.add_argument('datasets', nargs='*',
+                        help="Dataset names or CSV paths (default: every registered dataset that exists).")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    start_tracing('dataset_io')
+
+    try:
+        sources = args.datasets or [name for name, csv in DATASETS.items()
+                                    if os.path.exists(csv) or os.path.exists(locations(name)[2])]
+        for source in sources:
+            if args.command == 'convert':
+                df = apply_schema(read_csv(locations(source)[1]))
+                path = write_dataset(df, source)
+                print(f"✅ {source}: {len(df):,} rows -> '{path}' ({os.path.getsize(path) / 2**10:.0f} KB)")
+            elif args.command == 'export':
+                print(f"✅ {source} -> '{export_csv(source)}'")
+            else:
+                print(f"\n--- {source} ---")
+                print(benchmark(locations(source)[1], args.repeats).to_string(float_format=lambda v: f'{v:.3f}'))
+        if not sources:
+            print("⚠️ No datasets found.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -1,14 +1,23 @@
 import pandas as pd
 import re
+
+from catalog_store import DB_FILE, read_catalog
+from dataset_io import write_dataset
+from instrumentation import span, start_tracing
+
 # --- Configuration ---
-# TODO: Change this to the name of your input file
-INPUT_CSV = 'dataset/hindi_movies_features_Completed2.csv'
+# Read straight from the collectors' catalog: the collected columns, not the collectors' scratch ones
+INPUT_COLUMNS = ['Title', 'Year', 'Language', 'Banner', 'Release Date', 'Genre', 'Director', 'Production Company',
+                 'Runtime (min)', 'Certification', 'Cast', 'Day1_collection_cr']
+CATALOG_LANGUAGE = 'Hindi'
 OUTPUT_CSV = 'dataset/encoded.csv'
 
+start_tracing('encoding')
 try:
     # --- Load the Dataset ---
-    df = pd.read_csv(INPUT_CSV,encoding='latin1')
-    print(f"Loaded {len(df)} rows from '{INPUT_CSV}'.")
+    with span('read_catalog', 'io'):
+        df = read_catalog(INPUT_COLUMNS, CATALOG_LANGUAGE)
+    print(f"Loaded {len(df)} rows from '{DB_FILE}'.")
 
 
     print("\n--- Part 1: Processing Release Date ---")
@@ -62,9 +71,9 @@ try:
     print("\nDropped original text columns: 'Genre', 'Director', 'Production Company'.")
 
     # --- Final Save ---
-    df.to_csv(OUTPUT_CSV, index=False)
-    print(f"\n✅ Success! Processed data saved to '{OUTPUT_CSV}'.")
+    saved = write_dataset(df, OUTPUT_CSV)
+    print(f"\n✅ Success! Processed data saved to '{saved}'.")
     print("The file is now ready for machine learning.")
 
-except FileNotFoundError:
-    print(f"Error: The input file '{INPUT_CSV}' was not found.")
\ No newline at end of file
+except FileNotFoundError as e:
+    print(f"Error: {e}")
\ No newline at end of file
@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from instrumentation import start_tracing
+from model_bundle import MODEL_DIR
+
+# --- Configuration ---
+ENSEMBLE_FILE = os.path.join(MODEL_DIR, 'ensemble.json')
+WEIGHT_STEP = 0.05        # resolution of the weight grid over the simplex
+VALIDATION_SHARE = 0.5    # share of the held-out movies the weights are fitted on; the rest reports
+SEED = 42
+EPSILON = 1e-12
+
+
+# ==============================================================================
+# WEIGHT FITTING
+# ==============================================================================
+def simplex_grid(n_models, step=WEIGHT_STEP):
+    """Every weight vector with entries in multiples of `step` that sums to 1, shape (G, n_models)."""
+    units = int(round(1 / step))
+    mesh = np.stack(np.meshgrid(*[np.arange(units + 1)] * (n_models - 1), indexing='ij'), axis=-1)
+    mesh = mesh.reshape(-1, n_models - 1)
+    mesh = mesh[mesh.sum(axis=1) <= units]
+    return np.column_stack([mesh, units - mesh.sum(axis=1)]) / units
+
+
+def log_loss(proba, y):
+    """Mean negative log-likelihood of the true classes."""
+    return -np.log(np.maximum(proba[np.arange(len(y)), y], EPSILON)).mean()
+
+
+def fit_weights(member_proba, y, step=WEIGHT_STEP):
+    """
+    Soft-voting weights minimising validation log loss, searched over the whole weight grid at
+    once. `member_proba` is a list of (n_rows, n_classes) arrays in model order.
+    Returns (weights, log loss).
+    """
+    y = np.asarray(y, dtype=np.int64)
+    true_proba = np.stack([np.asarray(p, dtype=np.float64)[np.arange(len(y)), y] for p in member_proba])
+    grid = simplex_grid(len(member_proba), step)
+    losses = -np.log(np.maximum(grid @ true_proba, EPSILON)).mean(axis=1)
+    best = int(losses.argmin())
+    return grid[best], float(losses[best])
+
+
+# ==============================================================================
+# FUSED PREDICTOR
+# ==============================================================================
+class EnsemblePredictor:
+    """
+    Weighted soft vote over the bundle's models. The input is converted once to a contiguous
+    float32 matrix and every member is asked for probabilities only; models with zero weight
+    are never loaded.
+    """
+
+    def __init__(self, bundle, weights, learned=True):
+        self.bundle = bundle
+        self.weights = {name: float(weights.get(name, 0.0)) for name in bundle.model_names}
+        self.learned = learned
+        self.classes = bundle.classes
+
+    def _matrix(self, X):
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def _fuse(self, member_proba):
+        proba = sum(self.weights[name] * p for name, p in member_proba.items() if self.weights[name] > 0)
+        return proba / sum(self.weights[name] for name in member_proba if self.weights[name] > 0)
+
+    def predict(self, X):
+        """(labels, class probabilities, confidence) of the ensemble, in one fused call."""
+        X = self._matrix(X)
+        member_proba = {name: np.asarray(self.bundle.predict_proba(name, X))
+                        for name, weight in self.weights.items() if weight > 0}
+        proba = self._fuse(member_proba)
+        return self.classes[proba.argmax(axis=1)], proba, proba.max(axis=1)
+
+    def predict_all(self, X):
+        """{model name: (labels, probabilities)} for every member plus 'Ensemble', from one conversion."""
+        X = self._matrix(X)
+        member_proba = {name: np.asarray(self.bundle.predict_proba(name, X)) for name in self.weights}
+        out = {name: (self.classes[p.argmax(axis=1)], p) for name, p in member_proba.items()}
+        proba = self._fuse(member_proba)
+        out['Ensemble'] = (self.classes[proba.argmax(axis=1)], proba)
+        return out
+
+
+def _bundle_stamp(bundle):
+    return getattr(bundle, 'manifest', {}).get('created_at', '')
+
+
+def load_ensemble(bundle, path=ENSEMBLE_FILE):
+    """
+    The fitted ensemble for this bundle. Falls back to equal weights (learned=False) when no
+    weights have been fitted or they belong to an older bundle.
+    """
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            artifact = json.load(f)
+        if artifact['bundle_created_at'] == _bundle_stamp(bundle) and set(artifact['weights']) == set(bundle.model_names):
+            return EnsemblePredictor(bundle, artifact['weights'])
+    return EnsemblePredictor(bundle, {name: 1.0 for name in bundle.model_names}, learned=False)
+
+
+def fit_ensemble(bundle, X_holdout, y_holdout, path=ENSEMBLE_FILE, step=WEIGHT_STEP,
+                 validation_share=VALIDATION_SHARE, seed=SEED):
+    """
+    Fits the weights on a random share of the held-out movies and reports every model and the
+    ensemble on the remainder, then writes the weights next to the models.
+    Returns the comparison rows.
+    """
+    from model_training import score_predictions
+
+    X_holdout = np.ascontiguousarray(X_holdout, dtype=np.float32)
+    y_holdout = np.asarray(y_holdout, dtype=np.int64)
+    order = np.random.default_rng(seed).permutation(len(y_holdout))
+    cut = int(len(order) * validation_share)
+    val, report = order[:cut], order[cut:]
+
+    names = bundle.model_names
+    member_proba = [np.asarray(bundle.predict_proba(name, X_holdout)) for name in names]
+    weights, val_loss = fit_weights([p[val] for p in member_proba], y_holdout[val], step)
+    ensemble = EnsemblePredictor(bundle, dict(zip(names, weights)))
+    fused = ensemble._fuse({name: p for name, p in zip(names, member_proba)})
+
+    rows = []
+    for name, proba in list(zip(names, member_proba)) + [('Ensemble', fused)]:
+        row = score_predictions(name, y_holdout[report], proba[report].argmax(axis=1))
+        row['Log Loss'] = float(log_loss(proba[report], y_holdout[report])) if len(report) else float('nan')
+        rows.append(row)
+
+    artifact = {
+        'bundle_created_at': _bundle_stamp(bundle),
+        'fitted_at': datetime.now().isoformat(timespec='seconds'),
+        'weights': ensemble.weights,
+        'weight_step': step,
+        'validation_rows': int(len(val)),
+        'validation_log_loss': val_loss,
+        'report_rows': int(len(report)),
+        'report': rows,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, indent=2)
+    return rows
+
+
+def holdout_from_state(input_csv):
+    """The held-out movies recorded by the last model_training.py run."""
+    import joblib
+    from model_training import TARGET_COLUMN, TRAINING_STATE_FILE, load_training_data, row_hashes, split_features
+
+    state = joblib.load(TRAINING_STATE_FILE)
+    df = load_training_data(input_csv)
+    X, y, _ = split_features(df)
+    held_out = np.isin(row_hashes(X, df[TARGET_COLUMN]), state['test_hashes'])
+    return X[held_out], y[held_out]
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from model_bundle import load_bundle
+    from model_training import INPUT_CSV
+
+    parser = argparse.ArgumentParser(description="Fit soft-voting weights for the RF/XGBoost/LightGBM ensemble.")
+    parser.add_argument('--input', default=INPUT_CSV)
+    parser.add_argument('--step', type=float, default=WEIGHT_STEP, help="Resolution of the weight grid.")
+    parser.add_argument('--benchmark-rows', type=int, default=0,
+                        help="Also time fused vs separate prediction on this many rows.")
+    args = parser.parse_args()
+    start_tracing('ensemble')
+
+    try:
+        bundle = load_bundle()
+        X, y = holdout_from_state(args.input)
+        rows = fit_ensemble(bundle, X[bundle.features], y, step=args.step)
+        ensemble = load_ensemble(bundle)
+        print(pd.DataFrame(rows).to_string(index=False))
+        print("Weights: " + ", ".join(f"{name} {w:.2f}" for name, w in ensemble.weights.items()))
+        print(f"\n✅ Ensemble weights fitted on {len(y)} held-out movies and saved to '{ENSEMBLE_FILE}'.")
+
+        if args.benchmark_rows:
+            rng = np.random.default_rng(SEED)
+            frame = X[bundle.features].iloc[rng.integers(0, len(X), args.benchmark_rows)]
+            bundle.predict_all(frame.to_numpy())   # load the models outside the timing
+            for label, run in [('separate (DataFrame per model)',
+                                lambda: [bundle.predict_proba(name, frame) for name in bundle.model_names]),
+                               ('fused (one float32 conversion)', lambda: ensemble.predict(frame))]:
+                times = []
+                for _ in range(5):
+                    start = time.perf_counter()
+                    run()
+                    times.append(time.perf_counter() - start)
+                print(f"{label:>32}: {np.median(times) * 1000:8.2f} ms for {len(frame):,} rows")
+    except Exception as e:
+        print(f"An error occurred: {e}")
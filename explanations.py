@@ -0,0 +1,299 @@
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span, start_tracing
+from tree_compiler import compile_model
+
+# --- Configuration ---
+CACHE_FILE = "dataset/models/explanations.npz"
+BACKGROUND_SIZE = 100     # reference movies the attributions are measured against
+SEED = 42
+ADDITIVITY_TOLERANCE = 1e-4
+
+
+def _slug(name):
+    return name.lower().replace(' ', '_')
+
+
+def _popcount(masks):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks)
+    as_bytes = masks.view(np.uint8).reshape(masks.shape + (8,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1)
+
+
+def feature_hashes(X):
+    """Per-row fingerprint of a feature matrix, used to look up cached explanations."""
+    frame = pd.DataFrame(np.asarray(X, dtype=np.float64))
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+# ==============================================================================
+# INTERVENTIONAL TREESHAP
+# ==============================================================================
+class TreeExplainer:
+    """
+    Interventional TreeSHAP over a compiled ensemble.
+
+    Every leaf is reduced to one interval per feature on its path. For an input x and a
+    background row z, a feature on the path is either satisfied by both (irrelevant),
+    only by x (set A, must come from x), only by z (set B) or by neither (leaf unreachable).
+    A reachable leaf gives each feature in A  v * (|A|-1)! |B|! / (|A|+|B|)!  and takes
+    v * |A|! (|B|-1)! / (|A|+|B|)!  from each feature in B. That is a handful of vectorized
+    comparisons per (background row, leaf) instead of a recursive walk per pair.
+
+    Values explain `raw_output`: class probabilities for the forest, per-class margins
+    (log-odds before softmax) for the boosters.
+    """
+
+    def __init__(self, compiled, background):
+        if compiled.meta.get('has_zero_default'):
+            raise ValueError("Models with LightGBM zero-as-missing splits cannot be explained.")
+        self.compiled = compiled
+        self.n_features = compiled.meta['n_features']
+        self.background = np.ascontiguousarray(background, dtype=compiled.input_dtype)
+        self._check_finite(self.background)
+        self.expected_value = compiled.raw_output(self.background).mean(axis=0)
+        self._build_leaf_paths()
+        # Background side, computed once: per (leaf, row) bitmask of satisfied path slots,
+        # and the same as a (leaf, slot, row) matrix for the per-slot sums
+        bg_satisfied = np.stack([self._satisfied(z) for z in self.background], axis=1)
+        self._bg_mask = self._pack(bg_satisfied)
+        self._bg_satisfied = np.ascontiguousarray(bg_satisfied.transpose(0, 2, 1), dtype=np.float32)
+        self._full_mask = self._pack(np.ones(self.path_feature.shape, dtype=bool))[:, None]
+
+        # Shapley weights for |A| = a, |B| = b as one flat table, indexed by a * (depth + 1) + b;
+        # the extra last entry (zero) is used for unreachable leaves
+        depth = self.path_feature.shape[1]
+        self._stride = depth + 1
+        self._weights = np.zeros((self._stride ** 2 + 1, 2), dtype=np.float32)
+        for a in range(depth + 1):
+            for b in range(depth + 1 - a):
+                total = math.factorial(a + b)
+                if a:
+                    self._weights[a * self._stride + b, 0] = math.factorial(a - 1) * math.factorial(b) / total
+                if b:
+                    self._weights[a * self._stride + b, 1] = math.factorial(a) * math.factorial(b - 1) / total
+
+    def _build_leaf_paths(self):
+        """Per leaf: the distinct features on its path and the interval each must fall in."""
+        c = self.compiled
+        a = c.arrays
+        left, right = np.asarray(a['left']), np.asarray(a['right'])
+        feature, threshold = c._feature, c._threshold
+        values = np.asarray(a['value'])
+        tree_class = np.asarray(a['tree_class'])
+
+        paths, leaf_values = [], []
+        for tree, root in enumerate(np.asarray(a['roots'])):
+            stack = [(int(root), {})]
+            while stack:
+                node, bounds = stack.pop()
+                if left[node] == node:
+                    paths.append(bounds)
+                    if c.meta['kind'] == 'forest':
+                        leaf_values.append(values[node] / c.n_trees)
+                    else:
+                        one_hot = np.zeros(c.n_classes)
+                        one_hot[tree_class[tree]] = values[node, 0]
+                        leaf_values.append(one_hot)
+                    continue
+                f, t = int(feature[node]), threshold[node]
+                lo, hi = bounds.get(f, (-np.inf, np.inf))
+                stack.append((int(right[node]), {**bounds, f: (max(lo, t), hi)}))
+                stack.append((int(left[node]), {**bounds, f: (lo, min(hi, t))}))
+
+        # Padded to the longest path; padding slots accept every value and so never matter
+        depth = max(1, max(len(p) for p in paths))
+        if depth > 64:
+            raise ValueError(f"Paths use {depth} distinct features; at most 64 are supported.")
+        self.path_feature = np.zeros((len(paths), depth), dtype=np.int32)
+        self.path_lo = np.full((len(paths), depth), -np.inf, dtype=c.input_dtype)
+        self.path_hi = np.full((len(paths), depth), np.inf, dtype=c.input_dtype)
+        for i, bounds in enumerate(paths):
+            for k, (f, (lo, hi)) in enumerate(bounds.items()):
+                self.path_feature[i, k] = f
+                self.path_lo[i, k], self.path_hi[i, k] = lo, hi
+        self.leaf_values = np.asarray(leaf_values, dtype=np.float64)
+
+    def _satisfied(self, x):
+        """Whether x satisfies each (leaf, path feature) interval, shape (n_leaves, depth)."""
+        v = x[self.path_feature]
+        if self.compiled.strict:  # x < t goes left
+            return (self.path_lo <= v) & (v < self.path_hi)
+        return (self.path_lo < v) & (v <= self.path_hi)
+
+    @staticmethod
+    def _pack(satisfied):
+        """Bool (..., depth) -> uint64 bitmask (...,), one bit per path slot."""
+        bits = np.left_shift(np.uint64(1), np.arange(satisfied.shape[-1], dtype=np.uint64))
+        return np.bitwise_or.reduce(np.where(satisfied, bits, np.uint64(0)), axis=-1)
+
+    @staticmethod
+    def _check_finite(X):
+        if not np.isfinite(X).all():
+            raise ValueError("Explanations need finite feature values; impute missing values first.")
+
+    def explain_row(self, x):
+        """SHAP values for one row, shape (n_features, n_classes)."""
+        sx = self._satisfied(x)
+        x_mask = self._pack(sx)[:, None]
+        only_x = x_mask & ~self._bg_mask           # (leaf, background) bitmasks
+        only_z = self._bg_mask & ~x_mask
+        reachable = (x_mask | self._bg_mask) == self._full_mask
+        index = _popcount(only_x).astype(np.intp) * self._stride + _popcount(only_z)
+        weights = self._weights.take(np.where(reachable, index, len(self._weights) - 1), axis=0)
+
+        # Sum the weights over background rows per (leaf, slot): slot k is in A when x
+        # satisfies it and z does not, in B when z satisfies it and x does not
+        z_sums = np.matmul(self._bg_satisfied, weights)          # (leaf, slot, 2)
+        total_a = weights[:, :, 0].sum(axis=1, dtype=np.float64)[:, None]
+        coef = np.where(sx, total_a - z_sums[:, :, 0], -z_sums[:, :, 1]) / len(self.background)
+
+        slots = self.path_feature.ravel()
+        return np.stack([np.bincount(slots, weights=(coef * self.leaf_values[:, c:c + 1]).ravel(),
+                                     minlength=self.n_features)
+                         for c in range(self.compiled.n_classes)], axis=1)
+
+    def explain(self, X):
+        """SHAP values for a batch, shape (n_rows, n_features, n_classes)."""
+        X = np.ascontiguousarray(X, dtype=self.compiled.input_dtype)
+        self._check_finite(X)
+        return np.stack([self.explain_row(x) for x in X]) if len(X) else \
+            np.zeros((0, self.n_features, self.compiled.n_classes))
+
+
+# ==============================================================================
+# CACHE
+# ==============================================================================
+class ExplanationCache:
+    """
+    Precomputed explanations for every historical movie plus the background they were
+    computed against. Rows found in the cache are served from it; anything else goes
+    through the fast path with the same background, so both agree.
+    """
+
+    def __init__(self, bundle, cache_file=CACHE_FILE):
+        self.bundle = bundle
+        with np.load(cache_file, allow_pickle=False) as data:
+            self.data = {key: data[key] for key in data.files}
+        if list(self.data['features']) != list(bundle.features):
+            raise ValueError("Explanation cache was built for different features; rebuild it.")
+        # Cached values are only valid for the models they were computed from
+        created_at = getattr(bundle, 'manifest', {}).get('created_at', '')
+        self.fresh = str(self.data['bundle_created_at']) == created_at
+        self._index = {h: i for i, h in enumerate(self.data['row_hashes'])} if self.fresh else {}
+        self._explainers = {}
+
+    @property
+    def background(self):
+        return self.data['background']
+
+    def explainer(self, name):
+        if name not in self._explainers:
+            self._explainers[name] = TreeExplainer(compile_model(self.bundle.model(name)), self.background)
+        return self._explainers[name]
+
+    def explain(self, name, X):
+        """Returns (shap values (n_rows, n_features, n_classes), expected value, number of cache hits)."""
+        X = np.asarray(X, dtype=np.float64)
+        hits = np.array([self._index.get(h, -1) for h in feature_hashes(X)], dtype=np.int64)
+        found = hits >= 0
+        out = np.empty((len(X), len(self.bundle.features), len(self.bundle.classes)))
+        if found.any():
+            out[found] = self.data[f'{_slug(name)}_shap'][hits[found]]
+        if not found.all():
+            out[~found] = self.explainer(name).explain(X[~found])
+        if found.all() and len(X):
+            expected = self.data[f'{_slug(name)}_expected']
+        else:
+            expected = self.explainer(name).expected_value
+        return out, expected, int(found.sum())
+
+    def global_importance(self):
+        """Mean |SHAP| per feature over all cached movies and classes, one column per model."""
+        return pd.DataFrame({name: np.abs(self.data[f'{_slug(name)}_shap']).mean(axis=(0, 2))
+                             for name in self.bundle.model_names}, index=list(self.bundle.features))
+
+
+def load_cache(bundle, cache_file=CACHE_FILE):
+    """Opens the explanation cache, or returns None if it has not been built."""
+    if not os.path.exists(cache_file):
+        return None
+    return ExplanationCache(bundle, cache_file)
+
+
+def build_cache(bundle, X, background_size=BACKGROUND_SIZE, cache_file=CACHE_FILE, seed=SEED):
+    """Explains every row of X with all models and writes the compressed cache."""
+    X = np.asarray(X, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    background = X[rng.choice(len(X), size=min(background_size, len(X)), replace=False)]
+
+    arrays = {
+        'features': np.asarray(bundle.features, dtype=str),
+        'classes': np.asarray(bundle.classes, dtype=str),
+        'background': background,
+        'row_hashes': feature_hashes(X),
+        'bundle_created_at': np.asarray(getattr(bundle, 'manifest', {}).get('created_at', '')),
+    }
+    for name in bundle.model_names:
+        start = time.perf_counter()
+        with span(f'explain {name}', 'fit', rows=len(X)):
+            explainer = TreeExplainer(compile_model(bundle.model(name)), background)
+            shap_values = explainer.explain(X)
+        error = np.abs(shap_values.sum(axis=1) + explainer.expected_value
+                       - explainer.compiled.raw_output(X)).max()
+        status = 'OK' if error <= ADDITIVITY_TOLERANCE else 'MISMATCH'
+        print(f"{name}: {len(X)} rows in {time.perf_counter() - start:.2f}s, "
+              f"max additivity error {error:.2e} [{status}]")
+        arrays[f'{_slug(name)}_shap'] = shap_values.astype(np.float32)
+        arrays[f'{_slug(name)}_expected'] = explainer.expected_value
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    np.savez_compressed(cache_file, **arrays)
+    return cache_file
+
+
+def benchmark_fast_path(cache, repeats=20):
+    """Median latency of explaining one new movie per model, after the explainer is built."""
+    x = cache.background[:1] + 1e-3   # not in the cache, so it always takes the fast path
+    rows = []
+    for name in cache.bundle.model_names:
+        start = time.perf_counter()
+        cache.explainer(name)
+        setup = time.perf_counter() - start
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            cache.explainer(name).explain(x)
+            times.append(time.perf_counter() - start)
+        rows.append({'Model': name, 'Setup ms': setup * 1000, 'Explain ms': float(np.median(times)) * 1000})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    from model_bundle import load_bundle
+    from model_training import INPUT_CSV, load_training_data, split_features
+
+    parser = argparse.ArgumentParser(description="Precompute TreeSHAP explanations for every historical movie.")
+    parser.add_argument('--input', default=INPUT_CSV)
+    parser.add_argument('--background-size', type=int, default=BACKGROUND_SIZE)
+    parser.add_argument('--benchmark', action='store_true', help="Time the fast path for new inputs.")
+    args = parser.parse_args()
+    start_tracing('explanations')
+
+    try:
+        bundle = load_bundle()
+        X, _, _ = split_features(load_training_data(args.input))
+        path = build_cache(bundle, X[bundle.features], args.background_size)
+        print(f"\n✅ Explanations for {len(X)} movies saved to '{path}'.")
+        if args.benchmark:
+            print("\n--- Fast path: one new movie (median of 20) ---")
+            print(benchmark_fast_path(load_cache(bundle)).to_string(index=False))
+    except Exception as e:
+        print(f"An error occurred: {e}")
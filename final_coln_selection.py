@@ -2,6 +2,9 @@ import pandas as pd
 import os
 from sklearn.impute import KNNImputer
 
+from dataset_io import read_dataset, write_dataset
+from instrumentation import start_tracing, traced
+
 # --- Configuration ---
 # This is the "master" file with all columns
 INPUT_CSV = "dataset/Final_dataset/model_training_dataset_FINAL_WITH_CAST.csv"
@@ -53,69 +56,82 @@ FINAL_COLUMNS_FOR_MODEL = [
     'commentCount'
 ]
 
-try:
-    # Load the "master" file
-    df = pd.read_csv(INPUT_CSV)
-    print(f"Loaded {len(df)} rows from '{INPUT_CSV}'.")
+# Columns pre-filled with 0 so the k-NN imputer only has to predict the sentiment features
+COLS_TO_FILL_ZERO = [
+    'Runtime (min)', 'Release_Year', 'Release_Month', 'Release_Day_of_Week',
+    'Promotion_Duration_Days', 'viewCount', 'likeCount', 'commentCount'
+]
+
+
+@traced('impute_sentiment KNN', 'fit')
+def impute_sentiment(df_model, n_neighbors=5):
+    """
+    Fills the missing sentiment values with a k-NN imputer over all other model columns.
+    Returns a new DataFrame with the same columns.
+    """
+    df_model = df_model.copy()
 
-    # Ensure the output directory exists
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # --- Step 2: Fill NaNs in non-sentiment columns with 0 ---
+    # The imputer needs clean data to work with.
+    # We fill all columns with 0 EXCEPT the ones we want to predict.
+    for col in COLS_TO_FILL_ZERO:
+        df_model[col] = df_model[col].fillna(0)
 
-    # --- Step 1: Select only the columns we will use for the model ---
+    print("  -> Pre-filled '0' for non-sentiment missing values.")
 
-    # Check if all desired columns are in the DataFrame
-    missing_cols = [col for col in FINAL_COLUMNS_FOR_MODEL if col not in df.columns]
+    # --- Step 3: Run the k-NN Imputer ---
+    # This will predict the 170 missing values for 'avg_sentiment'
+    # and 'median_sentiment' based on all the other columns.
 
-    if missing_cols:
-        print(f"\nError: The DataFrame is missing the following expected columns: {missing_cols}")
-    else:
-        df_model = df[FINAL_COLUMNS_FOR_MODEL].copy()
-        print(f"\nSuccessfully selected {len(df_model.columns)} columns for the model.")
+    # We use n_neighbors=5 (a common default)
+    imputer = KNNImputer(n_neighbors=n_neighbors)
 
-        # ==============================================================================
-        # NEW STEP: SYNTHETIC DATA IMPUTATION
-        # ==============================================================================
+    # The imputer returns a numpy array, so we must re-create the DataFrame
+    df_imputed_array = imputer.fit_transform(df_model)
 
-        print("\nStarting synthetic data imputation for sentiment features...")
+    print(f"  -> Successfully imputed {df_model['avg_sentiment'].isnull().sum()} missing sentiment values.")
+    return pd.DataFrame(df_imputed_array, columns=df_model.columns)
 
-        # --- Step 2: Fill NaNs in non-sentiment columns with 0 ---
-        # The imputer needs clean data to work with.
-        # We fill all columns with 0 EXCEPT the ones we want to predict.
-        cols_to_fill_zero = [
-            'Runtime (min)', 'Release_Year', 'Release_Month', 'Release_Day_of_Week',
-            'Promotion_Duration_Days', 'viewCount', 'likeCount', 'commentCount'
-        ]
 
-        for col in cols_to_fill_zero:
-            df_model[col].fillna(0, inplace=True)
+if __name__ == "__main__":
+    start_tracing('final_coln_selection')
+    try:
+        # Load the "master" file
+        df = read_dataset(INPUT_CSV)
+        print(f"Loaded {len(df)} rows from '{INPUT_CSV}'.")
 
-        print("  -> Pre-filled '0' for non-sentiment missing values.")
+        # Ensure the output directory exists
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-        # --- Step 3: Run the k-NN Imputer ---
-        # This will predict the 170 missing values for 'avg_sentiment'
-        # and 'median_sentiment' based on all the other columns.
+        # --- Step 1: Select only the columns we will use for the model ---
 
-        # We use n_neighbors=5 (a common default)
-        imputer = KNNImputer(n_neighbors=5)
+        # Check if all desired columns are in the DataFrame
+        missing_cols = [col for col in FINAL_COLUMNS_FOR_MODEL if col not in df.columns]
 
-        # The imputer returns a numpy array, so we must re-create the DataFrame
-        df_imputed_array = imputer.fit_transform(df_model)
+        if missing_cols:
+            print(f"\nError: The DataFrame is missing the following expected columns: {missing_cols}")
+        else:
+            df_model = df[FINAL_COLUMNS_FOR_MODEL].copy()
+            print(f"\nSuccessfully selected {len(df_model.columns)} columns for the model.")
 
-        df_final = pd.DataFrame(df_imputed_array, columns=FINAL_COLUMNS_FOR_MODEL)
+            # ==============================================================================
+            # NEW STEP: SYNTHETIC DATA IMPUTATION
+            # ==============================================================================
 
-        print(f"  -> Successfully imputed {df_model['avg_sentiment'].isnull().sum()} missing sentiment values.")
+            print("\nStarting synthetic data imputation for sentiment features...")
+            df_final = impute_sentiment(df_model)
 
-        # ==============================================================================
-        # FINAL SAVE
-        # ==============================================================================
+            # ==============================================================================
+            # FINAL SAVE
+            # ==============================================================================
 
-        # Save the final model-ready file
-        df_final.to_csv(OUTPUT_CSV, index=False)
+            # Save the final model-ready file
+            saved = write_dataset(df_final, OUTPUT_CSV)
 
-        print(f"\n✅✅✅ All Processing Complete! ✅✅✅")
-        print(f"Your final, 100% clean, model-ready dataset is saved to:\n{OUTPUT_CSV}")
+            print(f"\n✅✅✅ All Processing Complete! ✅✅✅")
+            print(f"Your final, 100% clean, model-ready dataset is saved to:\n{saved}")
 
-except FileNotFoundError:
-    print(f"\nError: The input file '{INPUT_CSV}' was not found.")
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+    except FileNotFoundError:
+        print(f"\nError: The input file '{INPUT_CSV}' was not found.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
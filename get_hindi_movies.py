@@ -1,37 +1,13 @@
-import pandas as pd
-import requests
-import time
+from catalog_store import CatalogStore, movie_key
+from http_client import Client
+from instrumentation import start_tracing
 
 # --- Configuration ---
 API_KEY = "YOUR_TMDB_API_KEY_HERE" 
-INPUT_CSV = 'dataset/hindi_movies_boxoffice.csv'
-OUTPUT_CSV = 'dataset/hindi_movies_boxoffice2.csv'
 BASE_URL = "https://api.themoviedb.org/3"
 
-# --- NEW: Session and Robust Request Function ---
-session = requests.Session()
-session.headers.update({
-    "User-Agent": "MyMovieDataProject/1.0"
-})
-
-
-def make_api_request_with_retry(url, params):
-    """Makes an API request with a retry mechanism for network errors."""
-    max_retries = 3
-    backoff_factor = 2  # Wait 2s, then 4s, then 6s
-
-    for attempt in range(max_retries):
-        try:
-            response = session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"\nRequest failed: {e}. Attempt {attempt + 1} of {max_retries}.")
-            if attempt + 1 == max_retries:
-                print("Max retries reached. Failing this request.")
-                return None
-            time.sleep(backoff_factor * (attempt + 1))
-    return None
+# Shared pooled client: exponential backoff with jitter, Retry-After and a circuit breaker for TMDb
+client = Client(headers={"User-Agent": "MyMovieDataProject/1.0"})
 
 
 # --- MODIFIED: Fetch function now uses the retry logic ---
@@ -51,8 +27,7 @@ def fetch_theatrical_movies_tmdb():
             'page': page_num
         }
 
-        # Use our new robust function
-        data = make_api_request_with_retry(f"{BASE_URL}/discover/movie", params)
+        data = client.get_json(f"{BASE_URL}/discover/movie", params)
 
         if not data or not data.get('results'):
             print("Stopping: No more results or an unrecoverable error occurred.")
@@ -65,31 +40,28 @@ def fetch_theatrical_movies_tmdb():
                 'Year': movie['release_date'][:4] if movie.get('release_date') else None,
                 'Language': 'Hindi'
             })
-        time.sleep(0.5)  # Be polite between successful page fetches
     return all_movies
 
 
-# --- Main Automation Script (Unchanged) ---
+# --- Main Automation Script ---
 if __name__ == "__main__":
-    df_existing = pd.read_csv(INPUT_CSV,encoding='latin1')
-    df_existing.columns = df_existing.columns.str.strip()
-    existing_titles = set(df_existing['Title'])
-    print(f"Loaded {len(existing_titles)} existing movies.")
+    start_tracing('get_hindi_movies')
+    with CatalogStore() as store:
+        # Dedupe on the normalized (title, year) key in the catalog index, not a CSV-wide set
+        existing_keys = store.keys('Hindi')
+        print(f"Catalog has {len(existing_keys)} Hindi movies.")
 
-    tmdb_movies = fetch_theatrical_movies_tmdb()
+        tmdb_movies = fetch_theatrical_movies_tmdb()
 
-    new_movies_to_add = []
-    if tmdb_movies:
+        new_movies_to_add = []
         for movie in tmdb_movies:
-            if movie['Title'] not in existing_titles:
+            key = movie_key(movie)[:2]
+            if key not in existing_keys:
                 new_movies_to_add.append(movie)
-                existing_titles.add(movie['Title'])
+                existing_keys.add(key)
 
-    if new_movies_to_add:
-        df_new = pd.DataFrame(new_movies_to_add)
-        df_augmented = pd.concat([df_existing, df_new], ignore_index=True)
-        df_augmented.to_csv(OUTPUT_CSV, index=False)
-        print(f"\n✅ Success! Added {len(new_movies_to_add)} new movies from TMDb.")
-        print(f"New, augmented dataset saved to '{OUTPUT_CSV}'.")
-    else:
-        print("\nNo new movies found to add from TMDb.")
+        if new_movies_to_add:
+            inserted, _ = store.upsert(new_movies_to_add)
+            print(f"\n✅ Success! Added {inserted} new movies from TMDb to '{store.path}'.")
+        else:
+            print("\nNo new movies found to add from TMDb.")
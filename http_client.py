@@ -0,0 +1,284 @@
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import count, span
+
+# --- Configuration ---
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/91.0.4472.124 Safari/537.36")
+TIMEOUT = (5, 15)          # connect, read: a dead host fails in 5 s, a slow page gets 15
+# Host pools kept, and sockets per host; above every per-host 'connections' limit so the limiter,
+# not a blocked pool, decides who waits
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 8
+# Per host: requests in flight at once, and seconds between request starts
+HOST_LIMITS = {
+    'default': {'connections': 4, 'interval': 0.25},
+    'www.google.com': {'connections': 1, 'interval': 2.0},
+    'api.themoviedb.org': {'connections': 2, 'interval': 0.5},
+}
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0         # seconds; attempt k waits up to BACKOFF_BASE * 2**k (full jitter)
+BACKOFF_MAX = 60.0
+MAX_RETRY_AFTER = 300.0    # a server asking for a longer pause than this is treated as down
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+FAILURE_THRESHOLD = 5      # consecutive failures that open a host's circuit
+COOLDOWN = 60.0            # seconds open before a trial request; doubles each time the trial fails
+MAX_COOLDOWN = 900.0
+LATENCY_SAMPLES = 10_000    # recent requests kept per host for the percentiles
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while a host's circuit is open."""
+
+
+# ==============================================================================
+# PER-HOST STATE
+# ==============================================================================
+class HostLimiter:
+    """Caps in-flight requests per host and spaces their starts; shared by every worker thread."""
+
+    def __init__(self, limits=HOST_LIMITS):
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def _limit(self, host):
+        return self.limits.get(host, self.limits['default'])
+
+    @contextmanager
+    def slot(self, host):
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self._limit(host)['connections'])
+            semaphore = self._slots[host]
+        with span('wait for host slot', 'wait', host=host):
+            semaphore.acquire()
+        try:
+            with self._lock:
+                # Reserve the next start time under the lock, sleep outside it
+                start = max(time.monotonic(), self._next_start.get(host, 0.0))
+                self._next_start[host] = start + self._limit(host)['interval']
+            delay = start - time.monotonic()
+            if delay > 0:
+                with span('polite sleep', 'wait', host=host):
+                    time.sleep(delay)
+            yield
+        finally:
+            semaphore.release()
+
+
+class CircuitBreaker:
+    """
+    Closed: requests flow, consecutive failures are counted. Open (after FAILURE_THRESHOLD of
+    them): requests fail at once until the cooldown ends. Half-open: one trial request decides
+    between closed and open again with a doubled cooldown.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN, max_cooldown=MAX_COOLDOWN):
+        self.threshold, self.base_cooldown, self.max_cooldown = threshold, cooldown, max_cooldown
+        self._lock = threading.Lock()
+        self.state, self.failures, self.cooldown = 'closed', 0, cooldown
+        self.opened_at, self._trial_running = 0.0, False
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half-open'
+            if self.state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state, self.failures, self.cooldown, self._trial_running = 'closed', 0, self.base_cooldown, False
+
+    def failure(self):
+        """Records a failure; True if it opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open':
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.failures < self.threshold or self.state == 'open':
+                return False
+            self.state, self.opened_at, self._trial_running = 'open', time.monotonic(), False
+            return True
+
+
+# ==============================================================================
+# CLIENT
+# ==============================================================================
+def make_session(headers=None, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    """requests session whose pool blocks instead of opening sockets past `pool_maxsize` per host."""
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT, **(headers or {})})
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def retry_after_seconds(response):
+    """Seconds asked for by a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class Client:
+    """
+    One pooled session for every scraper thread, with per-host limits, retries (exponential
+    backoff with jitter, honouring Retry-After), a circuit breaker per host and per-host
+    request/error/latency statistics. With an `archive` (page_archive.PageArchive), every page
+    get_text returns is stored there too.
+    """
+
+    def __init__(self, limits=HOST_LIMITS, headers=None, max_retries=MAX_RETRIES, timeout=TIMEOUT, archive=None):
+        self.session = make_session(headers)
+        self.archive = archive
+        self.limiter = HostLimiter(limits)
+        self.max_retries, self.timeout = max_retries, timeout
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._stats = {}
+
+    def _breaker(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker()
+            return self._breakers[host]
+
+    def _record(self, host, key, latency=None):
+        with self._lock:
+            stats = self._stats.setdefault(host, {'requests': 0, 'errors': 0, 'retries': 0,
+                                                  'short_circuited': 0, 'opened': 0,
+                                                  'latency': deque(maxlen=LATENCY_SAMPLES)})
+            stats[key] += 1
+            if latency is not None:
+                stats['latency'].append(latency)
+        count(f'{key} {host}')
+
+    def request(self, method, url, **kwargs):
+        """
+        The response once it is not retryable (2xx, 404, ...). Raises CircuitOpenError while the
+        host is failing, or the last RequestException once retries are used up.
+        """
+        host = urlsplit(url).netloc   # host[:port]: limits, breakers and stats are per site
+        breaker = self._breaker(host)
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                self._record(host, 'short_circuited')
+                raise CircuitOpenError(f"{host} is failing; circuit open for up to {breaker.cooldown:.0f}s")
+            error, wait = None, None
+            with self.limiter.slot(host):
+                start = time.perf_counter()
+                try:
+                    with span('fetch', 'network', host=host):
+                        response = self.session.request(method, url, **kwargs)
+                except requests.exceptions.RequestException as e:
+                    error = e
+            latency = time.perf_counter() - start
+            self._record(host, 'requests', latency)
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                breaker.success()
+                return response
+            self._record(host, 'errors')
+            if breaker.failure():
+                self._record(host, 'opened')
+                print(f"  -> {host} failed {breaker.failures} times in a row; pausing it for {breaker.cooldown:.0f}s.")
+            if error is None:
+                wait = retry_after_seconds(response)
+                if wait is not None and wait > MAX_RETRY_AFTER:
+                    return response   # the server asked for a long pause; do not hold the worker
+            if attempt == self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+            self._record(host, 'retries')
+            with span('retry backoff', 'wait', host=host):
+                time.sleep(max(wait or 0.0, backoff_delay(attempt)))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def get_text(self, url, params=None):
+        """Page text, or None for a non-200 answer, a network error or an open circuit."""
+        try:
+            response = self.get(url, params=params)
+        except CircuitOpenError:
+            return None   # counted per host; one line per skipped title would flood the log
+        except requests.exceptions.RequestException as e:
+            print(f"  -> Request failed for '{url}': {e}")
+            return None
+        count(f'http {response.status_code}')
+        if response.status_code != 200:
+            return None
+        if self.archive is not None:
+            self.archive.add(url, response.text, params)
+        return response.text
+
+    def get_json(self, url, params=None):
+        """Decoded JSON of a 200 answer, or None."""
+        text = self.get_text(url, params)
+        if text is None:
+            return None
+        with span('parse json', 'parse'):
+            try:
+                return json.loads(text)
+            except ValueError:
+                return None
+
+    def report(self):
+        """Per-host requests, errors, retries, circuit activity and latency percentiles."""
+        rows = []
+        with self._lock:
+            for host, stats in sorted(self._stats.items()):
+                latency = np.array(stats['latency']) * 1000 if stats['latency'] else np.array([np.nan])
+                rows.append({'Host': host, 'Requests': stats['requests'], 'Errors': stats['errors'],
+                             'Retries': stats['retries'], 'Short-circuited': stats['short_circuited'],
+                             'Circuit opened': stats['opened'],
+                             'p50 ms': np.percentile(latency, 50), 'p95 ms': np.percentile(latency, 95)})
+        return pd.DataFrame(rows)
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """Process-wide shared Client, created on first use."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = Client()
+        return _default_client
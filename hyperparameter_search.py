@@ -0,0 +1,294 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import log_loss
+from sklearn.model_selection import train_test_split
+from sklearn.utils.class_weight import compute_class_weight, compute_sample_weight
+
+from instrumentation import span, start_tracing
+from model_training import (BEST_PARAMS_FILE, INPUT_CSV, MODEL_DIR, OUTPUT_DIR,
+                            load_training_data, split_features)
+
+# --- Configuration ---
+RESULTS_CSV = os.path.join(OUTPUT_DIR, 'hyperparameter_search_results.csv')
+MIN_RESOURCE = 25     # trees / boosting rounds given to every sampled configuration
+MAX_RESOURCE = 675    # trees / boosting rounds given to the survivors of the last rung
+ETA = 3               # keep the top 1/ETA of each rung, give them ETA times the resource
+TIME_BUDGET_S = 600   # wall-clock budget for the whole search
+N_WORKERS = os.cpu_count() or 1
+SEED = 42
+
+
+# ==============================================================================
+# SEARCH SPACES
+# ==============================================================================
+# Parameters use the scikit-learn wrapper names so the winners can be passed
+# straight to build_models(); XGBoost and LightGBM accept them as aliases natively.
+def sample_rf(rng):
+    return {
+        'max_depth': [None, 6, 10, 16, 24][rng.integers(5)],
+        'min_samples_leaf': int(rng.choice([1, 2, 4, 8])),
+        'max_features': ['sqrt', 'log2', 0.5, None][rng.integers(4)],
+    }
+
+
+def sample_xgb(rng):
+    return {
+        'learning_rate': float(10 ** rng.uniform(-2.3, -0.5)),
+        'max_depth': int(rng.integers(2, 9)),
+        'min_child_weight': float(10 ** rng.uniform(-1, 1)),
+        'subsample': float(rng.uniform(0.5, 1.0)),
+        'colsample_bytree': float(rng.uniform(0.5, 1.0)),
+        'reg_lambda': float(10 ** rng.uniform(-2, 1)),
+    }
+
+
+def sample_lgbm(rng):
+    return {
+        'learning_rate': float(10 ** rng.uniform(-2.3, -0.5)),
+        'num_leaves': int(rng.integers(4, 64)),
+        'min_child_samples': int(rng.integers(3, 40)),
+        'subsample': float(rng.uniform(0.5, 1.0)),
+        'subsample_freq': 1,
+        'colsample_bytree': float(rng.uniform(0.5, 1.0)),
+        'reg_lambda': float(10 ** rng.uniform(-2, 1)),
+    }
+
+
+# ==============================================================================
+# TRIALS
+# ==============================================================================
+class SearchData:
+    """Train/validation matrices, built once and shared read-only by every trial."""
+
+    def __init__(self, X_train, X_valid, y_train, y_valid):
+        self.X_train = np.ascontiguousarray(X_train, dtype=np.float32)
+        self.X_valid = np.ascontiguousarray(X_valid, dtype=np.float32)
+        self.y_train = np.asarray(y_train)
+        self.y_valid = np.asarray(y_valid)
+        self.n_classes = int(max(self.y_train.max(), self.y_valid.max()) + 1)
+        weights = compute_sample_weight(class_weight='balanced', y=self.y_train)
+        # Explicit 'balanced' weights, since the preset is not warm_start-safe in scikit-learn
+        classes = np.arange(self.n_classes)
+        self.class_weight = dict(zip(classes, compute_class_weight('balanced', classes=classes, y=self.y_train)))
+
+        self.dtrain_xgb = xgb.DMatrix(self.X_train, label=self.y_train, weight=weights)
+        self.dvalid_xgb = xgb.DMatrix(self.X_valid)
+        # feature_pre_filter must be off so trials may use any min_child_samples
+        self.dtrain_lgb = lgb.Dataset(self.X_train, label=self.y_train, weight=weights,
+                                      params={'feature_pre_filter': False, 'verbose': -1},
+                                      free_raw_data=False).construct()
+
+
+class Trial:
+    """One sampled configuration that can be grown to a larger resource without refitting."""
+
+    family = None
+
+    def __init__(self, trial_id, params, data):
+        self.trial_id = trial_id
+        self.params = params
+        self.data = data
+        self.resource = 0
+        self.loss = math.inf
+        self.best_loss = math.inf
+        self.best_resource = 0
+        self.fit_seconds = 0.0
+
+    def advance(self, resource):
+        """Grows the model to `resource` trees/rounds and scores it on the validation split."""
+        start = time.perf_counter()
+        with span(f'grow {self.family}', 'fit', trial=self.trial_id, resource=resource):
+            self.resource = self._grow(resource)   # LightGBM may stop short of `resource`
+        proba = self._predict_valid()
+        self.loss = log_loss(self.data.y_valid, proba, labels=list(range(self.data.n_classes)))
+        if self.loss < self.best_loss:
+            self.best_loss, self.best_resource = self.loss, self.resource
+        self.fit_seconds += time.perf_counter() - start
+        return self
+
+    def best_params(self):
+        return {**self.params, 'n_estimators': self.best_resource}
+
+
+class RandomForestTrial(Trial):
+    family = 'Random Forest'
+
+    def _grow(self, resource):
+        if self.resource == 0:
+            self.model = RandomForestClassifier(n_estimators=resource, warm_start=True, n_jobs=1,
+                                                random_state=SEED, class_weight=self.data.class_weight,
+                                                **self.params)
+        else:
+            self.model.set_params(n_estimators=resource)
+        self.model.fit(self.data.X_train, self.data.y_train)
+        return resource
+
+    def _predict_valid(self):
+        return self.model.predict_proba(self.data.X_valid)
+
+
+class XGBoostTrial(Trial):
+    family = 'XGBoost'
+
+    def _grow(self, resource):
+        if self.resource == 0:
+            native = {**self.params, 'objective': 'multi:softprob', 'num_class': self.data.n_classes,
+                      'eval_metric': 'mlogloss', 'seed': SEED, 'nthread': 1, 'verbosity': 0}
+            self.booster = xgb.Booster(native, [self.data.dtrain_xgb])
+        for i in range(self.resource, resource):
+            self.booster.update(self.data.dtrain_xgb, i)
+        return resource
+
+    def _predict_valid(self):
+        return self.booster.predict(self.data.dvalid_xgb)
+
+
+class LightGBMTrial(Trial):
+    family = 'LightGBM'
+
+    def _grow(self, resource):
+        if self.resource == 0:
+            native = {**self.params, 'objective': 'multiclass', 'num_class': self.data.n_classes,
+                      'seed': SEED, 'num_threads': 1, 'verbose': -1}
+            self.booster = lgb.Booster(native, self.data.dtrain_lgb)
+        for _ in range(self.resource, resource):
+            if self.booster.update():
+                break  # no further splits possible
+        return self.booster.current_iteration()
+
+    def _predict_valid(self):
+        return self.booster.predict(self.data.X_valid)
+
+
+FAMILIES = [
+    (RandomForestTrial, sample_rf),
+    (XGBoostTrial, sample_xgb),
+    (LightGBMTrial, sample_lgbm),
+]
+
+
+# ==============================================================================
+# HYPERBAND
+# ==============================================================================
+def hyperband_brackets(min_resource=MIN_RESOURCE, max_resource=MAX_RESOURCE, eta=ETA):
+    """Yields (n_configs, rung resources) for each Hyperband bracket, most aggressive first."""
+    s_max = int(math.floor(math.log(max_resource / min_resource, eta) + 1e-9))
+    for s in range(s_max, -1, -1):
+        n_configs = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        rungs = [int(round(max_resource * eta ** (i - s))) for i in range(s + 1)]
+        yield n_configs, rungs
+
+
+def successive_halving(trials, rungs, pool, deadline, eta=ETA):
+    """Runs the rungs of one bracket, keeping the best 1/eta of the trials after each rung."""
+    for rung, resource in enumerate(rungs):
+        if time.monotonic() >= deadline:
+            print("  -> Time budget reached, stopping bracket early.")
+            break
+        futures = [pool.submit(t.advance, resource) for t in trials]
+        trials = [f.result() for f in futures]
+        trials.sort(key=lambda t: t.loss)
+        print(f"  -> rung {rung}: {len(trials)} trials at {resource} rounds, "
+              f"best mlogloss {trials[0].loss:.4f}")
+        if rung < len(rungs) - 1:
+            trials = trials[:max(1, len(trials) // eta)]
+
+
+def run_search(data, time_budget=TIME_BUDGET_S, n_workers=N_WORKERS, seed=SEED,
+               min_resource=MIN_RESOURCE, max_resource=MAX_RESOURCE, eta=ETA):
+    """Hyperband over all three families; returns every trial that was evaluated."""
+    rng = np.random.default_rng(seed)
+    deadline = time.monotonic() + time_budget
+    all_trials = []
+    trial_id = 0
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        for n_configs, rungs in hyperband_brackets(min_resource, max_resource, eta):
+            for trial_cls, sampler in FAMILIES:
+                if time.monotonic() >= deadline:
+                    return all_trials
+                print(f"\n--- {trial_cls.family}: {n_configs} configs, rungs {rungs} ---")
+                trials = []
+                for _ in range(n_configs):
+                    trials.append(trial_cls(trial_id, sampler(rng), data))
+                    trial_id += 1
+                successive_halving(trials, rungs, pool, deadline, eta)
+                all_trials.extend(t for t in trials if t.resource > 0)
+    return all_trials
+
+
+def best_per_family(trials):
+    """Picks the lowest validation loss per family, with n_estimators set where it was reached."""
+    best = {}
+    for trial in trials:
+        current = best.get(trial.family)
+        if current is None or trial.best_loss < current.best_loss:
+            best[trial.family] = trial
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperband search for the RF/XGBoost/LightGBM classifiers.")
+    parser.add_argument('--input', default=INPUT_CSV)
+    parser.add_argument('--budget', type=float, default=TIME_BUDGET_S, help="Wall-clock budget in seconds.")
+    parser.add_argument('--workers', type=int, default=N_WORKERS)
+    parser.add_argument('--min-resource', type=int, default=MIN_RESOURCE)
+    parser.add_argument('--max-resource', type=int, default=MAX_RESOURCE)
+    parser.add_argument('--eta', type=int, default=ETA)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+    start_tracing('hyperparameter_search')
+
+    try:
+        df = load_training_data(args.input)
+        X, y, _ = split_features(df)
+        print(f"Loaded {len(df)} rows from '{args.input}'.")
+
+        # Same held-out test split as model_training.py; the search only ever sees the training part
+        X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        X_fit, X_valid, y_fit, y_valid = train_test_split(X_train, y_train, test_size=0.25,
+                                                          random_state=args.seed, stratify=y_train)
+        data = SearchData(X_fit, X_valid, y_fit, y_valid)
+
+        start = time.perf_counter()
+        trials = run_search(data, args.budget, args.workers, args.seed,
+                            args.min_resource, args.max_resource, args.eta)
+        elapsed = time.perf_counter() - start
+        if not trials:
+            print("No trial finished within the time budget.")
+            return
+
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+        best = best_per_family(trials)
+        joblib.dump({family: t.best_params() for family, t in best.items()}, BEST_PARAMS_FILE)
+
+        pd.DataFrame([{
+            'Model': t.family, 'Trial': t.trial_id, 'Rounds': t.resource,
+            'Best Rounds': t.best_resource, 'Valid mlogloss': t.best_loss,
+            'Fit Seconds': t.fit_seconds, **{f'param_{k}': v for k, v in t.params.items()},
+        } for t in trials]).sort_values(['Model', 'Valid mlogloss']).to_csv(RESULTS_CSV, index=False)
+
+        print(f"\n--- Best configuration per family ({len(trials)} trials in {elapsed:.1f}s) ---")
+        for family, t in best.items():
+            print(f"{family}: mlogloss {t.best_loss:.4f} -> {t.best_params()}")
+        print(f"\n✅ Search complete. Best parameters saved to '{BEST_PARAMS_FILE}', "
+              f"all trials to '{RESULTS_CSV}'.")
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
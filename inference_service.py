@@ -0,0 +1,360 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from instrumentation import count, span, start_tracing
+from model_bundle import BUNDLE_DIR, load_bundle
+
+# --- Configuration ---
+HOST = "127.0.0.1"
+PORT = 8765
+BATCH_WINDOW_MS = 2.0       # how long the first request of a batch waits for company
+MAX_BATCH_SIZE = 256
+MAX_BATCH_REQUEST_ROWS = 10_000
+MAX_BODY_BYTES = 16 * 2 ** 20
+LATENCY_SAMPLES = 10_000    # recent requests kept per endpoint for the percentiles
+
+
+def row_vector(row, features):
+    """One input dict -> feature vector; same rules as model_bundle.prepare_features (missing / non-numeric -> 0)."""
+    x = np.zeros(len(features), dtype=np.float32)
+    for i, name in enumerate(features):
+        try:
+            value = float(row.get(name, 0))
+        except (TypeError, ValueError):
+            continue
+        if not math.isnan(value):
+            x[i] = value
+    return x
+
+
+# ==============================================================================
+# METRICS
+# ==============================================================================
+class ServiceMetrics:
+    """Request counters, recent latencies per endpoint and histograms of batch sizes."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.latencies = {}
+        self.batch_sizes = {'micro_batches': Counter(), 'batch_requests': Counter()}
+
+    def record_request(self, endpoint, seconds):
+        self.requests[endpoint] += 1
+        self.latencies.setdefault(endpoint, deque(maxlen=LATENCY_SAMPLES)).append(seconds)
+
+    def record_batch(self, size, kind='micro_batches'):
+        # Power-of-two buckets: 1, 2-3, 4-7, ...
+        low = 1 << (size.bit_length() - 1)
+        self.batch_sizes[kind][f'{low}-{2 * low - 1}' if low > 1 else '1'] += 1
+
+    def snapshot(self):
+        latency = {}
+        for endpoint, samples in self.latencies.items():
+            ms = np.asarray(samples) * 1000
+            latency[endpoint] = {'count': len(ms), 'p50_ms': float(np.percentile(ms, 50)),
+                                 'p99_ms': float(np.percentile(ms, 99)), 'max_ms': float(ms.max())}
+        return {
+            'uptime_s': time.time() - self.started,
+            'requests': dict(self.requests),
+            'errors': dict(self.errors),
+            'latency': latency,
+            'batch_size_histogram': {kind: dict(sorted(counts.items(), key=lambda kv: int(kv[0].split('-')[0])))
+                                     for kind, counts in self.batch_sizes.items()},
+        }
+
+
+# ==============================================================================
+# MICRO-BATCHING
+# ==============================================================================
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row requests: the first row in an empty queue opens a
+    batch window of `window_ms`; everything that arrives in that window (up to
+    `max_batch_size`) is scored together, one predict_proba call per model.
+    """
+
+    def __init__(self, score, metrics, window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE):
+        self.score = score
+        self.metrics = metrics
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def submit(self, x):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((x, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.metrics.record_batch(len(batch))
+            X = np.stack([x for x, _ in batch])
+            try:
+                # Models run in a worker thread so the loop keeps accepting requests meanwhile
+                results = await loop.run_in_executor(None, self.score, X)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+# ==============================================================================
+# HTTP SERVICE
+# ==============================================================================
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def content_length(headers):
+    """The Content-Length header as a byte count (0 if absent), or None if it is not a valid one."""
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+class InferenceService:
+    """
+    Minimal HTTP/1.1 JSON service on asyncio streams.
+
+    POST /predict  {"features": {...}}             -> one prediction (micro-batched)
+                   {"instances": [{...}, {...}]}    -> list of predictions (scored as one batch)
+    GET  /metrics  counters, p50/p99 latency per endpoint, batch-size histograms
+    GET  /health   model and feature names
+    """
+
+    def __init__(self, bundle_dir=BUNDLE_DIR, engine='compiled', window_ms=BATCH_WINDOW_MS,
+                 max_batch_size=MAX_BATCH_SIZE):
+        self.bundle = load_bundle(bundle_dir, engine=engine)
+        self.features = list(self.bundle.features)
+        self.metrics = ServiceMetrics()
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        # Load every model now instead of on the first request
+        self.score(np.zeros((1, len(self.features)), dtype=np.float32))
+
+    def score(self, X):
+        """One predict_proba call per model for the whole matrix; returns one result dict per row."""
+        count('rows scored', len(X))
+        with span('score micro-batch', 'predict', rows=len(X)):
+            per_model = {name: np.asarray(self.bundle.predict_proba(name, X)) for name in self.bundle.model_names}
+        classes = [str(c) for c in self.bundle.classes]
+        results = []
+        for i in range(len(X)):
+            results.append({name: {'prediction': classes[int(proba[i].argmax())],
+                                   'probabilities': dict(zip(classes, proba[i].round(6).tolist()))}
+                            for name, proba in per_model.items()})
+        return results
+
+    async def start(self, host=HOST, port=PORT):
+        self.batcher = MicroBatcher(self.score, self.metrics, self.window_ms, self.max_batch_size)
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server
+
+    async def stop(self):
+        await self.batcher.stop()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _route(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok', 'models': self.bundle.model_names, 'features': self.features}
+        if path == '/metrics':
+            return 200, self.metrics.snapshot()
+        if path != '/predict':
+            return 404, {'error': f"Unknown path '{path}'."}
+        if method != 'POST':
+            return 405, {'error': "Use POST for /predict."}
+
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError as e:
+            return 400, {'error': f"Invalid JSON: {e}"}
+        if isinstance(payload, dict) and isinstance(payload.get('features'), dict):
+            return 200, await self.batcher.submit(row_vector(payload['features'], self.features))
+        if isinstance(payload, dict) and isinstance(payload.get('instances'), list):
+            rows = payload['instances']
+            if len(rows) > MAX_BATCH_REQUEST_ROWS:
+                return 413, {'error': f"At most {MAX_BATCH_REQUEST_ROWS} instances per request."}
+            if not all(isinstance(row, dict) for row in rows):
+                return 400, {'error': "Every instance must be an object of feature values."}
+            if not rows:
+                return 200, {'predictions': []}
+            X = np.stack([row_vector(row, self.features) for row in rows])
+            self.metrics.record_batch(len(rows), 'batch_requests')
+            results = await asyncio.get_running_loop().run_in_executor(None, self.score, X)
+            return 200, {'predictions': results}
+        return 400, {'error': "Expected {\"features\": {...}} or {\"instances\": [...]}."}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                length = content_length(headers)
+                path = target.split('?', 1)[0]
+                if length is None:
+                    # The body's end is unknown, so the connection cannot be reused
+                    status, payload = 400, {'error': "Invalid Content-Length."}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': "Request body too large."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, payload = await self._route(method, path, body)
+                    except Exception as e:
+                        status, payload = 500, {'error': str(e)}
+                    keep_alive = (headers.get('connection', '').lower() != 'close'
+                                  and version != 'HTTP/1.0')
+
+                data = json.dumps(payload).encode()
+                writer.write((f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + data)
+                await writer.drain()
+
+                endpoint = path
+                if path == '/predict' and status == 200:
+                    endpoint = '/predict (batch)' if 'predictions' in payload else '/predict (single)'
+                if status >= 400:
+                    self.metrics.errors[endpoint] += 1
+                self.metrics.record_request(endpoint, time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+# ==============================================================================
+# LOAD TEST
+# ==============================================================================
+async def _client(host, port, rows, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for row in rows:
+            body = json.dumps({'features': row}).encode()
+            start = time.perf_counter()
+            writer.write(f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            headers = {}
+            await reader.readline()
+            while (line := await reader.readline()) not in (b'\r\n', b''):
+                key, _, value = line.decode().partition(':')
+                headers[key.strip().lower()] = value.strip()
+            length = content_length(headers)
+            if length is None:
+                raise ConnectionError(f"Invalid Content-Length in response: {headers.get('content-length')!r}")
+            await reader.readexactly(length)
+            results.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def load_test(concurrency=64, requests_per_client=50, window_ms=BATCH_WINDOW_MS, port=PORT + 1):
+    """Runs the service in-process and fires concurrent single-row requests at it."""
+    service = InferenceService(window_ms=window_ms)
+    await service.start(HOST, port)
+    rng = np.random.default_rng(0)
+    rows = [{name: float(v) for name, v in zip(service.features, rng.random(len(service.features)) * 100)}
+            for _ in range(concurrency * requests_per_client)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(HOST, port, rows[i::concurrency], latencies) for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    snapshot = service.metrics.snapshot()
+    await service.stop()
+    ms = np.asarray(latencies) * 1000
+    return {'requests': len(latencies), 'seconds': elapsed, 'requests_per_s': len(latencies) / elapsed,
+            'client_p50_ms': float(np.percentile(ms, 50)), 'client_p99_ms': float(np.percentile(ms, 99)),
+            'batch_size_histogram': snapshot['batch_size_histogram']['micro_batches']}
+
+
+async def _serve(args):
+    service = InferenceService(args.bundle_dir, args.engine, args.window_ms, args.max_batch_size)
+    server = await service.start(args.host, args.port)
+    print(f"✅ Serving {', '.join(service.bundle.model_names)} on http://{args.host}:{args.port} "
+          f"(batch window {args.window_ms} ms, max batch {args.max_batch_size}).")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP inference service with dynamic micro-batching.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--bundle-dir', default=BUNDLE_DIR)
+    parser.add_argument('--engine', choices=['compiled', 'native'], default='compiled')
+    parser.add_argument('--window-ms', type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--load-test', action='store_true',
+                        help="Benchmark concurrent single-row requests, with and without micro-batching.")
+    args = parser.parse_args()
+    start_tracing('inference_service')
+
+    try:
+        if args.load_test:
+            for window in (0.0, args.window_ms):
+                result = asyncio.run(load_test(window_ms=window))
+                print(f"\n--- Batch window {window} ms: {result['requests']} requests, 64 concurrent clients ---")
+                print(f"{result['requests_per_s']:,.0f} req/s | p50 {result['client_p50_ms']:.1f} ms | "
+                      f"p99 {result['client_p99_ms']:.1f} ms")
+                print(f"Batch sizes: {result['batch_size_histogram']}")
+        else:
+            asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        print("\nService stopped.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
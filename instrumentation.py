@@ -0,0 +1,276 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from datetime import datetime
+
+# --- Configuration ---
+# Tracing is off unless this is set: '1' writes to TRACE_DIR, any other value is used as the directory
+TRACE_ENV = 'BOXOFFICE_TRACE'
+TRACE_DIR = "dataset/traces"
+RSS_SAMPLE_INTERVAL_S = 0.05
+SUMMARY_ROWS = 25
+# Events kept for the trace file; older ones are dropped so a long-running service stays bounded.
+# The summary table and counters are running totals and do not depend on this
+MAX_TRACE_EVENTS = 1_000_000
+
+ENABLED = os.environ.get(TRACE_ENV, '').strip() not in ('', '0')
+
+_NULL_SPAN = nullcontext()
+_PID = os.getpid()
+_events = deque(maxlen=MAX_TRACE_EVENTS)
+_counters = defaultdict(float)
+_counter_lock = threading.Lock()
+_span_totals = {}    # name -> [calls, total us, max us, category, first start us, last end us]
+_span_lock = threading.Lock()
+_peak_rss_mb = 0.0
+_epoch_ns = time.perf_counter_ns()
+
+
+# ==============================================================================
+# MEMORY
+# ==============================================================================
+def _page_size():
+    try:
+        return os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return 4096
+
+
+_PAGE_SIZE = _page_size()
+
+
+def rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, as reported by the OS (0 if unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def _sample_rss(stop, interval):
+    global _peak_rss_mb
+    emitted = {}
+    while not stop.wait(interval):
+        mb = rss_mb()
+        _peak_rss_mb = max(_peak_rss_mb, mb)
+        _events.append({'name': 'RSS', 'ph': 'C', 'ts': _now_us(), 'pid': _PID, 'args': {'MB': round(mb, 1)}})
+        emitted = _sample_counters(emitted)
+
+
+def _sample_counters(emitted):
+    """One trace event per counter that changed since the last sample (not one per count() call)."""
+    with _counter_lock:
+        changed = {name: total for name, total in _counters.items() if emitted.get(name) != total}
+    now = _now_us()
+    for name, total in changed.items():
+        _events.append({'name': name, 'ph': 'C', 'ts': now, 'pid': _PID, 'args': {'value': total}})
+    return {**emitted, **changed}
+
+
+# ==============================================================================
+# SPANS AND COUNTERS
+# ==============================================================================
+def _now_us():
+    return (time.perf_counter_ns() - _epoch_ns) / 1000
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        self.name, self.category, self.args = name, category, args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        event = {'name': self.name, 'cat': self.category, 'ph': 'X', 'pid': _PID,
+                 'tid': threading.get_ident(), 'ts': (self.start - _epoch_ns) / 1000,
+                 'dur': (end - self.start) / 1000}
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        if self.args:
+            event['args'] = self.args
+        _events.append(event)
+        start_us, dur_us = event['ts'], event['dur']
+        with _span_lock:
+            row = _span_totals.get(self.name)
+            if row is None:
+                _span_totals[self.name] = [1, dur_us, dur_us, self.category, start_us, start_us + dur_us]
+            else:
+                row[0] += 1
+                row[1] += dur_us
+                row[2] = max(row[2], dur_us)
+                row[4] = min(row[4], start_us)
+                row[5] = max(row[5], start_us + dur_us)
+        return False
+
+
+def span(name, category='phase', **args):
+    """
+    Times the enclosed block, e.g. `with span('fetch', 'network', host=host):`.
+    Categories used across the scripts: network, parse, io, fit, phase.
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name=None, category='phase'):
+    """Decorator form of span(). Returns the function untouched when tracing is off."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(label, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Adds `value` to a named counter (requests, cache hits, rows written, ...)."""
+    if not ENABLED:
+        return
+    with _counter_lock:
+        _counters[name] += value   # a running value; the RSS sampler writes it to the trace
+
+
+# ==============================================================================
+# REPORTING
+# ==============================================================================
+def summary(events=None):
+    """
+    Per-span rows (calls, total, mean, max, share of wall time), slowest first: from the running
+    totals of this process, or from the events of a trace file.
+    """
+    if events is None:
+        with _span_lock:
+            rows = {name: list(row) for name, row in _span_totals.items()}
+        wall = (max((r[5] for r in rows.values()), default=0) - min((r[4] for r in rows.values()), default=0))
+        totals = {name: row[:4] for name, row in rows.items()}
+    else:
+        spans = [e for e in events if e['ph'] == 'X']
+        wall = max((e['ts'] + e['dur'] for e in spans), default=0) - min((e['ts'] for e in spans), default=0)
+        totals = defaultdict(lambda: [0, 0.0, 0.0, ''])
+        for e in spans:
+            row = totals[e['name']]
+            row[0] += 1
+            row[1] += e['dur']
+            row[2] = max(row[2], e['dur'])
+            row[3] = e.get('cat', '')
+    return sorted(({'Span': name, 'Category': cat, 'Calls': calls, 'Total s': total / 1e6,
+                    'Mean ms': total / calls / 1e3, 'Max ms': peak / 1e3,
+                    '% wall': 100 * total / wall if wall else 0.0}
+                   for name, (calls, total, peak, cat) in totals.items()),
+                  key=lambda row: -row['Total s'])
+
+
+def print_summary(rows=None, counters=None, peak_rss=None):
+    rows = summary() if rows is None else rows
+    counters = dict(_counters) if counters is None else counters
+    print(f"\n--- Timing summary (top {min(len(rows), SUMMARY_ROWS)} spans by total time) ---")
+    print(f"{'Span':<36} {'Category':<9} {'Calls':>7} {'Total s':>9} {'Mean ms':>9} {'Max ms':>9} {'% wall':>7}")
+    for row in rows[:SUMMARY_ROWS]:
+        print(f"{row['Span'][:36]:<36} {row['Category'][:9]:<9} {row['Calls']:>7} {row['Total s']:>9.3f} "
+              f"{row['Mean ms']:>9.2f} {row['Max ms']:>9.2f} {row['% wall']:>6.1f}%")
+    for name, value in sorted(counters.items()):
+        print(f"  counter {name}: {value:g}")
+    if peak_rss is not None:
+        print(f"  peak RSS: {peak_rss:.1f} MB")
+
+
+def write_trace(path, script):
+    """Chrome trace JSON (open in chrome://tracing or ui.perfetto.dev)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    metadata = [{'name': 'process_name', 'ph': 'M', 'pid': _PID, 'args': {'name': script}}]
+    with open(path, 'w', encoding='utf-8') as f:
+        _sample_counters({})   # final counter values
+        json.dump({'traceEvents': metadata + list(_events), 'displayTimeUnit': 'ms',
+                   'otherData': {'script': script, 'counters': dict(_counters),
+                                 'peak_rss_mb': round(_peak_rss_mb, 1)}}, f)
+    return path
+
+
+def start_tracing(script):
+    """
+    Traces the rest of this process as one root span named after the script, samples RSS in
+    the background and, at exit, writes the trace and prints the summary table. Does nothing
+    unless BOXOFFICE_TRACE is set.
+    """
+    if not ENABLED:
+        return
+    global _peak_rss_mb
+    _peak_rss_mb = rss_mb()
+    root = _Span(script, 'script', {'argv': ' '.join(sys.argv[1:])}).__enter__()
+    stop = threading.Event()
+    threading.Thread(target=_sample_rss, args=(stop, RSS_SAMPLE_INTERVAL_S), daemon=True).start()
+
+    def finish():
+        global _peak_rss_mb
+        stop.set()
+        root.__exit__(None, None, None)
+        # The sampler can miss short spikes; the OS high-water mark cannot
+        _peak_rss_mb = max(_peak_rss_mb, rss_mb(), peak_rss_mb())
+        setting = os.environ[TRACE_ENV].strip()
+        directory = TRACE_DIR if setting == '1' else setting
+        path = os.path.join(directory, f"{script}_{datetime.now():%Y%m%d-%H%M%S}.json")
+        print_summary(peak_rss=_peak_rss_mb)
+        print(f"Trace written to '{write_trace(path, script)}'.")
+
+    atexit.register(finish)
+
+
+def overhead(calls=1_000_000):
+    """Seconds per span() enter/exit in the current mode."""
+    start_s = time.perf_counter()
+    for _ in range(calls):
+        with span('overhead'):
+            pass
+    return (time.perf_counter() - start_s) / calls
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f"Summarise a trace written with {TRACE_ENV} set, "
+                                                 f"or measure the cost of a span.")
+    parser.add_argument('trace', nargs='?', help="Trace JSON to summarise.")
+    parser.add_argument('--overhead', action='store_true', help="Time one span in the current mode.")
+    args = parser.parse_args()
+
+    try:
+        if args.trace:
+            with open(args.trace, encoding='utf-8') as f:
+                trace = json.load(f)
+            print_summary(summary(trace['traceEvents']), trace['otherData']['counters'],
+                          trace['otherData']['peak_rss_mb'])
+        if args.overhead:
+            per_call = overhead()
+            _events.clear()
+            _span_totals.clear()
+            print(f"{'Enabled' if ENABLED else 'Disabled'}: {per_call * 1e9:.0f} ns per span.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from instrumentation import start_tracing
+from tree_compiler import CompiledEnsemble, compile_model
+
+# --- Configuration ---
+MODEL_DIR = "dataset/models"
+BUNDLE_DIR = os.path.join(MODEL_DIR, 'bundle')
+MANIFEST_FILE = 'manifest.json'
+BUNDLE_FORMAT_VERSION = 2
+# 'compiled' serves every model from tree_compiler node arrays (no xgboost/lightgbm import);
+# 'native' uses the library boosters and falls back to compiled arrays for the forest
+DEFAULT_ENGINE = 'compiled'
+
+MODEL_NAMES = ['Random Forest', 'XGBoost', 'LightGBM']
+COMPILED_DIRS = {name: os.path.join('compiled', name.lower().replace(' ', '_')) for name in MODEL_NAMES}
+
+
+# ==============================================================================
+# NATIVE BOOSTER WRAPPERS
+# ==============================================================================
+class XGBoostNative:
+    """Multiclass XGBoost booster loaded from UBJSON, predicting without a DMatrix."""
+
+    def __init__(self, path):
+        import xgboost as xgb
+        self.booster = xgb.Booster()
+        self.booster.load_model(path)
+
+    def predict_proba(self, X):
+        return self.booster.inplace_predict(np.ascontiguousarray(X, dtype=np.float32))
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
+
+
+class LightGBMNative:
+    """Multiclass LightGBM booster rebuilt from its model string."""
+
+    def __init__(self, path):
+        import lightgbm as lgb
+        with open(path, encoding='utf-8') as f:
+            self.booster = lgb.Booster(model_str=f.read())
+
+    def predict_proba(self, X):
+        return self.booster.predict(np.ascontiguousarray(X, dtype=np.float64))
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
+
+
+# ==============================================================================
+# SAVE / LOAD
+# ==============================================================================
+def save_bundle(models, feature_names, label_encoder, category_labels, scaler=None, bundle_dir=BUNDLE_DIR):
+    """
+    Writes the inference bundle: compiled .npy node arrays for every model (the only
+    format for the RandomForest), XGBoost as UBJSON, LightGBM as its model string and
+    all metadata in one manifest. The bundle is built in a temporary directory and
+    swapped in, so readers never see a partial one.
+    """
+    tmp_dir = f'{bundle_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for name in MODEL_NAMES:
+        compile_model(models[name]).save(os.path.join(tmp_dir, COMPILED_DIRS[name]))
+    # scikit-learn wrappers or raw boosters (out-of-core training produces the latter)
+    xgb_booster = getattr(models['XGBoost'], 'get_booster', lambda: models['XGBoost'])()
+    xgb_booster.save_model(os.path.join(tmp_dir, 'xgboost.ubj'))
+    with open(os.path.join(tmp_dir, 'lightgbm.txt'), 'w', encoding='utf-8') as f:
+        f.write(getattr(models['LightGBM'], 'booster_', models['LightGBM']).model_to_string())
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'feature_names': list(feature_names),
+        'classes': [str(c) for c in label_encoder.classes_],
+        'category_labels': list(category_labels),
+        'scaler': None if scaler is None else {
+            'mean': scaler.mean_.tolist(), 'scale': scaler.scale_.tolist()},
+        'models': {
+            'Random Forest': {'format': 'compiled', 'path': COMPILED_DIRS['Random Forest']},
+            'XGBoost': {'format': 'ubj', 'path': 'xgboost.ubj'},
+            'LightGBM': {'format': 'lgbm-text', 'path': 'lightgbm.txt'},
+        },
+        'compiled': dict(COMPILED_DIRS),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = f'{bundle_dir}.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(bundle_dir):
+        os.rename(bundle_dir, old_dir)
+    os.rename(tmp_dir, bundle_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return bundle_dir
+
+
+_LOADERS = {
+    'compiled': CompiledEnsemble.load,
+    'ubj': XGBoostNative,
+    'lgbm-text': LightGBMNative,
+}
+
+
+class BundleBase:
+    """Predictions shared by both bundle kinds; subclasses provide model_names, classes and model(name)."""
+
+    def predict_proba(self, name, X):
+        return self.model(name).predict_proba(X)
+
+    def predict_labels(self, name, X):
+        return self.classes[self.model(name).predict(X)]
+
+    def predict_all(self, X):
+        """{model name: (labels, probabilities)}, one predict_proba call per model."""
+        out = {}
+        for name in self.model_names:
+            proba = np.asarray(self.predict_proba(name, X))
+            out[name] = (self.classes[proba.argmax(axis=1)], proba)
+        return out
+
+
+class ModelBundle(BundleBase):
+    """
+    Inference bundle. Only the manifest is read up front; each model is loaded
+    the first time it is used, so a caller that never predicts pays nothing.
+    """
+
+    def __init__(self, bundle_dir=BUNDLE_DIR, engine=DEFAULT_ENGINE):
+        self.bundle_dir = bundle_dir
+        self.engine = engine
+        with open(os.path.join(bundle_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest['format_version'] != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Bundle format {self.manifest['format_version']} is not supported "
+                             f"(expected {BUNDLE_FORMAT_VERSION}); run 'python model_bundle.py --export'.")
+        self.features = self.manifest['feature_names']
+        self.classes = np.asarray(self.manifest['classes'], dtype=object)
+        self.category_labels = self.manifest['category_labels']
+        self._models = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model_names(self):
+        return list(self.manifest['models'])
+
+    def model(self, name):
+        if name not in self._models:
+            with self._lock:
+                if name not in self._models:
+                    if self.engine == 'compiled':
+                        spec = {'format': 'compiled', 'path': self.manifest['compiled'][name]}
+                    else:
+                        spec = self.manifest['models'][name]
+                    self._models[name] = _LOADERS[spec['format']](os.path.join(self.bundle_dir, spec['path']))
+        return self._models[name]
+
+
+class LegacyBundle(BundleBase):
+    """Same interface as ModelBundle, backed by the individual joblib pickles."""
+
+    _FILES = {name: f'{name.lower().replace(" ", "_")}_model.pkl' for name in MODEL_NAMES}
+
+    def __init__(self, model_dir=MODEL_DIR):
+        import joblib
+        self.model_dir = model_dir
+        self.features = joblib.load(os.path.join(model_dir, 'feature_names.pkl'))
+        self.classes = np.asarray(joblib.load(os.path.join(model_dir, 'label_encoder.pkl')).classes_, dtype=object)
+        self.category_labels = joblib.load(os.path.join(model_dir, 'category_labels.pkl'))
+        self._models = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model_names(self):
+        return list(MODEL_NAMES)
+
+    def model(self, name):
+        if name not in self._models:
+            import joblib
+            with self._lock:
+                if name not in self._models:
+                    self._models[name] = joblib.load(os.path.join(self.model_dir, self._FILES[name]))
+        return self._models[name]
+
+
+def load_bundle(bundle_dir=BUNDLE_DIR, model_dir=MODEL_DIR, engine=DEFAULT_ENGINE):
+    """Opens the native bundle, falling back to the legacy pickles when no bundle has been written."""
+    if os.path.exists(os.path.join(bundle_dir, MANIFEST_FILE)):
+        return ModelBundle(bundle_dir, engine)
+    return LegacyBundle(model_dir)
+
+
+def export_from_pickles(model_dir=MODEL_DIR, bundle_dir=BUNDLE_DIR):
+    """Builds a bundle from the existing pickles without retraining."""
+    import joblib
+    legacy = LegacyBundle(model_dir)
+    models = {name: legacy.model(name) for name in MODEL_NAMES}
+    scaler_path = os.path.join(model_dir, 'scaler.pkl')
+    scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+    return save_bundle(models, legacy.features, joblib.load(os.path.join(model_dir, 'label_encoder.pkl')),
+                       legacy.category_labels, scaler, bundle_dir)
+
+
+def prepare_features(df, features):
+    """
+    Model input from any frame of movie attributes: columns in training order, features the
+    frame does not have set to 0 (as the dashboard does for unset inputs), non-numeric or
+    missing values set to 0. Returns a contiguous float32 matrix.
+    """
+    import pandas as pd
+    X = df.reindex(columns=features, fill_value=0)
+    text = [col for col in features if X[col].dtype.kind not in 'biuf']
+    if text:
+        X[text] = X[text].apply(pd.to_numeric, errors='coerce')
+    return np.ascontiguousarray(X.fillna(0).to_numpy(dtype=np.float32))
+
+
+# ==============================================================================
+# COLD-START BENCHMARK
+# ==============================================================================
+_COLD_START_PROBE = """
+import resource, sys, time, json
+start = time.perf_counter()
+import numpy as np
+
+from tree_compiler import CompiledEnsemble, compile_model
+from model_bundle import LegacyBundle, ModelBundle
+kind = sys.argv[1]
+bundle = LegacyBundle(sys.argv[2]) if kind == 'pickles' else ModelBundle(sys.argv[2], engine=kind.split(':')[1])
+X = np.zeros((1, len(bundle.features)), dtype=np.float32)
+loaded = time.perf_counter()
+for name in bundle.model_names:
+    bundle.predict_proba(name, X)
+done = time.perf_counter()
+try:  # ru_maxrss survives exec on Linux and would report the parent's peak
+    with open('/proc/self/status') as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'manifest_s': loaded - start, 'first_predict_s': done - start, 'max_rss_mb': peak_kb / 1024}))
+"""
+
+
+def benchmark_cold_start(model_dir=MODEL_DIR, bundle_dir=BUNDLE_DIR, repeats=3):
+    """Times a fresh process loading each format and predicting one row with every model."""
+    rows = []
+    for kind, path in [('pickles', model_dir), ('bundle:native', bundle_dir), ('bundle:compiled', bundle_dir)]:
+        runs = []
+        for _ in range(repeats):
+            out = subprocess.run([sys.executable, '-c', _COLD_START_PROBE, kind, path],
+                                 capture_output=True, text=True, check=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        rows.append({'Format': kind, **{k: float(np.median([r[k] for r in runs])) for k in runs[0]}})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or benchmark the native inference bundle.")
+    parser.add_argument('--export', action='store_true', help="Build the bundle from the existing pickles.")
+    parser.add_argument('--benchmark', action='store_true', help="Compare cold start of pickles vs bundle.")
+    args = parser.parse_args()
+    start_tracing('model_bundle')
+
+    try:
+        if args.export:
+            start = time.perf_counter()
+            export_from_pickles()
+            print(f"✅ Bundle written to '{BUNDLE_DIR}' in {time.perf_counter() - start:.2f}s.")
+        if args.benchmark:
+            print("\n--- Cold start: import + load + one prediction per model (median of 3) ---")
+            for row in benchmark_cold_start():
+                print(f"{row['Format']:>15}: first predict {row['first_predict_s'] * 1000:8.1f} ms | "
+                      f"manifest/metadata {row['manifest_s'] * 1000:8.1f} ms | "
+                      f"peak RSS {row['max_rss_mb']:7.1f} MB")
+    except Exception as e:
+        print(f"An error occurred: {e}")
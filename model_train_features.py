@@ -1,6 +1,8 @@
-import pandas as pd
 import os
 
+from dataset_io import read_dataset, write_dataset
+from instrumentation import start_tracing
+
 # --- Configuration ---
 # This is the "master" file with all columns
 INPUT_CSV = "dataset/Final_dataset/movies_all_features_processed_v2.csv"
@@ -49,9 +51,10 @@ FINAL_COLUMNS_FOR_MODEL = [
     'commentCount'
 ]
 
+start_tracing('model_train_features')
 try:
     # Load the "master" file
-    df = pd.read_csv(INPUT_CSV)
+    df = read_dataset(INPUT_CSV)
     print(f"Loaded {len(df)} rows from '{INPUT_CSV}'.")
 
     # Ensure the output directory exists
@@ -76,10 +79,10 @@ try:
         print("Filled all remaining empty (NaN) values with 0.")
 
         # Save the final model-ready file
-        df_model_ready.to_csv(OUTPUT_CSV, index=False)
+        saved = write_dataset(df_model_ready, OUTPUT_CSV)
 
         print(f"\n✅✅✅ All Processing Complete! ✅✅✅")
-        print(f"Your final, model-ready dataset is saved to:\n{OUTPUT_CSV}")
+        print(f"Your final, model-ready dataset is saved to:\n{saved}")
 
 except FileNotFoundError:
     print(f"Error: The input file '{INPUT_CSV}' was not found.")
@@ -1,6 +1,9 @@
 import pandas as pd
+import numpy as np
 
+import argparse
 import os
+import time
 import joblib
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
@@ -8,72 +11,293 @@ from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
-from sklearn.utils.class_weight import compute_sample_weight
+from sklearn.utils.class_weight import compute_class_weight, compute_sample_weight
+
+from instrumentation import span, start_tracing, traced
+from dataset_io import read_dataset
+from ensemble import fit_ensemble
+from model_bundle import load_bundle, save_bundle
 
 # --- Configuration ---
 INPUT_CSV = "dataset/Final_dataset/model_training_dataset_FINAL10.csv"
 OUTPUT_DIR = "dataset/visuals"
 MODEL_DIR = "dataset/models"
 TARGET_COLUMN = 'Day1_collection_cr'
+# Written by hyperparameter_search.py; used instead of the defaults when present
+BEST_PARAMS_FILE = os.path.join(MODEL_DIR, 'best_params.pkl')
+# Which rows the current models were trained/tested on, for incremental updates
+TRAINING_STATE_FILE = os.path.join(MODEL_DIR, 'training_state.pkl')
+INCREMENTAL_ROUNDS = 20        # trees / boosting rounds added per incremental update
+MAX_INCREMENTAL_GROWTH = 2.0   # rebuild from scratch once a model has grown past this multiple
 
-try:
-    df = pd.read_csv(INPUT_CSV)
-    df.dropna(subset=[TARGET_COLUMN], inplace=True)
-    print(f"Number rows:{len(df)}")
+BINS = [-1, 5, 20, 1000]
+LABELS = ['Low (< 5Cr)', 'Medium (5-20Cr)', 'High (> 20Cr)']
 
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    os.makedirs(MODEL_DIR, exist_ok=True)
+DEFAULT_PARAMS = {
+    'Random Forest': {'n_estimators': 100},
+    'XGBoost': {'n_estimators': 100},
+    'LightGBM': {'n_estimators': 100},
+}
 
-    # prepare the data
-    bins = [-1, 5, 20, 1000]
-    labels = ['Low (< 5Cr)', 'Medium (5-20Cr)', 'High (> 20Cr)']
-    df['Category'] = pd.cut(df[TARGET_COLUMN], bins=bins, labels=labels)
 
+def load_training_data(input_csv=INPUT_CSV):
+    """Loads the model-ready dataset and bins the target into the three categories."""
+    df = read_dataset(input_csv)
+    df.dropna(subset=[TARGET_COLUMN], inplace=True)
+    df['Category'] = pd.cut(df[TARGET_COLUMN], bins=BINS, labels=LABELS)
+    return df
+
+
+def split_features(df):
+    """Encodes the category labels and separates the feature matrix from the target."""
     le = LabelEncoder()
     df['Category_Encoded'] = le.fit_transform(df['Category'])
+    y = df['Category_Encoded']
+    X = df.drop(columns=[TARGET_COLUMN, 'Category', 'Category_Encoded'])
+    return X, y, le
 
 
+def load_best_params():
+    """Returns the tuned parameters per model family, or the defaults if no search has been run."""
+    params = {name: dict(p) for name, p in DEFAULT_PARAMS.items()}
+    if os.path.exists(BEST_PARAMS_FILE):
+        for name, tuned in joblib.load(BEST_PARAMS_FILE).items():
+            params[name] = dict(tuned)
+        print(f"Using tuned parameters from '{BEST_PARAMS_FILE}'.")
+    return params
+
+
+def build_models(params=None):
+    """Creates the three (unfitted) classifiers from a {model name: kwargs} mapping."""
+    params = params or DEFAULT_PARAMS
+    return {
+        'Random Forest': RandomForestClassifier(random_state=42, class_weight='balanced',
+                                                **params['Random Forest']),
+        'XGBoost': XGBClassifier(random_state=42, eval_metric='mlogloss', **params['XGBoost']),
+        'LightGBM': LGBMClassifier(random_state=42, class_weight='balanced', verbose=-1,
+                                   **params['LightGBM']),
+    }
+
+
+def fit_models(models, X_train, y_train):
+    """Fits every model; XGBoost gets balanced sample weights since it has no class_weight."""
+    for name, model in models.items():
+        with span(f'fit {name}', 'fit', rows=len(X_train)):
+            if name == 'XGBoost':
+                sample_weights = compute_sample_weight(class_weight='balanced', y=y_train)
+                model.fit(X_train, y_train, sample_weight=sample_weights)
+            else:
+                model.fit(X_train, y_train)
+    return models
+
+
+def score_predictions(name, y_test, y_pred):
+    """One row of the comparison table."""
+    return {
+        'Model': name,
+        'Accuracy': accuracy_score(y_test, y_pred),
+        'F1-Score (W)': f1_score(y_test, y_pred, average='weighted'),
+        'Precision (W)': precision_score(y_test, y_pred, average='weighted', zero_division=0),
+        'Recall (W)': recall_score(y_test, y_pred, average='weighted')
+    }
+
+
+@traced('evaluate models')
+def evaluate_models(models, X_test, y_test):
+    """Scores each model on the test split and returns the comparison table."""
+    return pd.DataFrame([score_predictions(name, y_test, model.predict(X_test)) for name, model in models.items()])
+
+
+def model_path(name):
+    """Artifact path for a model, e.g. 'Random Forest' -> dataset/models/random_forest_model.pkl."""
+    return os.path.join(MODEL_DIR, f'{name.lower().replace(" ", "_")}_model.pkl')
+
+
+def row_hashes(X, y_raw):
+    """Stable per-row fingerprint of features + target, used to detect newly labelled movies."""
+    # Hashed as float64 so the fingerprint does not depend on how the columns were stored
+    return pd.util.hash_pandas_object(X.astype(np.float64).assign(_target=y_raw.values), index=False).to_numpy()
+
+
+@traced('save artifacts', 'io')
+def save_artifacts(models, X, le, scaler, results_df, state):
+    """Writes pickles, the inference bundle, the metrics table and the training state."""
     joblib.dump(le, os.path.join(MODEL_DIR, 'label_encoder.pkl'))
-    joblib.dump(labels, os.path.join(MODEL_DIR, 'category_labels.pkl'))
-    y = df['Category_Encoded']
-    X = df.drop(columns=[TARGET_COLUMN, 'Category', 'Category_Encoded'])
+    joblib.dump(LABELS, os.path.join(MODEL_DIR, 'category_labels.pkl'))
     joblib.dump(X.columns.tolist(), os.path.join(MODEL_DIR, 'feature_names.pkl'))
+    joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
+    for name, model in models.items():
+        joblib.dump(model, model_path(name))
+    bundle_dir = save_bundle(models, X.columns, le, LABELS, scaler)
+    print(f"Inference bundle saved to '{bundle_dir}'.")
+    results_df.to_csv(os.path.join(OUTPUT_DIR, 'model_comparison_results.csv'), index=False)
+    joblib.dump(state, TRAINING_STATE_FILE)
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
 
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
+def full_retrain(X_train, y_train, params):
+    """Fits all three models from scratch; returns (models, seconds)."""
+    start = time.perf_counter()
+    models = fit_models(build_models(params), X_train, y_train)
+    return models, time.perf_counter() - start
 
-    rf_model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
-    rf_model.fit(X_train, y_train)
 
-    sample_weights = compute_sample_weight(class_weight='balanced', y=y_train)
-    xgb_model = XGBClassifier(n_estimators=100, random_state=42, eval_metric='mlogloss')
-    xgb_model.fit(X_train, y_train, sample_weight=sample_weights)
+def grow_models(models, X_train, y_train, rounds=INCREMENTAL_ROUNDS):
+    """
+    Warm-starts the existing models on the updated training set: the forest gets
+    `rounds` more trees, XGBoost and LightGBM continue boosting for `rounds` rounds.
+    Returns (models, seconds).
+    """
+    start = time.perf_counter()
+    classes = np.unique(y_train)
+    grown = {}
 
-    lgbm_model = LGBMClassifier(n_estimators=100, random_state=42, class_weight='balanced', verbose=-1)
-    lgbm_model.fit(X_train, y_train)
+    rf = models['Random Forest']
+    # The 'balanced' preset is not warm_start-safe; pin the weights of the updated data instead
+    rf.set_params(warm_start=True, n_estimators=len(rf.estimators_) + rounds,
+                  class_weight=dict(zip(classes, compute_class_weight('balanced', classes=classes, y=y_train))))
+    grown['Random Forest'] = rf.fit(X_train, y_train)
 
-    print("\n--- Model Comparison ---")
-    models = {'Random Forest': rf_model, 'XGBoost': xgb_model, 'LightGBM': lgbm_model}
-    results = []
+    xgb_old = models['XGBoost']
+    xgb_new = XGBClassifier(**{**xgb_old.get_params(), 'n_estimators': rounds})
+    xgb_new.fit(X_train, y_train, sample_weight=compute_sample_weight(class_weight='balanced', y=y_train),
+                xgb_model=xgb_old.get_booster())
+    grown['XGBoost'] = xgb_new
 
-    for name, model in models.items():
-        y_pred = model.predict(X_test)
-        results.append({
-            'Model': name,
-            'Accuracy': accuracy_score(y_test, y_pred),
-            'F1-Score (W)': f1_score(y_test, y_pred, average='weighted'),
-            'Precision (W)': precision_score(y_test, y_pred, average='weighted', zero_division=0),
-            'Recall (W)': recall_score(y_test, y_pred, average='weighted')
+    lgbm_old = models['LightGBM']
+    lgbm_new = LGBMClassifier(**{**lgbm_old.get_params(), 'n_estimators': rounds})
+    lgbm_new.fit(X_train, y_train, init_model=lgbm_old.booster_)
+    grown['LightGBM'] = lgbm_new
+
+    return grown, time.perf_counter() - start
+
+
+def _model_sizes(models):
+    return {
+        'Random Forest': len(models['Random Forest'].estimators_),
+        'XGBoost': models['XGBoost'].get_booster().num_boosted_rounds(),
+        'LightGBM': models['LightGBM'].booster_.current_iteration(),
+    }
+
+
+def _load_incremental_state(params, le):
+    """Returns the previous training state if an incremental update is possible, else None."""
+    if not os.path.exists(TRAINING_STATE_FILE):
+        print("No training state found; running a full rebuild.")
+        return None
+    state = joblib.load(TRAINING_STATE_FILE)
+    if state['params'] != params:
+        print("Model parameters changed since the last build; running a full rebuild.")
+        return None
+    if list(state['classes']) != list(le.classes_):
+        print("Target classes changed since the last build; running a full rebuild.")
+        return None
+    if any(size > MAX_INCREMENTAL_GROWTH * params[name]['n_estimators']
+           for name, size in state['model_sizes'].items()):
+        print(f"Models have grown past {MAX_INCREMENTAL_GROWTH}x their configured size; running a full rebuild.")
+        return None
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the RF/XGBoost/LightGBM box office classifiers.")
+    parser.add_argument('--input', default=INPUT_CSV)
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="Retrain from scratch even if the current models could be updated incrementally.")
+    parser.add_argument('--compare', action='store_true',
+                        help="After an incremental update, also time a full retrain on the same split and report both.")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="Train from chunked parquet parts (converted from --input when it changes) with bounded memory.")
+    parser.add_argument('--convert', action='store_true',
+                        help="With --out-of-core: re-convert --input to parquet parts even if they are current.")
+    args = parser.parse_args()
+    start_tracing('model_training')
+
+    if args.out_of_core:
+        from out_of_core_training import train_out_of_core
+        try:
+            train_out_of_core(args.input, convert=args.convert)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        return
+
+    try:
+        with span('load training data', 'io'):
+            df = load_training_data(args.input)
+        print(f"Number rows:{len(df)}")
+
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        os.makedirs(MODEL_DIR, exist_ok=True)
+
+        X, y, le = split_features(df)
+        hashes = row_hashes(X, df[TARGET_COLUMN])
+        params = load_best_params()
+        state = None if args.full_rebuild else _load_incremental_state(params, le)
+
+        if state is None:
+            X_train, X_test, y_train, y_test, h_train, h_test = train_test_split(
+                X, y, hashes, test_size=0.2, random_state=42, stratify=y)
+            models, seconds = full_retrain(X_train, y_train, params)
+            mode = 'full'
+        else:
+            is_new = ~np.isin(hashes, np.concatenate([state['train_hashes'], state['test_hashes']]))
+            if not is_new.any():
+                print("\n✅ No new labelled movies since the last build. Models are up to date.")
+                return
+            new_idx = np.flatnonzero(is_new)
+            new_y = y.iloc[new_idx]
+            # Hold out a share of the new movies too, when there are enough of every class to stratify
+            if len(new_idx) >= 10 and new_y.value_counts().min() >= 2:
+                new_train, new_test = train_test_split(new_idx, test_size=0.2, random_state=42, stratify=new_y)
+            else:
+                new_train, new_test = new_idx, new_idx[:0]
+            train_mask = np.isin(hashes, state['train_hashes'])
+            train_mask[new_train] = True
+            test_mask = np.isin(hashes, state['test_hashes'])
+            test_mask[new_test] = True
+            X_train, y_train, h_train = X[train_mask], y[train_mask], hashes[train_mask]
+            X_test, y_test, h_test = X[test_mask], y[test_mask], hashes[test_mask]
+            print(f"Found {len(new_idx)} new labelled movies ({len(new_train)} train / {len(new_test)} test). "
+                  f"Updating models incrementally...")
+
+            previous = {name: joblib.load(model_path(name)) for name in DEFAULT_PARAMS}
+            models, seconds = grow_models(previous, X_train, y_train)
+            mode = 'incremental'
+
+        scaler = StandardScaler()
+        scaler.fit(X_train)
+
+        print(f"\n--- Model Comparison ({mode}, fit in {seconds:.2f}s) ---")
+        results_df = evaluate_models(models, X_test, y_test)
+        print(results_df)
+
+        if mode == 'incremental' and args.compare:
+            full_models, full_seconds = full_retrain(X_train, y_train, params)
+            full_df = evaluate_models(full_models, X_test, y_test)
+            comparison = pd.DataFrame({
+                'Model': results_df['Model'],
+                'Incremental Accuracy': results_df['Accuracy'],
+                'Full Accuracy': full_df['Accuracy'],
+                'Incremental F1 (W)': results_df['F1-Score (W)'],
+                'Full F1 (W)': full_df['F1-Score (W)'],
+            })
+            print(f"\n--- Incremental ({seconds:.2f}s) vs full retrain ({full_seconds:.2f}s) ---")
+            print(comparison.to_string(index=False))
+            comparison.to_csv(os.path.join(OUTPUT_DIR, 'incremental_vs_full.csv'), index=False)
+
+        save_artifacts(models, X, le, scaler, results_df, {
+            'train_hashes': np.asarray(h_train), 'test_hashes': np.asarray(h_test),
+            'params': params, 'classes': list(le.classes_), 'model_sizes': _model_sizes(models),
         })
-        joblib.dump(model, os.path.join(MODEL_DIR, f'{name.lower().replace(" ", "_")}_model.pkl'))
+        # Soft-voting weights are fitted on part of the held-out movies and reported on the rest
+        ensemble_df = pd.DataFrame(fit_ensemble(load_bundle(), X_test, y_test))
+        print("\n--- Soft-voting ensemble (weights fitted on half of the test split) ---")
+        print(ensemble_df.to_string(index=False))
+
+        print(f"\n✅ Training complete ({mode}). Artifacts saved to '{MODEL_DIR}' and '{OUTPUT_DIR}'.")
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
 
-    results_df = pd.DataFrame(results)
-    print(results_df)
-    results_df.to_csv(os.path.join(OUTPUT_DIR, 'model_comparison_results.csv'), index=False)
-    print(f"\n✅ Training complete. Artifacts saved to '{MODEL_DIR}' and '{OUTPUT_DIR}'.")
 
-except Exception as e:
-    print(f"An error occurred: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
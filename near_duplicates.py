@@ -0,0 +1,388 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog_store import iso_date, language_key, normalize_title
+from instrumentation import count, span, start_tracing
+
+# --- Configuration ---
+SHINGLE_SIZE = 3          # character n-grams of the normalized title
+NUM_HASHES = 64
+BANDS = 16                # 16 bands x 4 hashes: titles above ~0.5 similarity share a bucket
+SIMILARITY = 0.7          # estimated shingle Jaccard a candidate needs to count as the same title
+YEAR_TOLERANCE = 1        # sources disagree on the year of late-December releases
+RUNTIME_TOLERANCE = 10    # minutes; censor cuts and credits make sources differ a little
+MAX_WINDOW = 64           # bucket neighbours compared per row (after sorting by year)
+PAIR_CHUNK = 500_000
+YEAR_COLUMNS = ['Year', 'Release_Year']
+RUNTIME_COLUMNS = ['Runtime (min)', 'Runtime(mins)', 'Runtime']   # Hindi, English/Tamil, TMDb
+DIRECTOR_COLUMNS = ['Director']
+RELEASE_DATE_COLUMNS = ['Release Date', 'Release date (India)', 'release_date']
+LANGUAGE_COLUMN = 'Language'
+SEED = 42
+
+
+# ==============================================================================
+# SIGNATURES
+# ==============================================================================
+def shingles(key, size=SHINGLE_SIZE):
+    """Character n-grams of a normalized title, padded so short titles and word edges count."""
+    text = f' {key} '
+    return {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+
+
+def shingle_codes(keys, size=SHINGLE_SIZE):
+    """
+    (codes, starts): every padded n-gram of every key as one integer (its code points, 21 bits
+    each, so Devanagari and Tamil keys work too), and the offset of each key's first n-gram.
+    Built from one code-point buffer instead of a Python set per title.
+    """
+    text = np.frombuffer(''.join(f' {key} \0' for key in keys).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    width = len(text) - size + 1
+    codes = np.zeros(width, dtype=np.uint64)
+    complete = np.ones(width, dtype=bool)
+    for offset in range(size):
+        window = text[offset:offset + width]
+        codes = (codes << np.uint64(21)) | window
+        complete &= window != 0      # n-grams that run into the separator belong to no title
+    owners = np.cumsum(text == 0)[:width] - (text[:width] == 0)
+    codes, owners = codes[complete], owners[complete]
+    return codes, np.searchsorted(owners, np.arange(len(keys)))
+
+
+def minhash_signatures(keys, num_hashes=NUM_HASHES, seed=SEED):
+    """(len(keys), num_hashes) MinHash signatures of the titles' shingle sets."""
+    codes, starts = shingle_codes(keys)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, np.iinfo(np.uint64).max, num_hashes, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, num_hashes, dtype=np.uint64, endpoint=True)
+    shift = np.uint64(32)
+    signatures = np.empty((len(starts), num_hashes), dtype=np.uint32)
+    for h in range(num_hashes):
+        # Multiply-shift hash (wraps mod 2**64, keeps the high bits); the minimum over each title's shingles
+        signatures[:, h] = np.minimum.reduceat((a[h] * codes + b[h]) >> shift, starts)
+    return signatures
+
+
+# ==============================================================================
+# CANDIDATES AND VERIFICATION
+# ==============================================================================
+def _first_column(df, names):
+    return next((c for c in names if c in df.columns), None)
+
+
+def _fact_codes(df, names, normalize):
+    """Codes of a column's normalized values; -1 where unknown or the column is absent."""
+    column = _first_column(df, names)
+    if column is None:
+        return np.full(len(df), -1, dtype=np.int64)
+    codes, uniques = pd.factorize(df[column])
+    keys = pd.Series([normalize(v) for v in uniques] + [None], dtype=object)
+    return pd.factorize(keys.iloc[codes].to_numpy())[0]   # None -> -1
+
+
+def _director_key(value):
+    """'Joe Russo, Anthony Russo' and 'Anthony Russo, Joe Russo' are the same directors."""
+    names = sorted(filter(None, (normalize_title(n) for n in str(value).split(','))))
+    return ', '.join(names) or None
+
+
+def movie_attributes(df):
+    """
+    Normalized title keys, years (0 = unknown), runtimes (NaN = unknown), language and number
+    codes, and (rows, 2) codes of the director and release date (-1 = unknown).
+    """
+    codes, uniques = pd.factorize(df['Title'])
+    titles = np.array([normalize_title(t) for t in uniques] + [''], dtype=object)[codes]
+
+    year_column = next((c for c in YEAR_COLUMNS if c in df.columns), None)
+    years = np.zeros(len(df), dtype=np.int64)
+    if year_column:
+        values = pd.to_numeric(df[year_column], errors='coerce').to_numpy(dtype=float)
+        valid = (values > 1800) & (values < 2200)
+        years[valid] = values[valid].astype(np.int64)
+
+    runtime_column = _first_column(df, RUNTIME_COLUMNS)
+    runtimes = (pd.to_numeric(df[runtime_column], errors='coerce').to_numpy(dtype=float)
+                if runtime_column else np.full(len(df), np.nan))
+    # Two known, different directors or release dates are two movies ('The Twisters' vs 'Twisters')
+    facts = np.stack([_fact_codes(df, DIRECTOR_COLUMNS, _director_key),
+                      _fact_codes(df, RELEASE_DATE_COLUMNS, iso_date)], axis=1)
+
+    if LANGUAGE_COLUMN in df.columns:
+        codes, uniques = pd.factorize(df[LANGUAGE_COLUMN], use_na_sentinel=False)
+        languages = pd.factorize(np.array([language_key(v) for v in uniques], dtype=object)[codes])[0]
+    else:
+        languages = np.zeros(len(df), dtype=np.int64)
+
+    # 'Kesari Chapter 2' and 'Kesari Chapter 3' are similar titles but different movies
+    numbers = pd.factorize(pd.Series(titles).str.findall(r'\d+').str.join(' '))[0]
+    return titles, years, runtimes, languages, numbers, facts
+
+
+def candidate_pairs(signatures, years, languages, bands=BANDS, window=MAX_WINDOW):
+    """
+    Unique (i, j) row pairs, i < j, that share an LSH bucket (one band of the signature, same
+    language). Buckets are sorted by year and each row meets at most `window` bucket neighbours,
+    so an over-full bucket (one title released every year) cannot make this quadratic.
+    """
+    n, rows = signatures.shape[0], signatures.shape[1] // bands
+    mix = np.random.default_rng(SEED).integers(1, np.iinfo(np.int64).max, rows, dtype=np.uint64) | np.uint64(1)
+    found = []
+    for band in range(bands):
+        # One 64-bit hash per band (collisions only add candidates that verification drops)
+        bucket = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64) @ mix
+        order = np.lexsort((years, languages, bucket))
+        sorted_bucket, sorted_language = bucket[order], languages[order]
+        # Most rows are alone in their bucket; only rows with a bucket neighbour go on
+        shared = (sorted_bucket[1:] == sorted_bucket[:-1]) & (sorted_language[1:] == sorted_language[:-1])
+        in_group = np.r_[shared, False] | np.r_[False, shared]
+        order, sorted_bucket, sorted_language = order[in_group], sorted_bucket[in_group], sorted_language[in_group]
+        for offset in range(1, window + 1):
+            same = ((sorted_bucket[offset:] == sorted_bucket[:-offset])
+                    & (sorted_language[offset:] == sorted_language[:-offset]))
+            if not same.any():
+                break
+            found.append(np.stack([order[:-offset][same], order[offset:][same]], axis=1))
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(found), axis=1)
+    codes = np.sort(pairs[:, 0] * n + pairs[:, 1])   # a pair found in several bands is kept once
+    codes = codes[np.r_[True, codes[1:] != codes[:-1]]]
+    return np.stack([codes // n, codes % n], axis=1)
+
+
+def verify_pairs(pairs, signatures, years, runtimes, numbers, facts, similarity=SIMILARITY):
+    """
+    Candidate pairs that really look like one movie (similar title, compatible year and runtime,
+    no conflicting director or release date), with their estimated title similarity.
+    """
+    keep, estimates = [], []
+    for begin in range(0, len(pairs), PAIR_CHUNK):
+        i, j = pairs[begin:begin + PAIR_CHUNK].T
+        estimate = (signatures[i] == signatures[j]).mean(axis=1)
+        year_ok = (years[i] == 0) | (years[j] == 0) | (np.abs(years[i] - years[j]) <= YEAR_TOLERANCE)
+        runtime_gap = np.abs(runtimes[i] - runtimes[j])
+        runtime_ok = np.isnan(runtime_gap) | (runtime_gap <= RUNTIME_TOLERANCE)
+        facts_ok = ((facts[i] == facts[j]) | (facts[i] < 0) | (facts[j] < 0)).all(axis=1)
+        keep.append((estimate >= similarity) & year_ok & runtime_ok & facts_ok & (numbers[i] == numbers[j]))
+        estimates.append(estimate)
+    if not keep:
+        return pairs, np.empty(0)
+    keep = np.concatenate(keep)
+    return pairs[keep], np.concatenate(estimates)[keep]
+
+
+def cluster_pairs(n, pairs, similarity, years, runtimes, facts):
+    """
+    Cluster labels from matched pairs: union-find, most similar pairs first. A union that would
+    stretch a cluster's known years or runtimes past the tolerances, or join two different known
+    directors or release dates, is skipped, so a title that was released in 2016, 2017 and 2018
+    does not chain into one movie.
+    """
+    parent = list(range(n))
+    known = years > 0
+    lo_year = np.where(known, years, np.iinfo(np.int64).max).tolist()
+    hi_year = np.where(known, years, np.iinfo(np.int64).min).tolist()
+    lo_runtime = np.where(np.isnan(runtimes), np.inf, runtimes).tolist()
+    hi_runtime = np.where(np.isnan(runtimes), -np.inf, runtimes).tolist()
+    known_facts = facts.tolist()
+
+    def root(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    skipped = 0
+    for i, j in pairs[np.argsort(-similarity, kind='stable')].tolist():
+        a, b = root(i), root(j)
+        if a == b:
+            continue
+        years_span = max(hi_year[a], hi_year[b]) - min(lo_year[a], lo_year[b])
+        runtime_span = max(hi_runtime[a], hi_runtime[b]) - min(lo_runtime[a], lo_runtime[b])
+        conflict = any(x >= 0 and y >= 0 and x != y for x, y in zip(known_facts[a], known_facts[b]))
+        if years_span > YEAR_TOLERANCE or runtime_span > RUNTIME_TOLERANCE or conflict:
+            skipped += 1
+            continue
+        parent[b] = a
+        known_facts[a] = [x if x >= 0 else y for x, y in zip(known_facts[a], known_facts[b])]
+        lo_year[a], hi_year[a] = min(lo_year[a], lo_year[b]), max(hi_year[a], hi_year[b])
+        lo_runtime[a], hi_runtime[a] = min(lo_runtime[a], lo_runtime[b]), max(hi_runtime[a], hi_runtime[b])
+    count('merges skipped (would chain)', skipped)
+    return np.unique([root(node) for node in range(n)], return_inverse=True)[1]
+
+
+def find_duplicates(df, similarity=SIMILARITY):
+    """
+    Cluster label per row of `df` (positional); rows with the same label are one movie.
+    Rows without a near-duplicate keep a label of their own.
+    """
+    titles, years, runtimes, languages, numbers, facts = movie_attributes(df)
+    valid = np.flatnonzero(titles != '')   # rows without a title are never merged
+    if len(valid) == 0:
+        return np.arange(len(df))
+    with span('minhash signatures', 'compute', rows=len(valid)):
+        signatures = minhash_signatures(titles[valid])
+    with span('lsh candidates', 'compute'):
+        pairs = candidate_pairs(signatures, years[valid], languages[valid])
+    with span('verify candidates', 'compute', pairs=len(pairs)):
+        matched, estimates = verify_pairs(pairs, signatures, years[valid], runtimes[valid], numbers[valid],
+                                          facts[valid], similarity)
+    count('candidate pairs', len(pairs))
+    count('duplicate pairs', len(matched))
+    with span('cluster pairs', 'compute'):
+        return cluster_pairs(len(df), valid[matched], estimates, years, runtimes, facts)
+
+
+# ==============================================================================
+# MERGING
+# ==============================================================================
+def merge_duplicates(df, labels):
+    """
+    One row per cluster, at the position of its first row. Each column takes the value of the
+    most complete row (most non-null fields) that has one, so duplicates fill each other's gaps.
+    """
+    sizes = np.bincount(labels)
+    duplicated = sizes[labels] > 1
+    if not duplicated.any():
+        return df.copy()
+    positions = np.arange(len(df))
+    part = df.iloc[duplicated]
+    part_labels = labels[duplicated]
+    ranked = np.argsort(-part.notna().sum(axis=1).to_numpy(), kind='stable')
+    merged = part.iloc[ranked].groupby(part_labels[ranked], sort=False).first()
+    first_position = pd.Series(positions[duplicated]).groupby(part_labels).min()
+    merged.index = first_position[merged.index].to_numpy()
+
+    singles = df.iloc[~duplicated].set_axis(positions[~duplicated])
+    result = pd.concat([singles, merged]).sort_index()
+    result.index = df.index[result.index]
+    return result.astype(df.dtypes.to_dict(), errors='ignore')
+
+
+def duplicate_report(df, labels):
+    """The rows of every multi-row cluster, largest clusters first."""
+    sizes = np.bincount(labels)
+    report = df.assign(cluster=labels, cluster_size=sizes[labels])
+    report = report[report['cluster_size'] > 1]
+    return report.sort_values(['cluster_size', 'cluster'], ascending=[False, True])
+
+
+def deduplicate(df, similarity=SIMILARITY):
+    """(deduplicated df, report of the merged clusters)."""
+    labels = find_duplicates(df, similarity)
+    with span('merge clusters', 'compute'):
+        return merge_duplicates(df, labels), duplicate_report(df, labels)
+
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+CONSONANTS = list('bcdfghjklmnprstvwyz') + ['sh', 'kh', 'ch', 'bh', 'dh']
+VOWELS = ['a', 'e', 'i', 'o', 'u', 'aa', 'ee']
+
+
+def near_duplicate_catalog(n_rows, duplicate_share=0.05, seed=SEED):
+    """Synthetic catalog where `duplicate_share` of the movies reappear as title/metadata variants."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.unique([''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.integers(1, 4)))
+                            + rng.choice(['', 'n', 'r', 'l']) for _ in range(20_000)])
+    words = rng.integers(2, 5, n_rows)
+    titles = [' '.join(vocabulary[rng.integers(0, len(vocabulary), k)]).title() for k in words]
+    sequel = rng.random(n_rows) < 0.15
+    titles = [f'{t} {rng.integers(2, 6)}' if s else t for t, s in zip(titles, sequel)]
+    df = pd.DataFrame({
+        'Title': titles, 'Year': rng.integers(2016, 2026, n_rows).astype(float),
+        'Language': rng.choice(['Hindi', 'English'], n_rows, p=[0.7, 0.3]),
+        'Runtime (min)': np.round(rng.normal(140, 20, n_rows)),
+        'Director': [f'Director {i}' for i in rng.integers(0, n_rows // 5 + 1, n_rows)],
+        'Day1_collection_cr': np.round(rng.lognormal(1, 1, n_rows), 2),
+        'movie_id': np.arange(n_rows),
+    })
+
+    copies = df.sample(frac=duplicate_share, random_state=seed).copy()
+    variants = [lambda t: t, lambda t: t + ' ', lambda t: t.replace(' ', ': ', 1), str.upper,
+                lambda t: t[:-1] if len(t) > 12 else t + '!']   # copy, trailing space, punctuation, case, typo
+    copies['Title'] = [variants[v](t) for t, v in zip(copies['Title'], rng.integers(0, len(variants), len(copies)))]
+    copies.loc[rng.random(len(copies)) < 0.2, 'Year'] = np.nan
+    copies['Runtime (min)'] += rng.integers(-4, 5, len(copies))
+    for column in ['Director', 'Day1_collection_cr']:
+        copies.loc[rng.random(len(copies)) < 0.4, column] = np.nan
+    return pd.concat([df, copies], ignore_index=True).sample(frac=1, random_state=seed, ignore_index=True)
+
+
+def _pairs(labels):
+    """Set of unordered row pairs that share a label."""
+    series = pd.Series(np.arange(len(labels))).groupby(labels)
+    return {(a, b) for rows in series.groups.values() if len(rows) > 1
+            for k, a in enumerate(rows) for b in rows[k + 1:]}
+
+
+def benchmark(n_rows, sample=3_000):
+    """Precision/recall and time of LSH vs exact-title drop_duplicates and exhaustive pair comparison."""
+    df = near_duplicate_catalog(n_rows)
+    truth = _pairs(df['movie_id'].to_numpy())
+    rows = []
+
+    start = time.perf_counter()
+    labels = find_duplicates(df)
+    elapsed = time.perf_counter() - start
+    found = _pairs(labels)
+    rows.append(('MinHash/LSH', elapsed, len(found & truth) / max(1, len(found)), len(found & truth) / len(truth)))
+
+    start = time.perf_counter()
+    exact = pd.factorize(df['Title'])[0]
+    elapsed = time.perf_counter() - start
+    found = _pairs(exact)
+    rows.append(("drop_duplicates(subset='Title')", elapsed,
+                 len(found & truth) / max(1, len(found)), len(found & truth) / len(truth)))
+
+    # Every pair compared on exact shingle Jaccard, timed on a sample and extrapolated (n^2)
+    sets = [shingles(normalize_title(t)) for t in df['Title'].iloc[:sample]]
+    start = time.perf_counter()
+    for k, left in enumerate(sets):
+        for right in sets[k + 1:]:
+            len(left & right) / len(left | right)
+    rows.append(('All pairs (extrapolated)', (time.perf_counter() - start) * (len(df) / sample) ** 2,
+                 np.nan, np.nan))
+    return pd.DataFrame(rows, columns=['Approach', 'Seconds', 'Precision', 'Recall'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find and merge near-duplicate movies (MinHash/LSH on titles).")
+    parser.add_argument('--input', default=None, help="CSV or dataset name (default: the movie catalog).")
+    parser.add_argument('--output', default=None, help="Write the deduplicated catalog here (dataset_io target).")
+    parser.add_argument('--report', default=None, help="CSV of every merged cluster.")
+    parser.add_argument('--similarity', type=float, default=SIMILARITY)
+    parser.add_argument('--show', type=int, default=10, help="Clusters to print.")
+    parser.add_argument('--benchmark', type=int, default=None, metavar='ROWS',
+                        help="Run the synthetic benchmark on a catalog this size instead.")
+    args = parser.parse_args()
+    start_tracing('near_duplicates')
+
+    try:
+        if args.benchmark:
+            print(benchmark(args.benchmark).to_string(index=False))
+        else:
+            if args.input:
+                from dataset_io import read_dataset
+                df = read_dataset(args.input, categories=False)
+            else:
+                from catalog_store import read_catalog
+                df = read_catalog()
+            deduplicated, report = deduplicate(df, args.similarity)
+            clusters = report['cluster'].nunique()
+            print(f"✅ {len(df):,} movies -> {len(deduplicated):,} ({clusters:,} near-duplicate clusters merged).")
+            for cluster, rows in list(report.groupby('cluster', sort=False))[:args.show]:
+                print("  - " + ' | '.join(repr(t) for t in rows['Title']))
+            if args.report:
+                report.to_csv(args.report, index=False)
+                print(f"Cluster report saved to '{args.report}'.")
+            if args.output:
+                from dataset_io import write_dataset
+                print(f"Deduplicated catalog saved to '{write_dataset(deduplicated, args.output)}'.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
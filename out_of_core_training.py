@@ -0,0 +1,335 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import resource
+import time
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xgboost as xgb
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from dataset_io import dataset_path, iter_dataset
+from instrumentation import start_tracing, traced
+from model_bundle import save_bundle
+from model_training import (BINS, INPUT_CSV, LABELS, MODEL_DIR, OUTPUT_DIR, TARGET_COLUMN, build_models,
+                            load_best_params, score_predictions)
+
+# --- Configuration ---
+DATASET_DIR = "dataset/columnar/model_training"   # train/ and test/ parquet parts
+SOURCE_FILE = 'source.json'   # path, size and mtime of the CSV the parts were converted from
+CACHE_DIR = os.path.join(MODEL_DIR, 'out_of_core')
+CHUNK_ROWS = 100_000      # rows per parquet part, i.e. per batch held in memory
+TEST_SHARE = 5            # every 5th row by hash is held out (20%)
+RF_SAMPLE_ROWS = 200_000  # the forest has no streaming fit; it trains on a uniform sample
+MAX_BIN = 255
+SEED = 42
+
+
+# ==============================================================================
+# COLUMNAR DATASET
+# ==============================================================================
+@traced('convert csv to parquet', 'io')
+def convert_csv(input_csv=INPUT_CSV, dataset_dir=DATASET_DIR, chunk_rows=CHUNK_ROWS):
+    """
+    Streams the training CSV into parquet parts of `chunk_rows` rows, split into train/
+    and test/ by a hash of each row, so the split never needs the whole table in memory
+    and stays the same however the data is chunked.
+    """
+    if os.path.exists(os.path.join(dataset_dir, SOURCE_FILE)):
+        os.remove(os.path.join(dataset_dir, SOURCE_FILE))   # half-converted parts never look current
+    for split in ('train', 'test'):
+        os.makedirs(os.path.join(dataset_dir, split), exist_ok=True)
+        for old in glob.glob(os.path.join(dataset_dir, split, '*.parquet')):
+            os.remove(old)
+
+    counts = {'train': 0, 'test': 0}
+    for part, chunk in enumerate(iter_dataset(input_csv, chunk_rows)):
+        chunk = chunk.dropna(subset=[TARGET_COLUMN])
+        # Hashed as float64 so the split does not depend on how the columns were stored
+        is_test = pd.util.hash_pandas_object(chunk.astype(np.float64), index=False).to_numpy() % TEST_SHARE == 0
+        for split, rows in (('train', chunk[~is_test]), ('test', chunk[is_test])):
+            if len(rows):
+                table = pa.Table.from_pandas(rows.astype(np.float32).assign(
+                    **{TARGET_COLUMN: rows[TARGET_COLUMN].astype(np.float64)}), preserve_index=False)
+                pq.write_table(table, os.path.join(dataset_dir, split, f'part-{part:05d}.parquet'),
+                               compression='zstd')
+                counts[split] += len(rows)
+    with open(os.path.join(dataset_dir, SOURCE_FILE), 'w') as f:
+        json.dump(source_stamp(input_csv), f)
+    return counts
+
+
+def source_stamp(input_csv):
+    """Path, size and mtime of the file the parts are converted from."""
+    path = dataset_path(input_csv)
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def parts_are_current(input_csv, dataset_dir):
+    """True if parts exist and were converted from `input_csv` as it is now."""
+    stamp_path = os.path.join(dataset_dir, SOURCE_FILE)
+    if not list_parts(dataset_dir, 'train') or not os.path.exists(stamp_path):
+        return False
+    with open(stamp_path) as f:
+        return json.load(f) == source_stamp(input_csv)
+
+
+def list_parts(dataset_dir, split):
+    return sorted(glob.glob(os.path.join(dataset_dir, split, '*.parquet')))
+
+
+def encode_target(values, le):
+    """Bins raw Day 1 collections and encodes them exactly like model_training.py does."""
+    return le.transform(pd.cut(values, bins=BINS, labels=LABELS).astype(str))
+
+
+def read_part(path, features, le):
+    """Returns (X float32, y encoded) for one parquet part."""
+    table = pq.read_table(path, columns=features + [TARGET_COLUMN])
+    X = np.column_stack([table.column(f).to_numpy().astype(np.float32, copy=False) for f in features])
+    return X, encode_target(table.column(TARGET_COLUMN).to_numpy(), le)
+
+
+def read_targets(parts, le):
+    """Only the target column of every part; one number per row is all that is ever fully loaded."""
+    return np.concatenate([encode_target(pq.read_table(p, columns=[TARGET_COLUMN]).column(0).to_numpy(), le)
+                           for p in parts])
+
+
+def fingerprint(parts, **settings):
+    """Changes whenever a part is added, removed or rewritten, or a dataset setting changes."""
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    for path in parts:
+        stat = os.stat(path)
+        digest.update(f'{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+
+class ParquetPartSequence(lgb.Sequence):
+    """One parquet part as a LightGBM Sequence; only the most recently used part is kept in memory."""
+
+    _cached = (None, None)
+
+    def __init__(self, path, features):
+        self.path = path
+        self.features = features
+        self.n_rows = pq.ParquetFile(path).metadata.num_rows
+        self.batch_size = CHUNK_ROWS
+
+    def _load(self):
+        path, X = ParquetPartSequence._cached
+        if path != self.path:
+            table = pq.read_table(self.path, columns=self.features)
+            # LightGBM's sampler only accepts float64 rows
+            X = np.column_stack([table.column(f).to_numpy().astype(np.float64) for f in self.features])
+            ParquetPartSequence._cached = (self.path, X)
+        return X
+
+    def __getitem__(self, idx):
+        return self._load()[idx]
+
+    def __len__(self):
+        return self.n_rows
+
+
+class ParquetBatchIter(xgb.DataIter):
+    """Feeds XGBoost one parquet part at a time, with balanced sample weights."""
+
+    def __init__(self, parts, features, le, class_weight, cache_prefix):
+        self.parts = parts
+        self.features = features
+        self.le = le
+        self.class_weight = class_weight
+        self._it = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._it == len(self.parts):
+            return False
+        X, y = read_part(self.parts[self._it], self.features, self.le)
+        input_data(data=X, label=y, weight=self.class_weight[y])
+        self._it += 1
+        return True
+
+    def reset(self):
+        self._it = 0
+
+
+# ==============================================================================
+# TRAINING
+# ==============================================================================
+def balanced_weights(y, n_classes):
+    """Per-class weights n / (k * count), the scikit-learn 'balanced' formula."""
+    counts = np.bincount(y, minlength=n_classes)
+    return len(y) / (n_classes * np.maximum(counts, 1))
+
+
+@traced('lightgbm dataset', 'io')
+def lightgbm_dataset(parts, features, y, weights, cache_dir=CACHE_DIR):
+    """
+    Builds LightGBM's binned Dataset from the parquet parts and saves it as a binary
+    file. Later runs load the binary directly as long as the parts have not changed.
+    """
+    binary = os.path.join(cache_dir, 'lightgbm_train.bin')
+    stamp_file = binary + '.json'
+    params = {'max_bin': MAX_BIN, 'feature_pre_filter': False, 'verbose': -1}
+    stamp = fingerprint(parts, features=features, **params)
+
+    if os.path.exists(binary) and os.path.exists(stamp_file):
+        with open(stamp_file, encoding='utf-8') as f:
+            if json.load(f)['fingerprint'] == stamp:
+                print(f"Reusing LightGBM binary dataset '{binary}'.")
+                return lgb.Dataset(binary, params=params, free_raw_data=True)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    dataset = lgb.Dataset([ParquetPartSequence(p, features) for p in parts], label=y, weight=weights,
+                          params=params)
+    dataset.construct()
+    ParquetPartSequence._cached = (None, None)
+    if os.path.exists(binary):
+        os.remove(binary)
+    dataset.save_binary(binary)
+    with open(stamp_file, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': stamp, 'rows': len(y)}, f)
+    print(f"Saved LightGBM binary dataset to '{binary}'.")
+    return dataset
+
+
+@traced('fit LightGBM', 'fit')
+def train_lightgbm(dataset, params, n_classes):
+    native = {k: v for k, v in params.items() if k != 'n_estimators'}
+    native.update({'objective': 'multiclass', 'num_class': n_classes, 'seed': SEED, 'verbose': -1})
+    return lgb.train(native, dataset, num_boost_round=params.get('n_estimators', 100))
+
+
+@traced('fit XGBoost', 'fit')
+def train_xgboost(parts, features, le, class_weight, params, n_classes, cache_dir=CACHE_DIR):
+    """External-memory XGBoost: the quantised pages are built from the parts and spilled to disk."""
+    os.makedirs(cache_dir, exist_ok=True)
+    it = ParquetBatchIter(parts, features, le, class_weight, os.path.join(cache_dir, 'xgboost'))
+    dtrain = xgb.ExtMemQuantileDMatrix(it, max_bin=MAX_BIN + 1)
+    native = {k: v for k, v in params.items() if k != 'n_estimators'}
+    native.update({'objective': 'multi:softprob', 'num_class': n_classes, 'eval_metric': 'mlogloss',
+                   'seed': SEED, 'tree_method': 'hist', 'verbosity': 0})
+    return xgb.train(native, dtrain, num_boost_round=params.get('n_estimators', 100))
+
+
+@traced('fit Random Forest', 'fit')
+def train_random_forest(parts, features, le, params, n_train, sample_rows=RF_SAMPLE_ROWS):
+    """Fits the forest on a uniform Bernoulli sample of at most ~`sample_rows` training rows."""
+    rng = np.random.default_rng(SEED)
+    rate = min(1.0, sample_rows / max(n_train, 1))
+    X_parts, y_parts = [], []
+    for path in parts:
+        X, y = read_part(path, features, le)
+        keep = rng.random(len(y)) < rate
+        X_parts.append(X[keep])
+        y_parts.append(y[keep])
+    X_sample = pd.DataFrame(np.concatenate(X_parts), columns=features)
+    rf = build_models(params)['Random Forest']
+    return rf.fit(X_sample, np.concatenate(y_parts)), len(X_sample)
+
+
+@traced('evaluate streaming')
+def evaluate_streaming(models, parts, features, le):
+    """Scores every model on the held-out parts, one part at a time."""
+    y_true, y_pred = [], {name: [] for name in models}
+    for path in parts:
+        X, y = read_part(path, features, le)
+        y_true.append(y)
+        y_pred['Random Forest'].append(models['Random Forest'].predict(pd.DataFrame(X, columns=features)))
+        y_pred['XGBoost'].append(models['XGBoost'].inplace_predict(X).argmax(axis=1))
+        y_pred['LightGBM'].append(models['LightGBM'].predict(X).argmax(axis=1))
+    y_true = np.concatenate(y_true)
+    return pd.DataFrame([score_predictions(name, y_true, np.concatenate(pred)) for name, pred in y_pred.items()])
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train_out_of_core(input_csv=INPUT_CSV, dataset_dir=DATASET_DIR, convert=False):
+    """Trains all three models from the parquet parts without ever loading the full table."""
+    timings = {}
+    start = time.perf_counter()
+    # Re-converted whenever the source changed since the parts were written
+    if convert or not parts_are_current(input_csv, dataset_dir):
+        counts = convert_csv(input_csv, dataset_dir)
+        print(f"Converted '{input_csv}' to parquet parts: {counts['train']} train / {counts['test']} test rows.")
+    timings['convert'] = time.perf_counter() - start
+
+    train_parts, test_parts = list_parts(dataset_dir, 'train'), list_parts(dataset_dir, 'test')
+    schema = pq.read_schema(train_parts[0])
+    features = [name for name in schema.names if name != TARGET_COLUMN]
+    le = LabelEncoder().fit(LABELS)
+    n_classes = len(le.classes_)
+    params = load_best_params()
+
+    start = time.perf_counter()
+    y_train = read_targets(train_parts, le)
+    class_weight = balanced_weights(y_train, n_classes)
+    scaler = StandardScaler()
+    for path in train_parts:
+        scaler.partial_fit(read_part(path, features, le)[0])
+    timings['scan'] = time.perf_counter() - start
+    print(f"Training on {len(y_train)} rows in {len(train_parts)} parts.")
+
+    start = time.perf_counter()
+    dataset = lightgbm_dataset(train_parts, features, y_train, class_weight[y_train])
+    timings['lightgbm dataset'] = time.perf_counter() - start
+
+    models = {}
+    start = time.perf_counter()
+    models['Random Forest'], rf_rows = train_random_forest(train_parts, features, le, params, len(y_train))
+    timings['random forest'] = time.perf_counter() - start
+    print(f"Random Forest fit on a sample of {rf_rows} rows.")
+
+    start = time.perf_counter()
+    models['XGBoost'] = train_xgboost(train_parts, features, le, class_weight, params['XGBoost'], n_classes)
+    timings['xgboost'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    models['LightGBM'] = train_lightgbm(dataset, params['LightGBM'], n_classes)
+    timings['lightgbm'] = time.perf_counter() - start
+
+    print("\n--- Model Comparison (out-of-core) ---")
+    results_df = evaluate_streaming(models, test_parts, features, le)
+    print(results_df)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Only the bundle is written. The legacy pickles (models and their feature names, encoder and
+    # scaler) stay as model_training.py left them, so they always belong together
+    bundle_dir = save_bundle(models, features, le, LABELS, scaler)
+    results_df.to_csv(os.path.join(OUTPUT_DIR, 'model_comparison_results.csv'), index=False)
+
+    print("\n--- Timing breakdown ---")
+    for stage, seconds in timings.items():
+        print(f"{stage:>18}: {seconds:8.2f}s")
+    print(f"Peak RSS: {_peak_rss_mb():.0f} MB")
+    print(f"\n✅ Out-of-core training complete. Inference bundle saved to '{bundle_dir}'.")
+    return models, results_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train from chunked parquet data with bounded memory.")
+    parser.add_argument('--input', default=INPUT_CSV, help="CSV the parquet parts are converted from.")
+    parser.add_argument('--dataset-dir', default=DATASET_DIR)
+    parser.add_argument('--convert', action='store_true', help="Re-convert the CSV even if the parts are current.")
+    args = parser.parse_args()
+    start_tracing('out_of_core_training')
+
+    try:
+        train_out_of_core(args.input, args.dataset_dir, args.convert)
+    except Exception as e:
+        print(f"An error occurred: {e}")
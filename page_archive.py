@@ -0,0 +1,221 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import pandas as pd
+
+from instrumentation import count, span, start_tracing
+
+# --- Configuration ---
+ARCHIVE_DIR = "dataset/page_archive"
+SEGMENT_BYTES = 256 * 1024 ** 2   # a segment file is closed and a new one started past this size
+COMPRESSION_LEVEL = 6
+COMMIT_EVERY = 50                 # index rows per transaction; pages are on disk before their row
+IGNORED_PARAMS = {'api_key'}      # never stored, and not part of a page's key
+
+
+def page_key(url, params=None):
+    """The URL a page is archived under: query parameters merged and sorted, secrets dropped."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + list((params or {}).items())
+    query = sorted((str(k), str(v)) for k, v in query if k not in IGNORED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+class PageArchive:
+    """
+    Every fetched page, zlib-compressed and appended to segment files that are never rewritten,
+    with a SQLite index on (url, fetched_at). A page identical to the last copy of its URL is
+    indexed again but not stored twice. Each writing process appends to segments of its own, so
+    collectors running side by side do not interleave records.
+    """
+
+    def __init__(self, path=ARCHIVE_DIR):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(path, 'index.sqlite'), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    id INTEGER PRIMARY KEY, url TEXT NOT NULL, fetched_at REAL NOT NULL,
+                    sha1 TEXT NOT NULL, segment TEXT NOT NULL, offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL, size INTEGER NOT NULL)""")
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_url ON pages (url, fetched_at)')
+        self._segment, self._uncommitted = None, 0
+        self._readers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+            for fd in self._readers.values():
+                os.close(fd)
+            self.conn.commit()
+            self.conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def _open_segment(self):
+        """A new segment file; 'x' mode, so two writers never share one."""
+        existing = glob.glob(os.path.join(self.path, 'pages-*.z'))
+        number = max((int(os.path.basename(p)[6:-2]) for p in existing), default=-1) + 1
+        while True:
+            name = f'pages-{number:05d}.z'
+            try:
+                return open(os.path.join(self.path, name), 'xb')
+            except FileExistsError:
+                number += 1
+
+    # ==========================================================================
+    # WRITE
+    # ==========================================================================
+    def add(self, url, text, params=None, fetched_at=None):
+        """Archives one page under its page_key; returns True if new bytes were written."""
+        key = page_key(url, params)
+        raw = text.encode('utf-8')
+        sha1 = hashlib.sha1(raw).hexdigest()
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with span('archive compress', 'cpu'):
+            blob = zlib.compress(raw, COMPRESSION_LEVEL)   # outside the lock, so fetchers compress in parallel
+        with self._lock:
+            last = self.conn.execute('SELECT sha1, segment, offset, length FROM pages WHERE url = ? '
+                                     'ORDER BY fetched_at DESC LIMIT 1', (key,)).fetchone()
+            unchanged = last is not None and last[0] == sha1
+            if unchanged:
+                segment, offset, length = last[1:]
+                count('archive unchanged pages')
+            else:
+                if self._segment is None or self._segment.tell() >= SEGMENT_BYTES:
+                    if self._segment is not None:
+                        self._segment.close()
+                    self._segment = self._open_segment()
+                segment, offset, length = os.path.basename(self._segment.name), self._segment.tell(), len(blob)
+                self._segment.write(blob)
+                self._segment.flush()   # the bytes reach the file before the index points at them
+                count('archive bytes written', length)
+            self.conn.execute('INSERT INTO pages (url, fetched_at, sha1, segment, offset, length, size) '
+                              'VALUES (?, ?, ?, ?, ?, ?, ?)', (key, fetched_at, sha1, segment, offset, length, len(raw)))
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self.conn.commit()
+                self._uncommitted = 0
+        return not unchanged
+
+    # ==========================================================================
+    # READ
+    # ==========================================================================
+    def _read_blob(self, segment, offset, length):
+        with self._lock:
+            if segment not in self._readers:
+                self._readers[segment] = os.open(os.path.join(self.path, segment), os.O_RDONLY)
+            fd = self._readers[segment]
+        return os.pread(fd, length, offset)   # positional read: threads do not share a file offset
+
+    def latest(self, url, params=None, before=None):
+        """Text of the newest copy of a page (fetched at or before `before`, a timestamp), or None."""
+        sql = 'SELECT segment, offset, length FROM pages WHERE url = ?'
+        args = [page_key(url, params)]
+        if before is not None:
+            sql += ' AND fetched_at <= ?'
+            args.append(before)
+        with self._lock:
+            row = self.conn.execute(sql + ' ORDER BY fetched_at DESC LIMIT 1', args).fetchone()
+        if row is None:
+            return None
+        with span('archive read', 'io'):
+            blob = self._read_blob(*row)
+        return zlib.decompress(blob).decode('utf-8')
+
+    def history(self, url, params=None):
+        """Every fetch of a page: when, its hash and sizes."""
+        with self._lock:
+            return pd.read_sql_query('SELECT fetched_at, sha1, size, length AS compressed FROM pages '
+                                     'WHERE url = ? ORDER BY fetched_at', self.conn, params=[page_key(url, params)])
+
+    def stats(self):
+        """Pages and bytes per host, raw and as stored."""
+        with self._lock:
+            rows = self.conn.execute('SELECT url, size, length, segment, offset FROM pages').fetchall()
+        df = pd.DataFrame(rows, columns=['url', 'size', 'length', 'segment', 'offset'])
+        df['Host'] = df['url'].map(lambda u: urlsplit(u).netloc)
+        stored = df.drop_duplicates(['segment', 'offset'])
+        report = df.groupby('Host').agg(Fetches=('url', 'size'), Pages=('url', 'nunique'), **{'Raw MB': ('size', 'sum')})
+        report['Stored MB'] = stored.groupby('Host')['length'].sum()
+        report[['Raw MB', 'Stored MB']] /= 1024 ** 2
+        return report.reset_index()
+
+
+class ArchivedPages:
+    """
+    Offline stand-in for http_client.Client: get_text/get_json answer from the archive and never
+    touch the network, so the collectors' fetch steps re-run unchanged over stored pages.
+    """
+
+    def __init__(self, archive, before=None):
+        self.archive, self.before = archive, before
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def get_text(self, url, params=None):
+        """Newest archived text of the page, or None if it was never fetched."""
+        text = self.archive.latest(url, params, self.before)
+        key = 'hits' if text is not None else 'misses'
+        with self._lock:
+            stats = self._stats.setdefault(urlsplit(url).netloc, {'hits': 0, 'misses': 0})
+            stats[key] += 1
+        count(f'archive {key}')
+        return text
+
+    def get_json(self, url, params=None):
+        text = self.get_text(url, params)
+        try:
+            return json.loads(text) if text is not None else None
+        except ValueError:
+            return None
+
+    def report(self):
+        """Archive hits and misses per host."""
+        with self._lock:
+            return pd.DataFrame([{'Host': host, 'Archived': stats['hits'], 'Missing': stats['misses']}
+                                 for host, stats in sorted(self._stats.items())])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compressed archive of every page the collectors fetched.")
+    parser.add_argument('command', choices=['stats', 'history', 'show'])
+    parser.add_argument('url', nargs='?', help="history/show: the page URL.")
+    parser.add_argument('--archive', default=ARCHIVE_DIR)
+    args = parser.parse_args()
+    start_tracing('page_archive')
+
+    try:
+        with PageArchive(args.archive) as archive:
+            if args.command == 'stats':
+                print(f"Archive '{args.archive}': {len(archive):,} fetches.")
+                print(archive.stats().to_string(index=False))
+            elif args.command == 'history':
+                print(archive.history(args.url).assign(
+                    fetched_at=lambda d: pd.to_datetime(d['fetched_at'], unit='s')).to_string(index=False))
+            else:
+                text = archive.latest(args.url)
+                print(text if text is not None else f"⚠️ '{args.url}' is not in the archive.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, span
+
+# --- Configuration ---
+FETCH_THREADS = 6
+PARSE_PROCESSES = os.cpu_count() or 1
+PAGE_QUEUE_SIZE = 32         # fetched pages waiting for a parser; fetchers block when it is full
+PARSES_IN_FLIGHT = 2         # per parse process, so a worker never idles between pages
+_STOP = object()
+
+
+def timed_parse(parse, args):
+    """Runs one parse job in a pool worker; returns (value, seconds spent)."""
+    start = time.perf_counter()
+    return parse(*args), time.perf_counter() - start
+
+
+class FetchParsePipeline:
+    """
+    Producer/consumer crawl: fetcher threads (network-bound) put raw pages on a bounded queue,
+    a process pool parses them (BeautifulSoup and regex are CPU-bound and would hold the GIL),
+    and results come back on the calling thread. A full queue blocks the fetchers (backpressure).
+
+    fetch(client, item) -> (parse function, args) or None; both must be picklable, top-level.
+    on_result(item, value) -> follow-up items to fetch next (e.g. the next source), or None.
+    """
+
+    def __init__(self, client, fetchers=FETCH_THREADS, parsers=PARSE_PROCESSES, queue_size=PAGE_QUEUE_SIZE):
+        self.client = client
+        self.fetchers, self.parsers, self.queue_size = fetchers, parsers, queue_size
+        self._lock = threading.Lock()
+        self.stats = None
+
+    def _fetch_loop(self, work, pages, fetch):
+        while True:
+            item = work.get()
+            if item is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                job = fetch(self.client, item)
+            except Exception as e:
+                print(f"  -> Fetch failed for {item!r}: {e}")
+                count('fetch errors')
+                job = None
+            fetched = time.perf_counter()
+            pages.put((item, job))   # blocks while the parsers are behind
+            with self._lock:
+                self.stats['fetch_busy'] += fetched - start
+                self.stats['fetch_blocked'] += time.perf_counter() - fetched
+                self.stats['fetched'] += 1
+
+    def run(self, items, fetch, on_result):
+        """Fetches and parses every item (and their follow-ups); returns the per-stage report."""
+        work, pages = queue.Queue(), queue.Queue(maxsize=self.queue_size)
+        self.stats = {'fetch_busy': 0.0, 'fetch_blocked': 0.0, 'fetched': 0, 'parse_busy': 0.0, 'parsed': 0,
+                      'depth': []}
+        outstanding = 0
+        for item in items:
+            work.put(item)
+            outstanding += 1
+
+        threads = [threading.Thread(target=self._fetch_loop, args=(work, pages, fetch), daemon=True)
+                   for _ in range(self.fetchers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        in_flight = {}
+        max_in_flight = self.parsers * PARSES_IN_FLIGHT
+        with ProcessPoolExecutor(max_workers=self.parsers) as pool, span('fetch/parse pipeline', 'phase'):
+            while outstanding:
+                # Hand queued pages to the pool while it has room
+                while len(in_flight) < max_in_flight:
+                    try:
+                        item, job = pages.get(timeout=0.02 if in_flight else 0.2)
+                    except queue.Empty:
+                        break
+                    self.stats['depth'].append(pages.qsize())
+                    if job is None:
+                        outstanding += self._finish(item, None, on_result, work)
+                    else:
+                        in_flight[pool.submit(timed_parse, *job)] = item
+                if not in_flight:
+                    continue
+                done, _ = wait(in_flight, timeout=0.02, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    try:
+                        value, seconds = future.result()
+                    except Exception as e:
+                        print(f"  -> Parse failed for {item!r}: {e}")
+                        count('parse errors')
+                        value, seconds = None, 0.0
+                    self.stats['parse_busy'] += seconds
+                    self.stats['parsed'] += 1
+                    outstanding += self._finish(item, value, on_result, work)
+
+        for _ in threads:
+            work.put(_STOP)
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - start)
+
+    @staticmethod
+    def _finish(item, value, on_result, work):
+        """Hands a result back and queues its follow-ups; returns the change in outstanding items."""
+        follow_ups = on_result(item, value) or []
+        for follow_up in follow_ups:
+            work.put(follow_up)
+        return len(follow_ups) - 1
+
+    def report(self, wall):
+        """Items, busy time and utilization per stage, plus page-queue depth and fetcher blocking."""
+        stats = self.stats
+        depth = np.array(stats['depth'] or [0])
+        count('page queue max depth', int(depth.max()))
+        return pd.DataFrame([
+            {'Stage': 'fetch (threads)', 'Workers': self.fetchers, 'Items': stats['fetched'],
+             'Busy s': stats['fetch_busy'], 'Utilization': stats['fetch_busy'] / (self.fetchers * wall),
+             'Blocked on full queue s': stats['fetch_blocked']},
+            {'Stage': 'parse (processes)', 'Workers': self.parsers, 'Items': stats['parsed'],
+             'Busy s': stats['parse_busy'], 'Utilization': stats['parse_busy'] / (self.parsers * wall),
+             'Blocked on full queue s': np.nan},
+        ]).assign(**{'Queue mean': depth.mean(), 'Queue max': depth.max(), 'Queue size': self.queue_size,
+                     'Wall s': wall})
@@ -0,0 +1,337 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dataset_io import DATASETS, dataset_path
+from instrumentation import span, start_tracing
+
+# --- Configuration ---
+STATE_FILE = "dataset/pipeline_state.json"
+LOG_DIR = "dataset/pipeline_logs"
+HASH_BLOCK = 1 << 20
+# Each stage runs one script. Inputs and outputs are file paths or dataset_io dataset names;
+# a stage depends on every stage that produces one of its inputs. Collection (network)
+# stages are not listed: their output, the collected catalog, is the pipeline's source.
+STAGES = {
+    'clean': {'command': ['preprocess.py', 'clean'],
+              'inputs': ['dataset/catalog.sqlite'],
+              'outputs': ['dataset/Final_dataset/hindi_movies_5.csv']},
+    'merge': {'command': ['preprocess.py', 'merge'],
+              'inputs': ['dataset/Final_dataset/hindi_movies_5.csv',
+                         'dataset/Final_dataset/movie_trailers_youtube_stats.csv'],
+              'outputs': ['merged']},
+    'encode': {'command': ['encoding.py'],
+               'inputs': ['dataset/catalog.sqlite'],
+               'outputs': ['encoded']},
+    'features': {'command': ['popularity_score.py'],
+                 'inputs': ['merged'],
+                 'outputs': ['processed_catalog']},
+    'model_features': {'command': ['model_train_features.py'],
+                       'inputs': ['processed_catalog'],
+                       'outputs': ['model_features']},
+    # Actor scores are added to the model features by hand (model_training_dataset_FINAL_WITH_CAST)
+    'final_columns': {'command': ['final_coln_selection.py'],
+                      'inputs': ['training_with_cast'],
+                      'outputs': ['training_set']},
+    # A full rebuild: the stage only runs when its data or code changed, and an incremental run
+    # that finds no new rows would return without rewriting the outputs (a failed stage here)
+    'train': {'command': ['model_training.py', '--full-rebuild'],
+              'inputs': ['training_set'],
+              'outputs': ['dataset/models/bundle/manifest.json',
+                          'dataset/visuals/model_comparison_results.csv']},
+    'explanations': {'command': ['explanations.py'],
+                     'inputs': ['training_set', 'dataset/models/bundle/manifest.json'],
+                     'outputs': ['dataset/models/explanations.npz']},
+    'eda': {'command': ['EDA.py'],
+            'inputs': ['processed_catalog'],
+            'outputs': ['dataset/visuals/eda_hashes.json']},
+    'cube': {'command': ['aggregate_cube.py'],
+             'inputs': ['processed_catalog'],
+             'outputs': ['dataset/visuals/eda_cube.npz']},
+}
+
+
+# ==============================================================================
+# GRAPH
+# ==============================================================================
+def input_path(artifact):
+    """The file a stage will actually read for an artifact (None if it does not exist yet)."""
+    if artifact in DATASETS:
+        try:
+            return dataset_path(artifact)
+        except FileNotFoundError:
+            return None
+    return artifact if os.path.exists(artifact) else None
+
+
+def dependencies(stages=STAGES):
+    """{stage: set of stages producing one of its inputs}; raises ValueError on a cycle."""
+    producers = {artifact: name for name, stage in stages.items() for artifact in stage['outputs']}
+    deps = {name: {producers[a] for a in stage['inputs'] if a in producers and producers[a] != name}
+            for name, stage in stages.items()}
+    order, visiting = [], set()
+
+    def visit(name, path):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a cycle: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dep in sorted(deps[name]):
+            visit(dep, path + [name])
+        visiting.discard(name)
+        order.append(name)
+
+    for name in stages:
+        visit(name, [])
+    return deps
+
+
+def closure(targets, deps):
+    """The targets plus everything upstream of them."""
+    selected, stack = set(), list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(deps[name])
+    return selected
+
+
+# ==============================================================================
+# FINGERPRINTS
+# ==============================================================================
+def file_digest(path, cache):
+    """sha256 of a file, reused from `cache` while its size and mtime are unchanged."""
+    stat = os.stat(path)
+    key = f"{stat.st_size}:{stat.st_mtime_ns}"
+    cached = cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    cache[path] = [key, digest.hexdigest()]
+    return cache[path][1]
+
+
+def local_modules(script, root='.'):
+    """The script plus every repository module it imports, transitively."""
+    seen, stack = set(), [script]
+    while stack:
+        path = stack.pop()
+        if path in seen or not os.path.exists(path):
+            continue
+        seen.add(path)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            names = ([a.name for a in node.names] if isinstance(node, ast.Import)
+                     else [node.module] if isinstance(node, ast.ImportFrom) and node.module else [])
+            for name in names:
+                stack.append(os.path.join(root, name.split('.')[0] + '.py'))
+    return sorted(seen)
+
+
+def fingerprint(stage, cache):
+    """Digest of the command, the code it runs and the content of its inputs."""
+    digest = hashlib.sha256(json.dumps(stage['command']).encode())
+    for path in local_modules(stage['command'][0]):
+        digest.update(f"code {path} {file_digest(path, cache)}".encode())
+    for artifact in stage['inputs']:
+        path = input_path(artifact)
+        digest.update(f"input {artifact} {file_digest(path, cache) if path else 'missing'}".encode())
+    return digest.hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {'stages': {}, 'hashes': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def stale_reason(name, stage, state, force=False):
+    """Why a stage must run, or None if its outputs are current."""
+    if force:
+        return 'forced'
+    missing = [a for a in stage['outputs'] if input_path(a) is None]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    previous = state['stages'].get(name, {}).get('fingerprint')
+    if previous is None:
+        return 'never built'
+    if previous != fingerprint(stage, state['hashes']):
+        return 'inputs or code changed'
+    return None
+
+
+# ==============================================================================
+# RUNNER
+# ==============================================================================
+def output_stamps(stage):
+    """{output: (file, mtime in ns)}, None for outputs that do not exist."""
+    stamps = {}
+    for artifact in stage['outputs']:
+        path = input_path(artifact)
+        stamps[artifact] = (path, os.stat(path).st_mtime_ns) if path is not None else None
+    return stamps
+
+
+def run_stage(name, stage, log_dir=LOG_DIR):
+    """Runs the stage's script in a subprocess, logging its output. Returns (ok, seconds, log path)."""
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f'{name}.log')
+    before = output_stamps(stage)
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run([sys.executable] + stage['command'], stdout=log, stderr=subprocess.STDOUT)
+    seconds = time.perf_counter() - start
+    # Scripts report their own errors and exit 0, and a failed rebuild leaves the previous outputs
+    # in place; the stage only succeeded if it rewrote every one of them
+    after = output_stamps(stage)
+    ok = result.returncode == 0 and all(after[a] is not None and after[a] != before[a] for a in stage['outputs'])
+    if result.returncode == 0 and not ok:
+        stale = [a for a in stage['outputs'] if after[a] is None or after[a] == before[a]]
+        print(f"⚠️ {name} exited without writing {', '.join(stale)}; see '{log_path}'.")
+    return ok, seconds, log_path
+
+
+def run_pipeline(targets=None, jobs=None, force=False, dry_run=False, stages=STAGES, state_file=STATE_FILE):
+    """
+    Builds the targets (default: every stage) and what they depend on. Stages whose outputs
+    are current are skipped; the others start as soon as their upstream stages are done, up
+    to `jobs` at a time. Returns {stage: {'status', 'seconds', 'reason'}}.
+    """
+    deps = dependencies(stages)
+    unknown = [t for t in targets or [] if t not in stages]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown}. Known: {', '.join(stages)}")
+    selected = closure(targets or list(stages), deps)
+    state = load_state(state_file)
+    report = {}
+    done, failed, running = set(), set(), {}
+    rebuilt = set()
+    jobs = max(1, jobs or os.cpu_count() or 1)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while len(done) + len(failed) < len(selected):
+            for name in sorted(selected - done - failed - set(running)):
+                if not deps[name] <= done | failed:
+                    continue
+                if deps[name] & failed:
+                    failed.add(name)
+                    report[name] = {'status': 'blocked', 'seconds': 0.0, 'reason': 'upstream stage failed'}
+                    continue
+                if len(running) >= jobs:
+                    break
+                missing = [a for a in stages[name]['inputs'] if input_path(a) is None and not (dry_run and a in
+                           {o for d in rebuilt for o in stages[d]['outputs']})]
+                if missing:
+                    # A stage whose source is not in this checkout still serves the outputs it has
+                    if all(input_path(a) is not None for a in stages[name]['outputs']):
+                        done.add(name)
+                        report[name] = {'status': 'kept', 'seconds': 0.0,
+                                        'reason': f"input {', '.join(missing)} not found; using existing outputs"}
+                    else:
+                        failed.add(name)
+                        report[name] = {'status': 'failed', 'seconds': 0.0,
+                                        'reason': f"input {', '.join(missing)} not found"}
+                    continue
+                # Upstream stages that were dry-run "rebuilt" would change this stage's inputs too
+                reason = stale_reason(name, stages[name], state, force)
+                if reason is None and dry_run and deps[name] & rebuilt:
+                    reason = 'upstream stage will rebuild'
+                if reason is None or dry_run:
+                    done.add(name)
+                    report[name] = {'status': 'up to date' if reason is None else 'would run',
+                                    'seconds': 0.0, 'reason': reason or ''}
+                    if reason is not None:
+                        rebuilt.add(name)
+                    continue
+                print(f"▶ {name}: {reason}")
+                running[name] = (pool.submit(run_stage, name, stages[name]), reason)
+            if not running:
+                continue
+
+            finished, _ = wait([future for future, _ in running.values()], return_when=FIRST_COMPLETED)
+            for name in [n for n, (future, _) in running.items() if future in finished]:
+                future, reason = running.pop(name)
+                ok, seconds, log_path = future.result()
+                report[name] = {'status': 'built' if ok else 'failed', 'seconds': seconds, 'reason': reason}
+                if ok:
+                    done.add(name)
+                    # Fingerprint after the run: the inputs are the ones the stage just read
+                    state['stages'][name] = {'fingerprint': fingerprint(stages[name], state['hashes']),
+                                             'seconds': round(seconds, 3)}
+                    save_state(state, state_file)
+                    print(f"✅ {name} built in {seconds:.1f}s")
+                else:
+                    failed.add(name)
+                    print(f"❌ {name} failed after {seconds:.1f}s, see '{log_path}'")
+    if not dry_run:
+        save_state(state, state_file)
+    return report
+
+
+def critical_path(report, deps):
+    """Longest chain of stage run times, i.e. the wall time no amount of parallelism removes."""
+    memo = {}
+
+    def longest(name):
+        if name not in memo:
+            upstream = max(((longest(d), d) for d in deps[name] if d in report), default=(0.0, None))
+            memo[name] = (report[name]['seconds'] + upstream[0], upstream[1])
+        return memo[name][0]
+
+    end = max(report, key=longest, default=None)
+    chain = []
+    while end is not None:
+        chain.append(end)
+        end = memo[end][1]
+    return chain[::-1], memo[chain[0]][0] if chain else 0.0
+
+
+def print_report(report, wall_s, deps):
+    print(f"\n--- Pipeline timing ({len(report)} stages) ---")
+    print(f"{'Stage':<16} {'Status':<11} {'Seconds':>8}  Reason")
+    for name, row in sorted(report.items(), key=lambda item: -item[1]['seconds']):
+        print(f"{name:<16} {row['status']:<11} {row['seconds']:>8.2f}  {row['reason']}")
+    stage_s = sum(row['seconds'] for row in report.values())
+    chain, chain_s = critical_path(report, deps)
+    path = f" (critical path {chain_s:.2f}s: {' -> '.join(chain)})" if chain_s > 0 else ''
+    print(f"\nWall time {wall_s:.2f}s for {stage_s:.2f}s of stage time{path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline stages that are out of date, in parallel.")
+    parser.add_argument('targets', nargs='*', help=f"Stages to build with their upstream ({', '.join(STAGES)}).")
+    parser.add_argument('--jobs', type=int, default=None, help="Stages run at once (default: CPU count).")
+    parser.add_argument('--force', action='store_true', help="Rebuild the selected stages even if current.")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would run.")
+    args = parser.parse_args()
+    start_tracing('pipeline')
+
+    try:
+        start = time.perf_counter()
+        with span('pipeline', 'phase'):
+            report = run_pipeline(args.targets, args.jobs, args.force, args.dry_run)
+        print_report(report, time.perf_counter() - start, dependencies())
+        if any(row['status'] in ('failed', 'blocked') for row in report.values()):
+            sys.exit(1)
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -5,6 +5,9 @@ from sklearn.preprocessing import MinMaxScaler
 import os
 from datetime import datetime
 
+from dataset_io import read_dataset, write_dataset
+from instrumentation import start_tracing, traced
+
 # --- Configuration ---
 INPUT_CSV = "dataset/Final_dataset/merged_dataset_1.csv"
 OUTPUT_DIR = "dataset/Final_dataset"
@@ -16,6 +19,7 @@ TOP_N_GENRES = 6
 # ==============================================================================
 # PHASE 1 FUNCTION
 # ==============================================================================
+@traced('phase 1 popularity_score')
 def popularity_score(input_file):
     """
     Phase 1: Loads the data and creates data-driven 'power scores'
@@ -23,7 +27,8 @@ def popularity_score(input_file):
     Returns a DataFrame with these new columns added.
     """
     try:
-        df = pd.read_csv(input_file)
+        # Plain strings: the text columns are filled and rewritten below
+        df = read_dataset(input_file, categories=False)
         print(f"Loaded {len(df)} movies from '{input_file}'.")
 
         os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -109,6 +114,7 @@ def popularity_score(input_file):
 # ==============================================================================
 # PHASE 2 FUNCTION
 # ==============================================================================
+@traced('phase 2 simplify_genre')
 def simplify_genre(df_from_phase1):
     """
     Phase 2: Takes the DataFrame from Phase 1, creates dummy columns
@@ -129,7 +135,7 @@ def simplify_genre(df_from_phase1):
         genre_dummies.columns = genre_dummies.columns.str.strip()
 
         # Fix for duplicate column names (e.g., 'Drama' and ' Drama')
-        genre_dummies = genre_dummies.groupby(level=0, axis=1).sum().clip(upper=1)
+        genre_dummies = genre_dummies.T.groupby(level=0).sum().T.clip(upper=1)
 
         if genre_dummies.empty:
             print("Error: No genres were found to encode.")
@@ -156,6 +162,7 @@ def simplify_genre(df_from_phase1):
 # ==============================================================================
 # PHASE 3 FUNCTION
 # ==============================================================================
+@traced('phase 3 process_time_features')
 def process_time_features(df_from_phase2):
     """
     Phase 3: Processes date columns to extract predictive features.
@@ -199,6 +206,7 @@ def process_time_features(df_from_phase2):
 # ==============================================================================
 # PHASE 4 FUNCTION (New)
 # ==============================================================================
+@traced('phase 4 fix_promotion_days')
 def fix_promotion_days(df_from_phase3):
     """
     Phase 4: Cleans the 'Promotion_Duration_Days' column.
@@ -238,6 +246,7 @@ def fix_promotion_days(df_from_phase3):
 # --- Main Execution Pipeline ---
 # ==============================================================================
 if __name__ == "__main__":
+    start_tracing('popularity_score')
 
     # Run Phase 1
     df_after_phase1 = popularity_score(INPUT_CSV)
@@ -265,8 +274,8 @@ if __name__ == "__main__":
 
     # Final Save
     if df_after_phase4 is not None:
-        df_after_phase4.to_csv(OUTPUT_CSV, index=False)
+        saved = write_dataset(df_after_phase4, OUTPUT_CSV)
         print(f"\n\n✅✅✅ Feature Engineering Pipeline Complete! ✅✅✅")
-        print(f"Final processed file saved to: {OUTPUT_CSV}")
+        print(f"Final processed file saved to: {saved}")
     else:
         print("\n\nPipeline failed. No file was saved.")
\ No newline at end of file
@@ -1,13 +1,17 @@
-import pandas as pd
+import argparse
 
-INPUT_DATA='dataset/Final_dataset/model_training_dataset_FINAL10.csv'
+import pandas as pd
 
-data=pd.read_csv(INPUT_DATA,encoding="latin1")
+from catalog_store import read_catalog
+from dataset_io import read_csv, write_dataset
+from instrumentation import span, start_tracing, traced
+from near_duplicates import deduplicate
 
-print(data.shape)
-print(data.columns)
-print(data.isnull().sum())
-#print(data.isnull().sum())
+INPUT_DATA='dataset/Final_dataset/model_training_dataset_FINAL10.csv'
+# Collected catalog (catalog_store.py, filled by the collectors) -> cleaned rows -> merged with trailer stats
+CATALOG_LANGUAGE = 'Hindi'
+CLEANED_CSV = "dataset/Final_dataset/hindi_movies_5.csv"
+TRAILER_STATS_CSV = "dataset/Final_dataset/movie_trailers_youtube_stats.csv"
 
 CHECK_COL=[
     'Day1_collection_cr',
@@ -34,15 +38,13 @@ def check_movie(data):
             print(f"{check[i]} not exist ")
 
 
+@traced()
 def check_duplicate(data):
-    duplicates_rows = data[data.duplicated()]
-    print(len(duplicates_rows))
-    data = data.drop_duplicates(subset='Title', keep=False)
-    duplicates_rows = data[data.duplicated()]
-    print(f" After dup removed:{len(duplicates_rows)}")
-
-
-    data.to_csv('dataset/tamil_movies_3.csv', index=False)
+    """Merges near-duplicate rows (title variants of one release) into their most complete record."""
+    deduplicated, report = deduplicate(data)
+    print(f"{report['cluster'].nunique()} near-duplicate movies found in {len(report)} rows.")
+    print(f" After dup merged: {len(data)} -> {len(deduplicated)} rows")
+    return deduplicated
 
 def Movies_with_missing_vals(df):
     try:
@@ -67,23 +69,27 @@ def Movies_with_missing_vals(df):
     except Exception as e:
         print(f"Error:{e}")
 
+@traced()
 def Remove_Rows(data):
     print(data.isnull().sum())
     print(data.columns)
     data = data[~data["Day1_collection_cr"].isin(["NA", "NAT"])].dropna(subset=["Day1_collection_cr"])
     print(data.isnull().sum())
-    data.to_csv("dataset/Final_dataset/hindi_movies_5.csv",index=False)
+    data.to_csv(CLEANED_CSV,index=False)
     print("over")
 
+@traced()
 def merge_datasets():
-    data1 = pd.read_csv("dataset/Final_dataset/hindi_movies_5.csv", encoding='latin1')
-    data2 = pd.read_csv("dataset/Final_dataset/movie_trailers_youtube_stats.csv", encoding='latin1')
+    data1 = read_csv(CLEANED_CSV)
+    data2 = read_csv(TRAILER_STATS_CSV)
     merged_df=pd.merge(data1,data2,on="Title",how="inner")
-    merged_df.to_csv("merged_dataset.csv", index=False)
+    return merged_df
 
+@traced()
 def format_date(data):
+    # Writes the 'merged' dataset (merged_dataset_1), the input of popularity_score.py
     data["published_at"]=pd.to_datetime(data["published_at"],errors="coerce").dt.strftime("%Y-%m-%d")
-    data.to_csv("dataset/Final_dataset/merged_dataset_1.csv",index=False)
+    return write_dataset(data, 'merged')
 
 
 #missing(data)
@@ -92,7 +98,30 @@ def format_date(data):
 #Movies_with_missing_vals(data)
 #null_titles_list = data[data['Day1_collection_cr'].isnull()]['Title'].tolist()
 #print(null_titles_list)
-#Remove_Rows(data)
-#merge_datasets()
-#format_date(data)
 
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect, clean and merge the collected catalog.")
+    parser.add_argument('step', nargs='?', choices=['inspect', 'clean', 'merge'], default='inspect',
+                        help="inspect: print shape and nulls; clean: merge near-duplicates and drop rows without "
+                             "Day 1 collection; "
+                             "merge: join trailer stats and write the 'merged' dataset.")
+    parser.add_argument('--input', default=None)
+    args = parser.parse_args()
+    start_tracing('preprocess')
+
+    if args.step == 'merge':
+        print(f"Merged dataset saved to '{format_date(merge_datasets())}'.")
+    else:
+        with span('read_csv', 'io'):
+            if args.step == 'clean' and not args.input:
+                data = read_catalog(language=CATALOG_LANGUAGE)
+            else:
+                data = read_csv(args.input or INPUT_DATA)
+        if args.step == 'clean':
+            # Merge duplicates first: one copy may hold the Day 1 value the other is missing
+            Remove_Rows(check_duplicate(data))
+        else:
+            print(data.shape)
+            print(data.columns)
+            print(data.isnull().sum())
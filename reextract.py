@@ -0,0 +1,52 @@
+import argparse
+import time
+
+import pandas as pd
+
+from add_features import add_details
+from catalog_store import DB_FILE, CatalogStore
+from collection_engine import LANGUAGE_PROFILES, WORKERS_PER_LANGUAGE, run_collection
+from instrumentation import start_tracing
+from page_archive import ARCHIVE_DIR, ArchivedPages, PageArchive
+from page_pipeline import PARSE_PROCESSES
+
+# --- Configuration ---
+# Re-running the extractors over archived pages after a selector fix: no network, so the only
+# limit is CPU. Readers are threads pulling pages from the archive; parsers are processes.
+READERS_PER_LANGUAGE = WORKERS_PER_LANGUAGE
+
+
+# --- Main Script ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run the current extractors over archived pages, offline.")
+    parser.add_argument('--languages', nargs='+', default=list(LANGUAGE_PROFILES), choices=list(LANGUAGE_PROFILES))
+    parser.add_argument('--details', action='store_true', help="Also re-extract cast pages (add_features.py).")
+    parser.add_argument('--readers', type=int, default=READERS_PER_LANGUAGE, help="Archive reader threads per language.")
+    parser.add_argument('--parsers', type=int, default=PARSE_PROCESSES, help="Parse processes.")
+    parser.add_argument('--limit', type=int, default=None, help="At most this many movies per language.")
+    parser.add_argument('--before', default=None, help="Use pages fetched on or before this date (YYYY-MM-DD).")
+    parser.add_argument('--archive', default=ARCHIVE_DIR)
+    parser.add_argument('--db', default=DB_FILE)
+    args = parser.parse_args()
+    start_tracing('reextract')
+
+    try:
+        before = time.mktime(time.strptime(args.before, '%Y-%m-%d')) + 86_400 if args.before else None
+        with PageArchive(args.archive) as archive:
+            print(f"Archive '{args.archive}': {len(archive):,} fetches.")
+            pages = ArchivedPages(archive, before)
+            summary, _, stages = run_collection(args.languages, args.readers, args.limit, args.db,
+                                                parsers=args.parsers, client=pages, refresh=True)
+            print(summary.to_string(index=False))
+            print(stages.to_string(index=False))
+            if args.details:
+                with CatalogStore(args.db) as store:
+                    # The selected languages only, each slugged under its own rules by add_details
+                    movies = pd.concat([store.read(['Title', 'Year', 'Language'], language).head(args.limit)
+                                        for language in args.languages], ignore_index=True)
+                    print(f"{len(movies)} movies to re-extract details for.")
+                    print(add_details(pages, store, movies).to_string(index=False))
+            print(pages.report().to_string(index=False))
+        print(f"\n✅ Re-extraction complete. The catalog '{args.db}' is updated.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -5,6 +5,13 @@ import pandas as pd
 import random
 import time
 
+from catalog_store import CatalogStore
+from http_client import Client
+from instrumentation import span, start_tracing
+
+
+client = Client(headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'})
+
 
 def fetch_movies(year):
     url = 'https://en.wikipedia.org/w/api.php'
@@ -14,11 +21,11 @@ def fetch_movies(year):
         'format': 'json',
         'prop': 'text'
     }
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
-    }
-
-    response = requests.get(url, params=params, headers=headers)
+    try:
+        response = client.get(url, params=params)
+    except requests.exceptions.RequestException as e:
+        print(f"[{year}] Request failed: {e}")
+        return []
 
     if response.status_code != 200:
         print(f"[{year}] Failed to fetch data. Status code: {response.status_code}")
@@ -30,22 +37,22 @@ def fetch_movies(year):
         print(f"[{year}] JSON decode error or missing data: {e}")
         return []
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    tables = soup.find_all('table', {'class': 'wikitable'})
+    with span('parse wikipedia tables', 'parse', year=year):
+        soup = BeautifulSoup(html_content, 'html.parser')
+        tables = soup.find_all('table', {'class': 'wikitable'})
 
 
-    movies = []
-    for table in tables:
-        df = pd.read_html(StringIO(str(table)))[0]
-        if 'Title' in df.columns :
-            for index, row in df.iterrows():
-                title = row['Title']
-                movies.append({'Title': title, 'Year': year, 'Language': 'Hindi'})
+        movies = []
+        for table in tables:
+            df = pd.read_html(StringIO(str(table)))[0]
+            if 'Title' in df.columns :
+                movies.extend({'Title': title, 'Year': year, 'Language': 'Hindi'} for title in df['Title'])
 
     print(f"[{year}] Collected {len(movies)} movies.")
     return movies
 
 
+start_tracing('scrape')
 all_movies = []
 for year in range(2016, 2026):
     if year==2020:
@@ -60,8 +67,8 @@ print(f"\nTotal movies fetched: {len(all_movies)}")
 sample_size = min(600, len(all_movies))
 sampled_movies = random.sample(all_movies, sample_size)
 
-# Save to CSV
-df = pd.DataFrame(sampled_movies)
-df.to_csv('hindi_movies2.csv',mode='a', header=True,index=False)
-print(f"\nSaved {sample_size} movies to 'hindi_movies2.csv'")
-print(df.head())
\ No newline at end of file
+# Upsert into the catalog; a movie already there is matched on its normalized title and year
+with CatalogStore() as store:
+    inserted, updated = store.upsert(sampled_movies)
+    print(f"\nSaved {sample_size} movies to '{store.path}' ({inserted} new, {updated} already known)")
+print(pd.DataFrame(sampled_movies).head())
\ No newline at end of file
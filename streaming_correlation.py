@@ -0,0 +1,230 @@
+import argparse
+import glob
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dataset_io import DATASETS, dataset_path, read_csv
+from instrumentation import count, span, start_tracing
+
+# --- Configuration ---
+INPUT_CSV = "dataset/Final_dataset/movies_all_features_processed_v2.csv"
+OUTPUT_CSV = "dataset/visuals/correlation_matrix.csv"
+TARGET_COLUMN = 'Day1_collection_cr'
+CHUNK_ROWS = 100_000
+VERIFY_TOLERANCE = 1e-9
+
+
+# ==============================================================================
+# PAIRWISE CO-MOMENTS
+# ==============================================================================
+class CoMoments:
+    """
+    Running pairwise statistics of a set of numeric columns, with pandas' pairwise-complete
+    semantics: entry [i, j] only uses rows where both column i and column j are present.
+        n[i, j]     rows where both are present
+        mean[i, j]  mean of column i over those rows
+        m2[i, j]    sum of squared deviations of column i over those rows
+        cxy[i, j]   sum of co-deviations of columns i and j over those rows
+    Chunks are summarised with a per-column shift (for precision) and combined with the
+    parallel update of Chan et al., so partial results from any split of the rows merge
+    to the same answer.
+    """
+
+    def __init__(self, columns, n, mean, m2, cxy):
+        self.columns = list(columns)
+        self.n, self.mean, self.m2, self.cxy = n, mean, m2, cxy
+
+    @classmethod
+    def empty(cls, columns):
+        p = len(columns)
+        return cls(columns, *(np.zeros((p, p)) for _ in range(4)))
+
+    @classmethod
+    def from_array(cls, X, columns):
+        """Statistics of one chunk, shape (rows, columns); NaN marks a missing value."""
+        X = np.asarray(X, dtype=np.float64)
+        present = ~np.isnan(X)
+        mask = present.astype(np.float64)
+        n = mask.T @ mask
+        # Shifting each column by its own chunk mean keeps the sums small, so the
+        # sum-of-products formulas below do not cancel catastrophically
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shift = np.nansum(X, axis=0) / present.sum(axis=0)
+        shift = np.where(np.isfinite(shift), shift, 0.0)
+        Xs = np.where(present, X - shift, 0.0)
+        sx = Xs.T @ mask                  # sum of column i over rows where j is present
+        sxx = (Xs * Xs).T @ mask
+        sxy = Xs.T @ Xs
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_s = np.where(n > 0, sx / n, 0.0)
+        m2 = sxx - sx * mean_s
+        cxy = sxy - sx * mean_s.T
+        return cls(columns, n, mean_s + shift[:, None], m2, cxy)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        columns = list(columns if columns is not None else df.columns)
+        return cls.from_array(df[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64), columns)
+
+    def merge(self, other):
+        """Combined statistics of two disjoint sets of rows (Chan's parallel update)."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge co-moments over different columns.")
+        n = self.n + other.n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, other.n / n, 0.0)
+        delta = other.mean - self.mean
+        shared = self.n * weight        # n_a * n_b / n
+        mean = self.mean + delta * weight
+        m2 = self.m2 + other.m2 + delta * delta * shared
+        cxy = self.cxy + other.cxy + delta * delta.T * shared
+        return CoMoments(self.columns, n, mean, m2, cxy)
+
+    def correlation(self):
+        """Pearson correlation matrix, NaN where a pair has fewer than 2 rows or no variance."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            divisor = np.sqrt(self.m2 * self.m2.T)
+            corr = np.where(divisor > 0, self.cxy / divisor, np.nan)
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=self.columns, columns=self.columns)
+
+    def covariance(self):
+        """Sample covariance matrix (ddof=1), pairwise complete."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(self.n > 1, self.cxy / (self.n - 1), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def target_correlation(self, target=TARGET_COLUMN):
+        """Correlation of every other column with `target`, strongest positive first."""
+        return self.correlation()[target].drop(target).sort_values(ascending=False)
+
+
+# ==============================================================================
+# STREAMING
+# ==============================================================================
+def numeric_columns(path):
+    """Numeric columns of a CSV, parquet file or directory of parquet parts, from a small sample."""
+    files = _parquet_files(path)
+    if files:
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(files[0])
+        return [f.name for f in schema if str(f.type).startswith(('int', 'uint', 'float', 'double', 'bool'))]
+    sample = read_csv(path, nrows=1000)
+    return list(sample.select_dtypes(include=['number', 'bool']).columns)
+
+
+def _parquet_files(path):
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True))
+    return [path] if path.lower().endswith(('.parquet', '.pq')) else []
+
+
+def _read_chunks(path, columns, chunk_rows):
+    files = _parquet_files(path)
+    if files:
+        import pyarrow.parquet as pq
+        for file in files:
+            for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+    else:
+        yield from read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+
+def _chunk_moments(chunk, columns):
+    with span('co-moments chunk', 'phase', rows=len(chunk)):
+        return CoMoments.from_frame(chunk, columns)
+
+
+def _file_moments(file, columns, chunk_rows):
+    total = CoMoments.empty(columns)
+    for chunk in _read_chunks(file, columns, chunk_rows):
+        total = total.merge(CoMoments.from_frame(chunk, columns))
+    return total
+
+
+def stream_moments(path, columns=None, chunk_rows=CHUNK_ROWS, workers=1):
+    """
+    Co-moments of `columns` (default: every numeric column) over a CSV, parquet file or
+    directory of parquet parts, holding one chunk per worker in memory. With workers > 1,
+    parquet parts are summarised one file per task; CSV chunks are fanned out with a
+    bounded number in flight. Partial results are merged in the parent.
+    """
+    columns = list(columns or numeric_columns(path))
+    total = CoMoments.empty(columns)
+    files = _parquet_files(path)
+    if workers <= 1:
+        for chunk in _read_chunks(path, columns, chunk_rows):
+            total = total.merge(_chunk_moments(chunk, columns))
+            count('rows', len(chunk))
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if len(files) > 1:
+            for part in pool.map(_file_moments, files, [columns] * len(files), [chunk_rows] * len(files)):
+                total = total.merge(part)
+            return total
+        pending = deque()
+        for chunk in _read_chunks(path, columns, chunk_rows):
+            pending.append(pool.submit(_chunk_moments, chunk, columns))
+            count('rows', len(chunk))
+            if len(pending) >= 2 * workers:
+                total = total.merge(pending.popleft().result())
+        while pending:
+            total = total.merge(pending.popleft().result())
+    return total
+
+
+def max_difference(ours, reference):
+    """Largest absolute difference between two correlation matrices; NaN positions must agree."""
+    a, b = ours.to_numpy(), reference.loc[ours.index, ours.columns].to_numpy()
+    if not np.array_equal(np.isnan(a), np.isnan(b)):
+        return np.inf
+    return float(np.nanmax(np.abs(a - b), initial=0.0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked, mergeable pairwise correlation over large tables.")
+    parser.add_argument('input', nargs='?', default=INPUT_CSV,
+                        help="Dataset name, CSV, parquet file or directory of parquet parts.")
+    parser.add_argument('--output', default=OUTPUT_CSV, help="Where to write the correlation matrix.")
+    parser.add_argument('--target', default=TARGET_COLUMN)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--verify', action='store_true', help="Compare against pandas .corr() (loads the data).")
+    args = parser.parse_args()
+    start_tracing('streaming_correlation')
+
+    try:
+        # Pipeline datasets are read from their typed columnar copy when it is current
+        source = dataset_path(args.input) if args.input in DATASETS or args.input in DATASETS.values() else args.input
+        start = time.perf_counter()
+        moments = stream_moments(source, chunk_rows=args.chunk_rows, workers=args.workers)
+        corr = moments.correlation()
+        seconds = time.perf_counter() - start
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        corr.to_csv(args.output)
+        rows = int(np.diag(moments.n).max()) if len(corr) else 0
+        print(f"✅ {len(corr)}x{len(corr)} correlation matrix over {rows:,} rows of '{source}' in "
+              f"{seconds:.2f}s -> '{args.output}'.")
+        if args.target in corr.columns:
+            print(f"\n--- Correlation with {args.target} ---")
+            print(moments.target_correlation(args.target).to_string())
+        else:
+            print(f"⚠️ Target column '{args.target}' is not numeric or not present.")
+
+        if args.verify:
+            files = _parquet_files(source)
+            frame = (pd.concat([pd.read_parquet(f, columns=moments.columns) for f in files]) if files
+                     else read_csv(source, usecols=moments.columns))
+            start = time.perf_counter()
+            reference = frame[moments.columns].corr()
+            diff = max_difference(corr, reference)
+            status = '✅' if diff <= VERIFY_TOLERANCE else '❌'
+            print(f"\n{status} Max difference from pandas .corr(): {diff:.2e} "
+                  f"(pandas took {time.perf_counter() - start:.2f}s on the loaded frame)")
+    except Exception as e:
+        print(f"An error occurred: {e}")
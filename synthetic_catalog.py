@@ -0,0 +1,157 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import start_tracing
+
+# --- Configuration ---
+# Distribution parameters fitted on dataset/hindi_movies_features_Completed2.csv and
+# dataset/hindi_sentiment.csv, so synthetic catalogs stress the pipeline like real ones.
+DEFAULT_SEED = 42
+DAY1_LOG_MEAN, DAY1_LOG_STD = 0.0, 2.57          # Day 1 (Cr) is log-normal: median ~1.2, long tail
+DAY1_MAX = 200.0                                 # the record opening is ~150 Cr
+RUNTIME_MEAN, RUNTIME_STD = 128, 20
+YEARS = np.arange(2016, 2026)
+YEAR_WEIGHTS = np.array([11, 15, 9.5, 11, 2, 5, 11, 10, 13, 12.5])
+DAY_OF_WEEK_WEIGHTS = np.array([0.3, 1, 2.5, 5.5, 89.5, 0.6, 0.6])   # Monday..Sunday, mostly Fridays
+GENRES = ['Drama', 'Comedy', 'Action', 'Thriller', 'Romance', 'Crime', 'Social', 'Biographical',
+          'Horror', 'Family', 'Musical', 'Sports', 'Historical', 'War', 'Mystery', 'Fantasy',
+          'Adventure', 'Mythological', 'Patriotic', 'Period', 'Suspense', 'Political', 'Sci-Fi',
+          'Animation', 'Dance', 'Documentary', 'Spy', 'Satire', 'Erotic']
+GENRE_WEIGHTS = 1.0 / np.arange(1, len(GENRES) + 1) ** 1.1
+SENTIMENT_MISSING_RATE = 0.35
+ZIPF_EXPONENT = 1.2   # skew of director / production company popularity
+
+
+def _zipf_choice(rng, pool_size, size):
+    weights = 1.0 / np.arange(1, pool_size + 1) ** ZIPF_EXPONENT
+    return rng.choice(pool_size, size=size, p=weights / weights.sum())
+
+
+def _join_names(rng, names, weights, n_rows, max_per_row, mean_per_row):
+    """Comma-separated multi-valued text column, e.g. 'Zee Studios, Dharma Productions'."""
+    counts = np.clip(rng.poisson(mean_per_row - 1, n_rows) + 1, 1, max_per_row)
+    picks = rng.choice(len(names), size=(n_rows, max_per_row), p=weights / weights.sum())
+    names = np.asarray(names, dtype=object)
+    joined = pd.Series(names[picks[:, 0]])
+    for k in range(1, max_per_row):
+        extra = pd.Series(names[picks[:, k]])
+        joined = joined.where(counts <= k, joined + ', ' + extra)
+    return joined
+
+
+def generate_catalog(n_rows, seed=DEFAULT_SEED):
+    """
+    Synthetic merged catalog with the schema of merged_dataset_1.csv (the input of
+    popularity_score.py): metadata, Day 1 collection and YouTube trailer statistics.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Pools grow sub-linearly with the catalog, as a real industry's would
+    n_directors = max(20, int(n_rows ** 0.85))
+    n_companies = max(20, int(n_rows ** 0.8))
+    director_names = np.array([f'Director {i}' for i in range(n_directors)], dtype=object)
+    company_names = np.array([f'Studio {i}' for i in range(n_companies)], dtype=object)
+
+    director_idx = _zipf_choice(rng, n_directors, n_rows)
+    directors = pd.Series(director_names[director_idx])
+    co_directed = rng.random(n_rows) < 0.03
+    directors[co_directed] = directors[co_directed] + ', ' + director_names[
+        _zipf_choice(rng, n_directors, int(co_directed.sum()))]
+
+    company_weights = 1.0 / np.arange(1, n_companies + 1) ** ZIPF_EXPONENT
+    companies = _join_names(rng, company_names, company_weights, n_rows, max_per_row=4, mean_per_row=1.96)
+    genres = _join_names(rng, GENRES, GENRE_WEIGHTS, n_rows, max_per_row=3, mean_per_row=1.9)
+
+    # Release dates: weighted year, uniform week, mostly Friday releases
+    years = rng.choice(YEARS, size=n_rows, p=YEAR_WEIGHTS / YEAR_WEIGHTS.sum())
+    year_start = pd.to_datetime(years.astype(str), format='%Y')
+    week = rng.integers(0, 52, n_rows)
+    target_dow = rng.choice(7, size=n_rows, p=DAY_OF_WEEK_WEIGHTS / DAY_OF_WEEK_WEIGHTS.sum())
+    release = year_start + pd.to_timedelta(week * 7, unit='D')
+    release = release + pd.to_timedelta((target_dow - release.dayofweek) % 7, unit='D')
+
+    # Trailer goes up ~3 weeks before release; some are uploaded after, a few years early
+    promo_days = np.round(rng.gamma(1.2, 22, n_rows)).astype(int)
+    promo_days[rng.random(n_rows) < 0.2] *= -1
+    promo_days[rng.random(n_rows) < 0.01] += 1500
+    published = release - pd.to_timedelta(promo_days, unit='D')
+
+    # Popular directors / studios open bigger: skewed Day 1 with a quality effect
+    quality = 1.5 * np.exp(-director_idx / max(1, n_directors / 50)) + rng.normal(0, 1, n_rows)
+    day1 = np.exp(rng.normal(DAY1_LOG_MEAN, DAY1_LOG_STD, n_rows) + 0.3 * quality)
+    day1 = np.round(np.clip(day1, 0.0005, DAY1_MAX), 4)
+    views = np.round(np.clip(np.exp(rng.normal(16.2, 3.0, n_rows) + 0.8 * quality), 10, 6e8))
+    likes = np.round(views * np.exp(rng.normal(-4.6, 0.8, n_rows)))
+    comments = np.round(likes * np.exp(rng.normal(-3.2, 0.8, n_rows)))
+    avg_sent = np.clip(rng.normal(0.45, 0.16, n_rows), -1, 1).round(4)
+    median_sent = np.clip(avg_sent + rng.normal(0.12, 0.12, n_rows), -1, 1).round(4)
+    no_sentiment = rng.random(n_rows) < SENTIMENT_MISSING_RATE
+    avg_sent[no_sentiment] = np.nan
+    median_sent[no_sentiment] = np.nan
+
+    return pd.DataFrame({
+        'Title': [f'Movie {i}' for i in range(n_rows)],
+        'Year': years,
+        'Language': 'Hindi',
+        'Day1_collection_cr': day1,
+        'Production Company': companies,
+        'Release Date': release.strftime('%d-%m-%Y'),
+        'Genre': genres,
+        'Director': directors,
+        'Runtime (min)': np.clip(rng.normal(RUNTIME_MEAN, RUNTIME_STD, n_rows), 60, 240).round(),
+        'published_at': published.strftime('%Y-%m-%d'),
+        'viewCount': views,
+        'likeCount': likes,
+        'commentCount': comments,
+        'avg_sentiment': avg_sent,
+        'median_sentiment': median_sent,
+    })
+
+
+def generate_model_table(n_rows, seed=DEFAULT_SEED):
+    """
+    Synthetic model-ready table with the columns of model_training_dataset_FINAL10.csv
+    (target first), sentiment still missing where the trailer had no comments.
+    """
+    rng = np.random.default_rng(seed + 1)
+    catalog = generate_catalog(n_rows, seed)
+    release = pd.to_datetime(catalog['Release Date'], format='%d-%m-%Y')
+    promo = (release - pd.to_datetime(catalog['published_at'], format='%Y-%m-%d')).dt.days.clip(lower=0)
+    log_day1 = np.log1p(catalog['Day1_collection_cr'])
+
+    table = pd.DataFrame({
+        'Day1_collection_cr': catalog['Day1_collection_cr'],
+        'Production_House_Score': np.clip(20 + 12 * log_day1 + rng.normal(0, 12, n_rows), 0, 100),
+        'Director_Score': np.clip(10 + 10 * log_day1 + rng.normal(0, 15, n_rows), 0, 100),
+        'Actor_Score': np.clip(8 + 6 * log_day1 + rng.normal(0, 8, n_rows), 0, 100),
+        'Runtime (min)': catalog['Runtime (min)'],
+        'Release_Year': release.dt.year.astype(float),
+        'Release_Month': release.dt.month.astype(float),
+        'Release_Day_of_Week': release.dt.dayofweek.astype(float),
+        'Promotion_Duration_Days': promo.astype(float),
+    })
+    genre_flags = catalog['Genre'].str.get_dummies(sep=', ')
+    for genre in ['Drama', 'Comedy', 'Action', 'Thriller', 'Romance', 'Crime']:
+        table[f'Genre_{genre}'] = genre_flags.get(genre, 0).astype(float)
+    other = [g for g in genre_flags.columns if g not in {'Drama', 'Comedy', 'Action', 'Thriller', 'Romance', 'Crime'}]
+    table['Genre_Other'] = genre_flags[other].max(axis=1).astype(float) if other else 0.0
+    for col in ['avg_sentiment', 'median_sentiment', 'viewCount', 'likeCount', 'commentCount']:
+        table[col] = catalog[col]
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic movie catalog.")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--model-table', action='store_true',
+                        help="Write the model-ready feature table instead of the raw catalog.")
+    args = parser.parse_args()
+    start_tracing('synthetic_catalog')
+
+    df = generate_model_table(args.rows, args.seed) if args.model_table else generate_catalog(args.rows, args.seed)
+    df.to_csv(args.output, index=False)
+    print(f"✅ Saved {len(df)} synthetic rows to '{args.output}'.")
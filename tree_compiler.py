@@ -0,0 +1,376 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from instrumentation import start_tracing
+
+# --- Configuration ---
+PREDICT_CHUNK_ROWS = 1024
+PREDICT_THREADS = os.cpu_count() or 1
+BENCHMARK_SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+TOLERANCE = 1e-5
+
+# How a node routes a missing value
+MISSING_DEFAULT = 0       # NaN follows default_left (XGBoost, LightGBM 'NaN', scikit-learn)
+MISSING_AS_ZERO = 1       # NaN is compared as 0.0 (LightGBM missing_type 'None')
+MISSING_ZERO_DEFAULT = 2  # NaN and 0.0 follow default_left (LightGBM missing_type 'Zero')
+LIGHTGBM_ZERO_THRESHOLD = 1e-35
+
+ARRAY_NAMES = ['roots', 'tree_class', 'left', 'right', 'feature', 'threshold',
+               'default_left', 'missing', 'value']
+
+
+# ==============================================================================
+# COMPILED ENSEMBLE
+# ==============================================================================
+class CompiledEnsemble:
+    """
+    A tree ensemble flattened into node arrays (feature, threshold, children, leaf value).
+    Leaves point to themselves, so every row can be pushed through every tree for
+    exactly `max_depth` vectorized steps.
+
+    kind='forest'  -> leaf values are class distributions, averaged over trees (RandomForest)
+    kind='softmax' -> leaf values are margins, summed per class plus base margin, then softmax
+    """
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        self.strict = meta['strict']
+        self.max_depth = meta['max_depth']
+        self.n_classes = meta['n_classes']
+        self.input_dtype = np.dtype(meta['input_dtype'])
+        self.base_margin = np.asarray(meta.get('base_margin', np.zeros(self.n_classes)), dtype=np.float64)
+        self._zero_default = bool(meta.get('has_zero_default', False))
+        if arrays['value'].shape[1] == 1:
+            self._class_trees = [np.flatnonzero(arrays['tree_class'] == c) for c in range(self.n_classes)]
+        # Traversal layout: int32 node ids, children interleaved as [right, left] so the next
+        # node is children[2 * node + go_left], thresholds pre-rounded to the input dtype
+        self._roots = np.asarray(arrays['roots'], dtype=np.int32)
+        self._feature = np.asarray(arrays['feature'], dtype=np.int32)
+        self._children = np.empty(2 * len(arrays['left']), dtype=np.int32)
+        self._children[0::2] = arrays['right']
+        self._children[1::2] = arrays['left']
+        self._threshold = _thresholds_for_input(np.asarray(arrays['threshold']), self.input_dtype, self.strict)
+
+    @property
+    def n_trees(self):
+        return len(self.arrays['roots'])
+
+    def leaf_indices(self, X):
+        """Global leaf index reached by every row in every tree, shape (n_rows, n_trees)."""
+        a = self.arrays
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        flat = X.ravel()
+        offsets = (np.arange(len(X), dtype=np.int64) * X.shape[1])[:, None]
+        node = np.broadcast_to(self._roots, (len(X), self.n_trees)).copy()
+        check_missing = self._zero_default or np.isnan(X).any()
+        for _ in range(self.max_depth):
+            x = flat.take(offsets + self._feature.take(node))
+            threshold = self._threshold.take(node)
+            go_left = x < threshold if self.strict else x <= threshold
+            if check_missing:
+                missing_code = a['missing'][node]
+                is_nan = np.isnan(x)
+                as_zero = is_nan & (missing_code == MISSING_AS_ZERO)
+                if as_zero.any():
+                    zero_left = 0.0 < threshold if self.strict else 0.0 <= threshold
+                    go_left = np.where(as_zero, zero_left, go_left)
+                use_default = is_nan & (missing_code != MISSING_AS_ZERO)
+                if self._zero_default:
+                    use_default |= (missing_code == MISSING_ZERO_DEFAULT) & (np.abs(x) <= LIGHTGBM_ZERO_THRESHOLD)
+                go_left = np.where(use_default, a['default_left'][node], go_left)
+            node = self._children.take(2 * node + go_left)
+        return node
+
+    def raw_output(self, X):
+        """Averaged class distributions (forest) or per-class margins (softmax), shape (n_rows, n_classes)."""
+        X = np.asarray(X)
+        out = np.empty((len(X), self.n_classes), dtype=np.float64)
+        starts = range(0, len(X), PREDICT_CHUNK_ROWS)
+        if len(starts) > 1 and PREDICT_THREADS > 1:
+            # numpy releases the GIL inside take/compare, so chunks scale across threads
+            with ThreadPoolExecutor(max_workers=PREDICT_THREADS) as pool:
+                list(pool.map(lambda start: self._raw_chunk(X, out, start), starts))
+        else:
+            for start in starts:
+                self._raw_chunk(X, out, start)
+        if self.meta['kind'] == 'softmax':
+            out += self.base_margin
+        return out
+
+    def _raw_chunk(self, X, out, start):
+        value = self.arrays['value']
+        leaves = self.leaf_indices(X[start:start + PREDICT_CHUNK_ROWS])
+        if value.shape[1] == 1:
+            leaf_values = value[leaves, 0]
+            for c, trees in enumerate(self._class_trees):
+                out[start:start + len(leaves), c] = leaf_values[:, trees].sum(axis=1)
+        else:
+            out[start:start + len(leaves)] = value[leaves].mean(axis=1)
+
+    def predict_proba(self, X):
+        raw = self.raw_output(X)
+        if self.meta['kind'] == 'softmax':
+            raw = np.exp(raw - raw.max(axis=1, keepdims=True))
+            raw /= raw.sum(axis=1, keepdims=True)
+        return raw
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), self.arrays[name])
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ARRAY_NAMES}
+        return cls(arrays, meta)
+
+
+def _thresholds_for_input(threshold, dtype, strict):
+    """
+    Rounds float64 thresholds to the input dtype without changing any comparison result,
+    so float32 inputs are compared in float32 (half the memory traffic per step).
+    """
+    if dtype != np.float32:
+        return threshold.astype(dtype)
+    rounded = threshold.astype(np.float32)
+    if strict:  # x < t  <=>  x < smallest float32 >= t
+        return np.where(rounded < threshold, np.nextafter(rounded, np.float32(np.inf)), rounded)
+    # x <= t  <=>  x <= largest float32 <= t
+    return np.where(rounded > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+
+class _EnsembleBuilder:
+    """Collects nodes tree by tree into global arrays."""
+
+    def __init__(self, n_outputs):
+        self.n_outputs = n_outputs
+        self.nodes = {name: [] for name in ['left', 'right', 'feature', 'threshold',
+                                            'default_left', 'missing']}
+        self.values = []
+        self.roots, self.tree_class = [], []
+        self.count = 0
+        self.max_depth = 0
+
+    def add_tree(self, left, right, feature, threshold, default_left, missing, value, tree_class=0):
+        """Adds one tree given local arrays; a local child index of -1 marks a leaf."""
+        left, right = np.asarray(left, dtype=np.int64), np.asarray(right, dtype=np.int64)
+        n = len(left)
+        local = np.arange(n)
+        is_leaf = left == -1
+        self.roots.append(self.count)
+        self.tree_class.append(tree_class)
+        self.nodes['left'].append(np.where(is_leaf, local, left) + self.count)
+        self.nodes['right'].append(np.where(is_leaf, local, right) + self.count)
+        self.nodes['feature'].append(np.where(is_leaf, 0, feature))
+        self.nodes['threshold'].append(np.where(is_leaf, 0.0, threshold))
+        self.nodes['default_left'].append(np.asarray(default_left, dtype=bool))
+        self.nodes['missing'].append(np.asarray(missing, dtype=np.int8))
+        self.values.append(np.asarray(value, dtype=np.float64).reshape(n, self.n_outputs))
+        self.max_depth = max(self.max_depth, _tree_depth(left, right))
+        self.count += n
+
+    def build(self, meta):
+        arrays = {
+            'roots': np.asarray(self.roots, dtype=np.int64),
+            'tree_class': np.asarray(self.tree_class, dtype=np.int32),
+            'left': np.concatenate(self.nodes['left']).astype(np.int64),
+            'right': np.concatenate(self.nodes['right']).astype(np.int64),
+            'feature': np.concatenate(self.nodes['feature']).astype(np.int32),
+            'threshold': np.concatenate(self.nodes['threshold']).astype(np.float64),
+            'default_left': np.concatenate(self.nodes['default_left']),
+            'missing': np.concatenate(self.nodes['missing']),
+            'value': np.concatenate(self.values),
+        }
+        meta = {**meta, 'max_depth': int(self.max_depth),
+                'has_zero_default': bool((arrays['missing'] == MISSING_ZERO_DEFAULT).any())}
+        return CompiledEnsemble(arrays, meta)
+
+
+def _tree_depth(left, right):
+    depth = np.zeros(len(left), dtype=np.int64)
+    for i in range(len(left)):  # children always come after their parent in all three formats
+        if left[i] != -1:
+            depth[left[i]] = depth[right[i]] = depth[i] + 1
+    return int(depth.max())
+
+
+# ==============================================================================
+# COMPILERS
+# ==============================================================================
+def compile_sklearn_forest(rf_model):
+    """RandomForestClassifier: x <= threshold goes left, leaves hold class distributions."""
+    n_classes = len(rf_model.classes_)
+    builder = _EnsembleBuilder(n_classes)
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :]
+        missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8))
+        builder.add_tree(tree.children_left, tree.children_right, tree.feature, tree.threshold,
+                         missing_left, np.full(tree.node_count, MISSING_DEFAULT),
+                         value / value.sum(axis=1, keepdims=True))
+    return builder.build({'source': 'sklearn', 'kind': 'forest', 'strict': False,
+                          'n_classes': n_classes, 'n_features': int(rf_model.n_features_in_),
+                          'input_dtype': 'float32'})
+
+
+def _parse_xgb_vector(text):
+    return [float(v) for v in text.strip('[]').split(',') if v]
+
+
+def compile_xgboost(booster):
+    """XGBoost multi:softprob booster: x < threshold goes left, NaN follows default_left."""
+    model = json.loads(booster.save_raw('json'))['learner']
+    if model['objective']['name'] not in ('multi:softprob', 'multi:softmax'):
+        raise ValueError(f"Unsupported XGBoost objective '{model['objective']['name']}'.")
+    n_classes = int(model['learner_model_param']['num_class'])
+    base_margin = _parse_xgb_vector(model['learner_model_param']['base_score'])
+    if len(base_margin) == 1:
+        base_margin = base_margin * n_classes
+
+    trees = model['gradient_booster']['model']
+    builder = _EnsembleBuilder(1)
+    for tree, tree_class in zip(trees['trees'], trees['tree_info']):
+        if any(tree['split_type']):
+            raise ValueError("Categorical XGBoost splits are not supported.")
+        left = np.asarray(tree['left_children'])
+        # JSON holds the shortest repr of float32 values; round-trip so comparisons match XGBoost's
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        builder.add_tree(left, tree['right_children'], tree['split_indices'], conditions,
+                         tree['default_left'], np.full(len(left), MISSING_DEFAULT),
+                         np.where(left == -1, conditions, 0.0), tree_class)
+    return builder.build({'source': 'xgboost', 'kind': 'softmax', 'strict': True,
+                          'n_classes': n_classes, 'base_margin': base_margin,
+                          'n_features': int(model['learner_model_param']['num_feature']),
+                          'input_dtype': 'float32'})
+
+
+_LGBM_MISSING = {'None': MISSING_AS_ZERO, 'NaN': MISSING_DEFAULT, 'Zero': MISSING_ZERO_DEFAULT}
+
+
+def compile_lightgbm(booster):
+    """LightGBM multiclass booster: x <= threshold goes left, missing handling per node."""
+    model = booster.dump_model()
+    if not model['objective'].startswith('multiclass'):
+        raise ValueError(f"Unsupported LightGBM objective '{model['objective']}'.")
+    n_classes = model['num_class']
+    builder = _EnsembleBuilder(1)
+    for i, info in enumerate(model['tree_info']):
+        nodes = []
+        stack = [(info['tree_structure'], -1, False)]
+        while stack:  # pre-order, so children follow their parent
+            node, parent, is_left = stack.pop()
+            index = len(nodes)
+            nodes.append(node)
+            node['_left'] = node['_right'] = -1
+            if parent >= 0:
+                nodes[parent]['_left' if is_left else '_right'] = index
+            if 'leaf_value' not in node:
+                if node['decision_type'] != '<=':
+                    raise ValueError("Categorical LightGBM splits are not supported.")
+                stack.append((node['right_child'], index, False))
+                stack.append((node['left_child'], index, True))
+        builder.add_tree([n['_left'] for n in nodes], [n['_right'] for n in nodes],
+                         [n.get('split_feature', 0) for n in nodes], [n.get('threshold', 0.0) for n in nodes],
+                         [n.get('default_left', False) for n in nodes],
+                         [_LGBM_MISSING[n.get('missing_type', 'None')] for n in nodes],
+                         [n.get('leaf_value', 0.0) for n in nodes], i % n_classes)
+    return builder.build({'source': 'lightgbm', 'kind': 'softmax', 'strict': False,
+                          'n_classes': n_classes, 'base_margin': [0.0] * n_classes,
+                          'n_features': model['max_feature_idx'] + 1, 'input_dtype': 'float64'})
+
+
+def compile_model(model):
+    """Compiles a fitted RF / XGBoost / LightGBM model (scikit-learn wrapper, booster or bundle wrapper)."""
+    if isinstance(model, CompiledEnsemble):
+        return model
+    if hasattr(model, 'estimators_'):
+        return compile_sklearn_forest(model)
+    booster = getattr(model, 'booster', None) or model
+    if hasattr(booster, 'get_booster'):
+        booster = booster.get_booster()
+    elif hasattr(booster, 'booster_'):
+        booster = booster.booster_
+    module = type(booster).__module__
+    if module.startswith('xgboost'):
+        return compile_xgboost(booster)
+    if module.startswith('lightgbm'):
+        return compile_lightgbm(booster)
+    raise TypeError(f"Cannot compile model of type {type(model).__name__}.")
+
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+def _time_call(fn, X, min_seconds=0.2):
+    """Best-of-N wall time for fn(X), repeating small batches until min_seconds is spent."""
+    best, spent = float('inf'), 0.0
+    while spent < min_seconds or best == float('inf'):
+        start = time.perf_counter()
+        fn(X)
+        elapsed = time.perf_counter() - start
+        best, spent = min(best, elapsed), spent + elapsed
+        if elapsed > min_seconds:
+            break
+    return best
+
+
+def benchmark(max_rows=max(BENCHMARK_SIZES)):
+    """Checks compiled vs library probabilities and times both over growing batch sizes."""
+    import joblib
+    import pandas as pd
+    from dataset_io import read_dataset
+    from model_training import INPUT_CSV, MODEL_DIR, model_path
+
+    features = joblib.load(os.path.join(MODEL_DIR, 'feature_names.pkl'))
+    reference = read_dataset(INPUT_CSV, columns=features)[features]
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for name in ['Random Forest', 'XGBoost', 'LightGBM']:
+        model = joblib.load(model_path(name))
+        compiled = compile_model(model)
+        diff = np.abs(compiled.predict_proba(reference.to_numpy()) - model.predict_proba(reference)).max()
+        status = 'OK' if diff <= TOLERANCE else 'MISMATCH'
+        print(f"\n{name}: {compiled.n_trees} trees, depth {compiled.max_depth}, "
+              f"max |Δp| = {diff:.2e} [{status}]")
+
+        for size in [s for s in BENCHMARK_SIZES if s <= max_rows]:
+            batch = reference.iloc[rng.integers(0, len(reference), size)].reset_index(drop=True)
+            batch_np = batch.to_numpy(dtype=np.float32)
+            lib_s = _time_call(model.predict_proba, batch)
+            compiled_s = _time_call(compiled.predict_proba, batch_np)
+            rows.append({'Model': name, 'Rows': size,
+                         'Library rows/s': size / lib_s, 'Compiled rows/s': size / compiled_s,
+                         'Speedup': lib_s / compiled_s})
+            print(f"  {size:>9,} rows | library {size / lib_s:14,.0f} rows/s | "
+                  f"compiled {size / compiled_s:14,.0f} rows/s | x{lib_s / compiled_s:6.2f}")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify and benchmark the compiled tree ensembles.")
+    parser.add_argument('--max-rows', type=int, default=max(BENCHMARK_SIZES))
+    parser.add_argument('--output', default="dataset/visuals/tree_compiler_benchmark.csv")
+    args = parser.parse_args()
+    start_tracing('tree_compiler')
+
+    try:
+        results = benchmark(args.max_rows)
+        results.to_csv(args.output, index=False)
+        print(f"\n✅ Benchmark complete. Results saved to '{args.output}'.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,83 @@
+import argparse
+import time
+
+import numpy as np
+
+from instrumentation import start_tracing
+
+# --- Configuration ---
+# Features the what-if panel can sweep: (low, high, integer-valued), matching the sidebar ranges
+SWEEP_RANGES = {
+    'Promotion_Duration_Days': (0, 365, True),
+    'viewCount': (0, 50_000_000, True),
+    'likeCount': (0, 1_000_000, True),
+    'commentCount': (0, 50_000, True),
+    'Release_Month': (1, 12, True),
+    'Release_Day_of_Week': (0, 6, True),
+    'Production_House_Score': (0, 100, False),
+    'Director_Score': (0, 100, False),
+    'Runtime (min)': (60, 240, True),
+    'avg_sentiment': (-1.0, 1.0, False),
+    'median_sentiment': (-1.0, 1.0, False),
+}
+MAX_GRID_ROWS = 250_000
+
+
+def sweep_values(name, points):
+    """Evenly spaced values over the feature's range; integer features are deduplicated."""
+    low, high, integer = SWEEP_RANGES[name]
+    values = np.linspace(low, high, points)
+    return np.unique(np.round(values)) if integer else values
+
+
+def build_grid(base, feature_index, sweeps):
+    """
+    Copies of the base row (shape (1, n_features)) for every combination of the swept
+    values, first sweep varying slowest. `sweeps` is a list of (feature, values).
+    """
+    mesh = np.meshgrid(*[values for _, values in sweeps], indexing='ij')
+    if mesh[0].size > MAX_GRID_ROWS:
+        raise ValueError(f"Grid of {mesh[0].size} rows exceeds the limit of {MAX_GRID_ROWS}.")
+    X = np.repeat(np.asarray(base, dtype=np.float32).reshape(1, -1), mesh[0].size, axis=0)
+    for (name, _), values in zip(sweeps, mesh):
+        X[:, feature_index[name]] = values.ravel()
+    return X
+
+
+def response_surface(bundle, base, feature_index, swept, points, model_names=None):
+    """
+    Class probabilities over a 1D or 2D grid around `base`, one predict_proba call per model.
+    Returns (list of swept value arrays, {model: probabilities shaped grid + (n_classes,)}).
+    """
+    sweeps = [(name, sweep_values(name, points)) for name in swept]
+    X = build_grid(base, feature_index, sweeps)
+    shape = tuple(len(values) for _, values in sweeps)
+    surfaces = {}
+    for name in model_names or bundle.model_names:
+        proba = np.asarray(bundle.predict_proba(name, X))
+        surfaces[name] = proba.reshape(shape + (proba.shape[1],))
+    return [values for _, values in sweeps], surfaces
+
+
+if __name__ == "__main__":
+    from model_bundle import load_bundle
+
+    parser = argparse.ArgumentParser(description="Time what-if grids around an all-zero movie.")
+    parser.add_argument('--points', type=int, default=100, help="Grid points per swept feature.")
+    args = parser.parse_args()
+    start_tracing('what_if')
+
+    try:
+        bundle = load_bundle()
+        index = {name: i for i, name in enumerate(bundle.features)}
+        base = np.zeros((1, len(bundle.features)), dtype=np.float32)
+        bundle.predict_all(base)   # load the models outside the timing
+        for swept in (['Promotion_Duration_Days'], ['Promotion_Duration_Days', 'Production_House_Score']):
+            for name in bundle.model_names:
+                start = time.perf_counter()
+                values, surfaces = response_surface(bundle, base, index, swept, args.points, [name])
+                cells = int(np.prod([len(v) for v in values]))
+                print(f"{' x '.join(swept)} | {name}: {cells} variants in "
+                      f"{(time.perf_counter() - start) * 1000:.1f} ms")
+    except Exception as e:
+        print(f"An error occurred: {e}")